@@ -0,0 +1,92 @@
+import typing
+
+import numpy as np
+import pandas as pd
+
+
+def is_arrow_backed(dataframe: pd.DataFrame) -> bool:
+    return any(isinstance(dtype, pd.ArrowDtype) for dtype in dataframe.dtypes)
+
+
+def _with_columns(dataframe: pd.DataFrame, columns: list) -> pd.DataFrame:
+    # Positional: column names may repeat
+    converted = pd.DataFrame(dict(enumerate(columns)), index=dataframe.index, copy=False)
+    converted.columns = dataframe.columns
+    return converted
+
+
+def to_arrow_backed(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """The frame with `pd.ArrowDtype` columns (NaNs become nulls); the index is kept as it is."""
+    if all(isinstance(dtype, pd.ArrowDtype) for dtype in dataframe.dtypes):
+        return dataframe
+    import pyarrow as pa
+
+    columns = []
+    for position in range(dataframe.shape[1]):
+        column = dataframe.iloc[:, position]
+        if not isinstance(column.dtype, pd.ArrowDtype):
+            arrow_values = pa.array(column.to_numpy(), from_pandas=True)
+            column = pd.Series(pd.array(arrow_values, dtype=pd.ArrowDtype(arrow_values.type)), index=dataframe.index)
+        columns.append(column)
+    return _with_columns(dataframe, columns)
+
+
+def to_numpy_backed(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """The frame with NumPy columns: nulls become NaNs, nullable integers floats, nullable booleans objects."""
+    if not is_arrow_backed(dataframe):
+        return dataframe
+    import pyarrow as pa
+
+    columns = []
+    for position in range(dataframe.shape[1]):
+        column = dataframe.iloc[:, position]
+        if isinstance(column.dtype, pd.ArrowDtype):
+            # Converted by Arrow: pandas 1.5 fails on nulls with `to_numpy(na_value=...)`
+            column = pd.Series(pa.array(column.array).to_numpy(zero_copy_only=False), index=dataframe.index)
+        columns.append(column)
+    return _with_columns(dataframe, columns)
+
+
+def float_dtype(dataframe: pd.DataFrame) -> typing.Any:
+    """Float dtype of the frame's backend, for conversions keeping it."""
+    if not is_arrow_backed(dataframe):
+        return np.float64
+    import pyarrow as pa
+
+    return pd.ArrowDtype(pa.float64())
+
+
+def float_values(dataframe: pd.DataFrame, copy: bool = False) -> np.ndarray:
+    """Values as a float64 matrix, nulls of Arrow-backed columns as NaNs."""
+    if is_arrow_backed(dataframe):
+        return to_numpy_backed(dataframe).to_numpy(dtype=np.float64)
+    return dataframe.to_numpy(dtype=np.float64, copy=copy)
+
+
+def read_csv(file_path: str, index_column: str) -> pd.DataFrame:
+    """Arrow-backed frame of a CSV file parsed by the multi-threaded Arrow reader.
+
+    The index column is parsed by pandas as `pd.read_csv(parse_dates=True)` does,
+    so time zone offsets are kept as they are (mixed offsets give an object index).
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    table = pacsv.read_csv(file_path, convert_options=pacsv.ConvertOptions(column_types={index_column: pa.string()}))
+    index = pd.Index(pd.to_datetime(table.column(index_column).to_pandas()), name=index_column)
+    dataframe = table.drop([index_column]).to_pandas(types_mapper=pd.ArrowDtype)
+    dataframe.index = index
+    return dataframe
+
+
+def read_parquet(file_path: str) -> pd.DataFrame:
+    """Arrow-backed frame of a Parquet file, without a conversion of the columns to NumPy."""
+    import pyarrow.parquet as papq
+
+    return papq.read_table(file_path).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def read_feather(file_path: str) -> pd.DataFrame:
+    import pyarrow.feather as pafeather
+
+    return pafeather.read_table(file_path).to_pandas(types_mapper=pd.ArrowDtype)
@@ -0,0 +1,343 @@
+import collections
+import json
+import socket
+import time
+import typing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import strings as ustr
+import config_logging as clog
+import config_model as cfgm
+import data_scaling as dsc
+import financial_features as ff
+import trading_calendar as tcal
+
+
+@dataclass
+class Bar:
+    ticker: str
+    timestamp: datetime
+    values: dict[str, float]
+    # time.perf_counter() when the bar was read from the feed
+    received_time: float = field(default_factory=time.perf_counter)
+
+
+def parse_bar_line(line: str) -> Bar | None:
+    """JSON line: {"ticker": "TSLA", "time": "2023-01-03T00:00:00-05:00", "Open": 118.47, ...}"""
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    ticker = record.pop('ticker')
+    timestamp = pd.Timestamp(record.pop('time'))
+    return Bar(ticker, timestamp, {name: float(value) for name, value in record.items()})
+
+
+class AbstractBarFeed:
+    def bars(self) -> typing.Iterator[Bar]:
+        raise NotImplementedError("Abstract bar feed has no implementation.")
+
+
+class FileTailBarFeed(AbstractBarFeed):
+    """Follows a JSON lines file like `tail -f`, a local stand-in for a live feed."""
+
+    def __init__(self, file_path: str, from_beginning: bool=True,
+                 poll_interval: float=0.05, idle_timeout: float | None = None):
+        self.__file_path = file_path
+        self.__from_beginning = from_beginning
+        self.__poll_interval = poll_interval
+        self.__idle_timeout = idle_timeout
+
+    def bars(self) -> typing.Iterator[Bar]:
+        with open(self.__file_path, 'r') as bar_file:
+            if not self.__from_beginning:
+                bar_file.seek(0, 2)
+            partial_line = ''
+            idle_since = time.monotonic()
+            while True:
+                line = bar_file.readline()
+                if line:
+                    partial_line += line
+                    if partial_line.endswith('\n'):
+                        bar = parse_bar_line(partial_line)
+                        partial_line = ''
+                        idle_since = time.monotonic()
+                        if bar is not None:
+                            yield bar
+                    continue
+                if self.__idle_timeout is not None and time.monotonic() - idle_since > self.__idle_timeout:
+                    return
+                time.sleep(self.__poll_interval)
+
+
+class SocketBarFeed(AbstractBarFeed):
+    """Reads JSON lines bars from a TCP socket until the peer closes it."""
+
+    def __init__(self, host: str, port: int, timeout: float | None = None):
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+
+    def bars(self) -> typing.Iterator[Bar]:
+        with socket.create_connection((self.__host, self.__port), timeout=self.__timeout) as connection:
+            with connection.makefile('r', encoding='utf-8') as bar_stream:
+                for line in bar_stream:
+                    bar = parse_bar_line(line)
+                    if bar is not None:
+                        yield bar
+
+
+class LatencyStats:
+    """End-to-end per bar latencies over the last `capacity` bars, seconds."""
+
+    def __init__(self, capacity: int=10000):
+        self.__latencies = collections.deque(maxlen=capacity)
+        self.__count = 0
+
+    def add(self, latency: float):
+        self.__latencies.append(latency)
+        self.__count += 1
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    def summary(self) -> dict[str, float]:
+        if not self.__latencies:
+            return {'count': 0}
+        latencies = np.fromiter(self.__latencies, dtype=np.float64)
+        return {
+            'count': self.__count,
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max()),
+        }
+
+    def __str__(self) -> str:
+        summary = self.summary()
+        return ', '.join(
+            f"{name}={value * 1000:.3f} ms" if name != 'count' else f"{name}={value}"
+            for name, value in summary.items()
+        )
+
+
+class IncrementalBarTransformer:
+    """Applies the tending, clearing and treatment steps of an instrument's
+    `data_transformation` to single bars, as the batch commands do to whole frames."""
+
+    def __init__(self, quoted_instrument: cfgm.QuotedInstrument):
+        self.__quoted_instrument = quoted_instrument
+        transformation = quoted_instrument.data_transformation
+        tending = transformation.tending or {}
+        columns_config = tending.get('columns', {}) or {}
+
+        self.__localize = 'localize' in ((tending.get('index', {}) or {}).get('reset', []) or [])
+        self.__columns_to_remove = set(columns_config.get('remove', []) or [])
+        change_rules = columns_config.get('change_rules', {})
+        self.__float_columns = {
+            column_name for column_name, change_rule in (change_rules.items() if isinstance(change_rules, dict) else [])
+            if change_rule == 'float'
+        }
+        self.__to_snake_case = bool((columns_config.get('names', {}) or {}).get('to_snake_case', False))
+
+        clearing = transformation.clearing or {}
+        missing_values_strategy = clearing.get('missing_values')
+        if missing_values_strategy not in [None, 'interpolate_by_previous_date']:
+            raise ValueError(f"['{quoted_instrument.ticker}'] Invalid missing values strategy '{missing_values_strategy}'")
+        self.__pad_missing = missing_values_strategy == 'interpolate_by_previous_date'
+        self.__trading_calendar = tcal.instrument_trading_calendar(quoted_instrument)
+
+        treatment = transformation.treatment or {}
+        self.__dimensionality_reduction = treatment.get('dimensionality_reduction')
+        if self.__dimensionality_reduction in ['None', 'none']:
+            self.__dimensionality_reduction = None
+        if self.__dimensionality_reduction not in [None, 'OHLC', 'HLC']:
+            raise ValueError(f"['{quoted_instrument.ticker}'] Streaming doesn't support the dimentionality reduction strategy '{self.__dimensionality_reduction}'")
+
+    def tend(self, bar: Bar) -> Bar:
+        timestamp = pd.Timestamp(bar.timestamp)
+        if self.__localize and timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_localize(None)
+        values = {}
+        for column_name, value in bar.values.items():
+            if column_name in self.__columns_to_remove:
+                continue
+            if column_name in self.__float_columns:
+                value = float(value)
+            if self.__to_snake_case:
+                column_name = ustr.to_snake_case(column_name)
+            values[column_name] = value
+        return Bar(bar.ticker, timestamp, values, bar.received_time)
+
+    def treat(self, bar: Bar) -> Bar:
+        if self.__dimensionality_reduction is None:
+            return bar
+        values = dict(bar.values)
+        price_columns = {
+            price: next(column_name for column_name in values if price in column_name)
+            for price in ['open', 'high', 'low', 'close']
+        }
+        if self.__dimensionality_reduction == 'OHLC':
+            values['OHLC'] = 0.25 * sum(values[price_columns[price]] for price in ['open', 'high', 'low', 'close'])
+        else:
+            values['HLC'] = sum(values[price_columns[price]] for price in ['high', 'low', 'close']) / 3
+        for column_name in price_columns.values():
+            del values[column_name]
+        return Bar(bar.ticker, bar.timestamp, values, bar.received_time)
+
+    def clear(self, bar: Bar, previous_timestamp: datetime | None,
+              previous_values: np.ndarray | None, columns: list[str]) -> list[tuple[datetime, np.ndarray]]:
+        """Rows to append for the bar: days (sessions with a trading calendar) missing since
+        the previous row padded with it, then the bar."""
+        row = np.array([bar.values.get(column_name, np.nan) for column_name in columns], dtype=np.float64)
+        rows = []
+        if self.__pad_missing and previous_values is not None:
+            missing = np.isnan(row)
+            row[missing] = previous_values[missing]
+            if self.__trading_calendar is not None:
+                missing_days = self.__trading_calendar.sessions(previous_timestamp + timedelta(days=1), bar.timestamp)
+                rows.extend((missing_day, previous_values) for missing_day in missing_days if missing_day < bar.timestamp)
+            else:
+                missing_day = previous_timestamp + timedelta(days=1)
+                while missing_day < bar.timestamp:
+                    rows.append((missing_day, previous_values))
+                    missing_day += timedelta(days=1)
+        rows.append((bar.timestamp, row))
+        return rows
+
+
+class _RowBuffer:
+    """Last `capacity` rows of an instrument, appended in amortized O(1)."""
+
+    def __init__(self, dataframe: pd.DataFrame, capacity: int):
+        self.columns = dataframe.columns.to_list()
+        self.__capacity = capacity
+        self.__values = np.empty((2 * capacity, len(self.columns)), dtype=np.float64)
+        self.__index = np.empty(2 * capacity, dtype='datetime64[ns]')
+        tail = dataframe.tail(capacity)
+        self.__size = len(tail)
+        self.__values[:self.__size] = tail.to_numpy(dtype=np.float64)
+        self.__index[:self.__size] = tail.index.to_numpy(dtype='datetime64[ns]')
+
+    def append(self, timestamp: datetime, row: np.ndarray):
+        if self.__size == self.__values.shape[0]:
+            self.__values[:self.__capacity] = self.__values[self.__size - self.__capacity:self.__size]
+            self.__index[:self.__capacity] = self.__index[self.__size - self.__capacity:self.__size]
+            self.__size = self.__capacity
+        self.__values[self.__size] = row
+        self.__index[self.__size] = np.datetime64(pd.Timestamp(timestamp).to_datetime64(), 'ns')
+        self.__size += 1
+
+    @property
+    def last_timestamp(self) -> datetime | None:
+        return pd.Timestamp(self.__index[self.__size - 1]) if self.__size else None
+
+    @property
+    def last_values(self) -> np.ndarray | None:
+        return self.__values[self.__size - 1].copy() if self.__size else None
+
+    def frame(self) -> pd.DataFrame:
+        begin = max(self.__size - self.__capacity, 0)
+        return pd.DataFrame(
+            self.__values[begin:self.__size], index=pd.DatetimeIndex(self.__index[begin:self.__size]),
+            columns=self.columns, copy=False
+        )
+
+
+class BarStreamer:
+    """Pushes live bars through tending, clearing, treatment and, for the target
+    instrument, the technical analysis features.
+
+    The buffers start from the warm, already transformed batch frames. Features are
+    recomputed over the last `history_window` rows only, so the per bar cost is bounded;
+    exponential moving averages are truncated to that window, which makes their
+    error negligible for spans much smaller than the window. The streamed rows and
+    features are kept for the last `history_window` rows and bars only.
+    """
+
+    LOGGER = clog.get_logger('BarStreamer')
+
+    def __init__(self, config: cfgm.Config, selected_data: typing.Mapping[str, pd.DataFrame],
+                 history_window: int=1000, scaling_parameters: dsc.ScalingParameters | None=None):
+        research = config.research
+        instruments = [research.target_quoted_instrument] + list(research.quoted_instruments)
+        self.__target_ticker = research.target_quoted_instrument.ticker
+        self.__feature_graph = ff.FeatureGraph.from_config(research.machine_learning.features)
+        self.__transformers = {
+            instrument.ticker: IncrementalBarTransformer(instrument) for instrument in instruments
+        }
+        self.__buffers = {
+            instrument.ticker: _RowBuffer(selected_data[instrument.ticker], history_window) for instrument in instruments
+        }
+        self.__streamed_rows = {
+            instrument.ticker: collections.deque[tuple[datetime, np.ndarray]](maxlen=history_window)
+            for instrument in instruments
+        }
+        self.__streamed_features = collections.deque[pd.DataFrame](maxlen=history_window)
+        self.__scaling_parameters = scaling_parameters
+        self.__latency = LatencyStats()
+
+    def process_bar(self, bar: Bar) -> pd.DataFrame | None:
+        """Transform the bar and return the features of the appended rows (target instrument only)."""
+        transformer = self.__transformers.get(bar.ticker)
+        if transformer is None:
+            self.LOGGER.warning(f"[{bar.ticker}] Skipping a bar of an unknown instrument")
+            return None
+        buffer = self.__buffers[bar.ticker]
+
+        bar = transformer.treat(transformer.tend(bar))
+        if self.__scaling_parameters is not None:
+            # As the batch frames were scaled, with the parameters fitted on them
+            bar = Bar(bar.ticker, bar.timestamp, self.__scaling_parameters.transform_values(bar.ticker, dict(bar.values)),
+                      bar.received_time)
+        if buffer.last_timestamp is not None and bar.timestamp <= buffer.last_timestamp:
+            self.LOGGER.warning(f"[{bar.ticker}] Skipping an out of order bar {bar.timestamp} <= {buffer.last_timestamp}")
+            return None
+        rows = transformer.clear(bar, buffer.last_timestamp, buffer.last_values, buffer.columns)
+        for timestamp, row in rows:
+            buffer.append(timestamp, row)
+        self.__streamed_rows[bar.ticker].extend(rows)
+
+        features = None
+        if bar.ticker == self.__target_ticker:
+            features = ff.financial_features(
+                buffer.frame(), ticker=bar.ticker, feature_graph=self.__feature_graph
+            ).tail(len(rows))
+            self.__streamed_features.append(features)
+
+        self.__latency.add(time.perf_counter() - bar.received_time)
+        return features
+
+    def run(self, bar_feed: AbstractBarFeed, max_bars: int | None = None) -> LatencyStats:
+        for number, bar in enumerate(bar_feed.bars(), start=1):
+            self.process_bar(bar)
+            if number % 1000 == 0:
+                self.LOGGER.info("Streamed %d bars, latency: %s", number, self.__latency)
+            if max_bars is not None and number >= max_bars:
+                break
+        self.LOGGER.info("Streaming finished, latency: %s", self.__latency)
+        return self.__latency
+
+    @property
+    def latency(self) -> LatencyStats:
+        return self.__latency
+
+    def streamed_data(self, ticker: str) -> pd.DataFrame:
+        """The last `history_window` streamed rows of the instrument."""
+        rows = self.__streamed_rows[ticker]
+        return pd.DataFrame(
+            [row for _, row in rows], index=pd.DatetimeIndex([timestamp for timestamp, _ in rows]),
+            columns=self.__buffers[ticker].columns
+        )
+
+    def streamed_features(self) -> pd.DataFrame:
+        """Features of the last `history_window` streamed bars of the target instrument."""
+        if not self.__streamed_features:
+            return pd.DataFrame()
+        return pd.concat(self.__streamed_features)
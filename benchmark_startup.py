@@ -0,0 +1,129 @@
+"""Startup benchmark: `python -X importtime` totals of the entry point imports.
+
+Usage:
+    python benchmark_startup.py [--repeat 5] [--top 15] [--save FILE] [--baseline FILE] [--max-regression 0.2]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+# Modules imported by the entry point `zzz-test_main.py` before the workflow starts
+ENTRY_POINT_MODULES = [
+    'config_logging',
+    'config_model',
+    'config',
+    'data_load_model',
+    'data_load',
+    'workflow',
+    'workflow_stage',
+    'processor',
+]
+
+# Must never be imported just to start up
+HEAVY_OPTIONAL_MODULES = [
+    'sweetviz',
+    'pandas_profiling',
+    'holidays',
+    'fsutil',
+    'yfinance',
+    'IPython',
+]
+
+
+@dataclass
+class ImportTimeRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    level: int
+
+
+@dataclass
+class ImportTimeRun:
+    records: list[ImportTimeRecord] = field(default_factory=list)
+
+    @property
+    def total_us(self) -> int:
+        return sum(record.cumulative_us for record in self.records if record.level == 0)
+
+    def imported(self, module: str) -> bool:
+        return any(record.module == module for record in self.records)
+
+
+def parse_importtime(stderr: str) -> ImportTimeRun:
+    run = ImportTimeRun()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+        stripped_module = module.lstrip(' ')
+        # One leading space is the separator, every further two spaces are one nesting level
+        level = (len(module) - len(stripped_module) - 1) // 2
+        run.records.append(ImportTimeRecord(
+            stripped_module.rstrip(), int(self_us), int(cumulative_us), level
+        ))
+    return run
+
+
+def measure(modules: list[str]) -> ImportTimeRun:
+    statement = '; '.join(f"import {module}" for module in modules)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=Path(__file__).parent, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing the entry point modules failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--save', type=Path, default=None, help='Store the result as JSON baseline.')
+    parser.add_argument('--baseline', type=Path, default=None, help='Compare against a stored JSON baseline.')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed relative slowdown against the baseline.')
+    arguments = parser.parse_args()
+
+    runs = [measure(ENTRY_POINT_MODULES) for _ in range(arguments.repeat)]
+    totals_ms = [run.total_us / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f"Entry point import time: median {median_ms:.1f} ms, "
+          f"min {min(totals_ms):.1f} ms, max {max(totals_ms):.1f} ms ({arguments.repeat} runs)")
+
+    last_run = runs[-1]
+    print(f"Top {arguments.top} imports by cumulative time (last run):")
+    heaviest = sorted(last_run.records, key=lambda record: record.cumulative_us, reverse=True)
+    for record in heaviest[:arguments.top]:
+        print(f"    {record.cumulative_us / 1000:9.1f} ms  {record.module}")
+
+    exit_code = 0
+    heavy_imported = [module for module in HEAVY_OPTIONAL_MODULES if last_run.imported(module)]
+    if heavy_imported:
+        print(f"Heavy optional modules imported on startup: {', '.join(heavy_imported)}")
+        exit_code = 1
+
+    if arguments.save:
+        arguments.save.write_text(json.dumps({'median_ms': median_ms, 'totals_ms': totals_ms}, indent=2))
+        print(f"Saved baseline to {arguments.save}")
+
+    if arguments.baseline:
+        baseline_ms = json.loads(arguments.baseline.read_text())['median_ms']
+        regression = (median_ms - baseline_ms) / baseline_ms
+        print(f"Baseline median {baseline_ms:.1f} ms, change {regression:+.1%}")
+        if regression > arguments.max_regression:
+            print(f"Startup regression exceeds {arguments.max_regression:.0%}")
+            exit_code = 1
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
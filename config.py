@@ -1,7 +1,10 @@
 from os import path
+import hashlib
+import pickle
 import pprint
 import textwrap
 from io import StringIO
+from pathlib import Path
 
 import yaml
 
@@ -9,32 +12,40 @@ import config_logging
 import config_model as model
 
 
-class ConfigLoader:
-    """Load configuration"""
+try:
+    YAML_LOADER = yaml.CSafeLoader
+except AttributeError:
+    # PyYAML built without libyaml
+    YAML_LOADER = yaml.SafeLoader
 
-    LOGGER = config_logging.get_logger('ConfigLoader')
+CONFIG_CACHE_DIRECTORY: Path = Path('./.cache/config')
 
-    def __init__(self, config_file_path: str) -> None:
-        self.config_file_path = config_file_path
 
-    def load_config(self, print_short_report=True, print_verbose_report: bool=False) -> model.Config:
-        with open(self.config_file_path) as config_file:
-            config_dictionary = yaml.load(
-                config_file, Loader=yaml.FullLoader
-            )
-            if print_verbose_report:
-                self.LOGGER.info(f"Loaded configuration:\n{pprint.pformat(config_dictionary)}")
+def _config_model_fingerprint() -> str:
+    # Cached models are invalidated whenever the model definitions change
+    with open(model.__file__, 'rb') as model_file:
+        return hashlib.sha256(model_file.read()).hexdigest()[:16]
 
-            config = model.Config.parse_obj(
-                config_dictionary['config'])
-            if print_verbose_report:
-                self.LOGGER.info(f"Loaded configuration models:\n{config}")
-            if print_short_report:
-                target_instrument = config.research.target_quoted_instrument
-                quoted_instruments = config.research.quoted_instruments
 
-                sio = StringIO()
-                sio.write(
+class ConfigShortReport:
+    """Short human readable report of a configuration, rendered on first use."""
+
+    def __init__(self, config: model.Config) -> None:
+        self.__config = config
+        self.__text = None
+
+    def __str__(self) -> str:
+        if self.__text is None:
+            self.__text = self.__render()
+        return self.__text
+
+    def __render(self) -> str:
+        config = self.__config
+        target_instrument = config.research.target_quoted_instrument
+        quoted_instruments = config.research.quoted_instruments
+
+        sio = StringIO()
+        sio.write(
 f"""
 /================================================\\
 Loaded configuration short report:
@@ -47,11 +58,11 @@ name: {config.research.name}
     description:
         {textwrap.fill(target_instrument.description, width=80, initial_indent=' '*4, subsequent_indent=' '*8)}""")
 
-                sio.write(
+        sio.write(
 f"""
 2. Extra quoted instruments.""")
-                for quoted_instrument in quoted_instruments:
-                    sio.write(
+        for quoted_instrument in quoted_instruments:
+            sio.write(
 f"""
     - Quoted instrument
         ticker: {quoted_instrument.ticker}
@@ -59,23 +70,106 @@ f"""
         description:
             {textwrap.fill(quoted_instrument.description, width=80, initial_indent=' '*4, subsequent_indent=' '*12)}""")
 
-                machine_learning = config.research.machine_learning
-                sio.write(
+        machine_learning = config.research.machine_learning
+        sio.write(
 f"""
 3. Machine learning:
     ⤇ begin time: {machine_learning.time_range.begin_time}
     ⥥ split date: {machine_learning.split_time}
     ⤆ end time: {machine_learning.time_range.end_time}
     ▒▒░ cross-validation strategy: {machine_learning.cross_validation_strategy}""")
-                sio.write(
+        sio.write(
 """
 \\================================================/""")
-                self.LOGGER.info(sio.getvalue())
+        return sio.getvalue()
+
+
+class ConfigLoader:
+    """Load configuration"""
 
-            return config
+    LOGGER = config_logging.get_logger('ConfigLoader')
+
+    # Validated configurations of this process, keyed by the config file content hash
+    CONFIGS = dict[str, model.Config]()
+    MODEL_FINGERPRINT = _config_model_fingerprint()
+
+    def __init__(self, config_file_path: str, use_cache: bool=True) -> None:
+        self.config_file_path = config_file_path
+        self.use_cache = use_cache
+        self.__config = None
+
+    def load_config(self, print_short_report=True, print_verbose_report: bool=False) -> model.Config:
+        with open(self.config_file_path, 'rb') as config_file:
+            config_bytes = config_file.read()
+        config_hash = hashlib.sha256(config_bytes).hexdigest() + '-' + self.MODEL_FINGERPRINT
+
+        config = self.__cached_config(config_hash) if self.use_cache and not print_verbose_report else None
+        if config is None:
+            config_dictionary = yaml.load(config_bytes, Loader=YAML_LOADER)
+            if print_verbose_report:
+                self.LOGGER.info(f"Loaded configuration:\n{pprint.pformat(config_dictionary)}")
+
+            config = model.Config.parse_obj(
+                config_dictionary['config'])
+            if print_verbose_report:
+                self.LOGGER.info(f"Loaded configuration models:\n{config}")
+            if self.use_cache:
+                self.__cache_config(config_hash, config)
+        if self.use_cache:
+            # Callers own their copy: a mutated config must not leak into later loads
+            config = config.copy(deep=True)
+
+        self.__config = config
+        if print_short_report:
+            # The report is rendered by the logging machinery only if the record is emitted
+            self.LOGGER.info('%s', self.short_report)
+
+        return config
+
+    @property
+    def short_report(self) -> ConfigShortReport:
+        if self.__config is None:
+            raise ValueError('Configuration is not loaded yet.')
+        return ConfigShortReport(self.__config)
+
+    def __cached_config(self, config_hash: str) -> model.Config | None:
+        if config_hash in self.CONFIGS:
+            self.LOGGER.debug(f"Configuration {config_hash} is taken from the process cache.")
+            return self.CONFIGS[config_hash]
+
+        cache_file_path = self.__cache_file_path(config_hash)
+        if not cache_file_path.is_file():
+            return None
+        try:
+            with open(cache_file_path, 'rb') as cache_file:
+                config = pickle.load(cache_file)
+        except Exception as exception:
+            self.LOGGER.warning(f"Ignoring broken configuration cache {cache_file_path}: {exception}")
+            return None
+        if not isinstance(config, model.Config):
+            return None
+
+        self.LOGGER.debug(f"Configuration {config_hash} is taken from the cache file {cache_file_path}.")
+        self.CONFIGS[config_hash] = config
+        return config
+
+    def __cache_config(self, config_hash: str, config: model.Config):
+        self.CONFIGS[config_hash] = config
+        cache_file_path = self.__cache_file_path(config_hash)
+        try:
+            cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary_file_path = cache_file_path.with_suffix('.tmp')
+            with open(temporary_file_path, 'wb') as cache_file:
+                pickle.dump(config, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            temporary_file_path.replace(cache_file_path)
+        except OSError as exception:
+            self.LOGGER.warning(f"Cannot write configuration cache {cache_file_path}: {exception}")
+
+    def __cache_file_path(self, config_hash: str) -> Path:
+        return Path(CONFIG_CACHE_DIRECTORY, f"{config_hash}.pickle")
 
     @classmethod
-    def from_path(cls, config_file_path: str):
+    def from_path(cls, config_file_path: str, use_cache: bool=True):
         """Create a new ConfigLoader"""
         if not path.isfile(config_file_path):
             raise FileNotFoundError(
@@ -83,7 +177,4 @@ f"""
 
         cls.LOGGER.info(f'Found config file: {config_file_path}')
 
-        config_loader = cls.__new__(cls)
-        config_loader.config_file_path = config_file_path
-        return config_loader
-
+        return cls(config_file_path, use_cache=use_cache)
@@ -1,9 +1,16 @@
+import atexit
+import copy
 import logging
 from logging import handlers
+import multiprocessing
+from pathlib import Path
+import queue
 import threading
+import typing
 
 
 LOGGING_FORMAT_DEFAULT = '%(asctime)s [%(threadName)-12.12s] [%(levelname)-4.4s] {%(name)s} %(message)s'
+LOGGING_FILE_PATH: Path = Path('logs/dione.log')
 
 
 class ConsoleLoggingFormatter(logging.Formatter):
@@ -12,25 +19,50 @@ class ConsoleLoggingFormatter(logging.Formatter):
     red = "\x1b[31;20m"
     bold_red = "\x1b[31;1m"
     reset = "\x1b[0m"
-    logging_format = LOGGING_FORMAT_DEFAULT
-
-    FORMATS = {
-        logging.DEBUG: grey + logging_format + reset,
-        logging.INFO: grey + logging_format + reset,
-        logging.WARNING: yellow + logging_format + reset,
-        logging.ERROR: red + logging_format + reset,
-        logging.CRITICAL: bold_red + logging_format + reset
+
+    COLORS = {
+        logging.DEBUG: grey,
+        logging.INFO: grey,
+        logging.WARNING: yellow,
+        logging.ERROR: red,
+        logging.CRITICAL: bold_red
     }
 
     def __init__(self, logging_format=LOGGING_FORMAT_DEFAULT):
         super(ConsoleLoggingFormatter, self).__init__(logging_format)
+        self.__formatters = {
+            level: logging.Formatter(color + logging_format + self.reset)
+            for level, color in self.COLORS.items()
+        }
 
     def format(self, record):
-        logging_format = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(logging_format)
+        formatter = self.__formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
 
+class LazyMessage:
+    """Log argument evaluated only when a record is actually emitted.
+
+    Usage: `LOGGER.info("NaN rows:\\n%s", lazy(dataframe.isna().sum))`
+    """
+
+    __slots__ = ('__function', '__args', '__kwargs')
+
+    def __init__(self, function: typing.Callable, *args, **kwargs):
+        self.__function = function
+        self.__args = args
+        self.__kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.__function(*self.__args, **self.__kwargs))
+
+
+def lazy(function: typing.Callable, *args, **kwargs) -> LazyMessage:
+    return LazyMessage(function, *args, **kwargs)
+
+
 _lock = threading.Lock()
 
 
@@ -45,32 +77,79 @@ class LoggerSingletonMetaClass(type):
         return cls._instances[cls]
 
 
+class _InProcessQueueHandler(handlers.QueueHandler):
+    """Enqueues records for a listener thread of this process.
+
+    The message is merged with its arguments on the calling thread, when the record
+    is emitted: arguments (e.g. `lazy` summaries of frames) may be changed right after
+    the call. The traceback and the rest of the formatting are left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
 class LoggerSingleton(metaclass=LoggerSingletonMetaClass):
+    """Root logger writing through a queue: callers merge the messages and enqueue the records,
+    a listener thread formats them and does the console and file I/O.
+    Records of process-pool workers are formatted in the workers, see `init_worker_logging`."""
 
-    def __init__(self, logging_level=logging.INFO):        
+    def __init__(self, logging_level=logging.INFO):
         root_logger = logging.getLogger()
 
         file_logging_formatter = logging.Formatter(
             LOGGING_FORMAT_DEFAULT
         )
+        LOGGING_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
         file_handler = handlers.RotatingFileHandler(
-            "logs/dione.log", mode='a', maxBytes=5*1024*1024, backupCount=10, encoding=None, delay=0)
+            LOGGING_FILE_PATH, mode='a', maxBytes=5*1024*1024, backupCount=10, encoding=None, delay=True)
         file_handler.setFormatter(file_logging_formatter)
-        root_logger.addHandler(file_handler)
 
         console_logging_formatter = ConsoleLoggingFormatter(
             LOGGING_FORMAT_DEFAULT
         )
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(console_logging_formatter)
-        root_logger.addHandler(console_handler)
+
+        self.__handlers = (file_handler, console_handler)
+        self.__listeners = list[handlers.QueueListener]()
+        self.__worker_queue = None
+
+        records_queue = queue.SimpleQueue()
+        root_logger.addHandler(_InProcessQueueHandler(records_queue))
+        self.__start_listener(records_queue)
+        atexit.register(self.stop)
 
         root_logger.setLevel(logging_level)
 
         self.root_logger = root_logger
+        self.logging_level = logging_level
+
+    def __start_listener(self, records_queue):
+        listener = handlers.QueueListener(records_queue, *self.__handlers, respect_handler_level=True)
+        listener.start()
+        self.__listeners.append(listener)
+
+    @property
+    def worker_queue(self):
+        """Queue for the records of process-pool workers, drained by a listener of this process."""
+        with _lock:
+            if self.__worker_queue is None:
+                self.__worker_queue = multiprocessing.Queue(-1)
+                self.__start_listener(self.__worker_queue)
+        return self.__worker_queue
+
+    def stop(self):
+        """Flush the queued records and stop the listener threads."""
+        while self.__listeners:
+            self.__listeners.pop().stop()
 
 
 def init_logger() -> logging.Logger:
+    """Configure the root logger once. Called by the entry points, not on import."""
     logger_singleton = LoggerSingleton()
     return logger_singleton.root_logger
 
@@ -79,4 +158,20 @@ def get_logger(name) -> logging.Logger:
     return logging.getLogger(name)
 
 
-init_logger()
+def worker_logging_initargs() -> tuple:
+    """Arguments for `init_worker_logging` passed as a process pool `initargs`."""
+    logger_singleton = LoggerSingleton()
+    return logger_singleton.worker_queue, logger_singleton.logging_level
+
+
+def init_worker_logging(records_queue, logging_level=logging.INFO):
+    """Process pool initializer: route all records of a worker to the parent's listener.
+
+    Usage: `ProcessPoolExecutor(initializer=init_worker_logging, initargs=worker_logging_initargs())`
+    """
+    root_logger = logging.getLogger()
+    # Forked workers inherit the parent's handlers whose listener thread doesn't exist here
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(handlers.QueueHandler(records_queue))
+    root_logger.setLevel(logging_level)
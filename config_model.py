@@ -10,14 +10,30 @@ class TimeRange(BaseModel):
     end_time: datetime
 
 
+class CsvIngestion(BaseModel):
+    # Parquet file the CSV file is converted into and read from
+    parquet_file_name: str
+    # strptime format of the date column, e.g. '%Y-%m-%d %H:%M:%S%z'
+    date_format: str
+    # Time zone of the dates: offsets are converted to it, naive dates are assumed in it
+    time_zone: typing.Optional[str] = None
+    # Arrow type names (float64, int64, string...) of columns; others are inferred
+    column_types: typing.Dict[str, str] = {}
+    # Bytes of CSV parsed at once
+    block_size: int = 16 * 1024 * 1024
+
+
 class LocalDataLoading(BaseModel):
     file_name: str
+    ingestion: typing.Optional[CsvIngestion] = None
 
 
 class RemoteDataLoading(BaseModel):
     source_name: str
     file_name: str
     time_range: TimeRange
+    # Keep the downloads in a snapshot store instead of timestamped and '_latest' CSV copies
+    snapshot_directory: typing.Optional[str] = None
 
 
 class DataLoading(BaseModel):
@@ -42,10 +58,83 @@ class QuotedInstrument(BaseModel):
     data_transformation: DataTransformation
 
 
+class UniverseDefaults(BaseModel):
+    # Shared by all tickers of a universe; '{ticker}' in the strings is replaced by each ticker
+    name: str = '{ticker}'
+    description: str = ''
+    data_loading: DataLoading
+    data_transformation: DataTransformation
+
+
+class Universe(BaseModel):
+    # One ticker per line, '#' starts a comment
+    tickers_file: str
+    defaults: UniverseDefaults
+    # Instruments processed together, which bounds the memory used
+    chunk_size: int = 50
+    output_directory: str = './data/generated/universe'
+
+
+class CrossValidation(BaseModel):
+    # Numbers of dataset rows
+    window: int = 365
+    step: int = 30
+    horizon: int = 30
+
+
+class LaggedWindows(BaseModel):
+    # Numbers of dataset rows per sample
+    lags: int = 30
+    horizon: int = 1
+    batch_size: int = 256
+    target_columns: typing.List[str] = ['close']
+    # Feature columns of the lag windows, all dataset columns if not set
+    feature_columns: typing.Optional[typing.List[str]] = None
+    # Columns left out of the features; look-ahead features (e.g. close_shift-1) always are
+    exclude_columns: typing.List[str] = []
+
+
+class FeatureDefinition(BaseModel):
+    # Operation of financial_features.FEATURE_OPERATIONS
+    operation: str
+    # Prices ('open', 'high', 'low', 'close') or other features
+    inputs: typing.List[str]
+    parameters: typing.Dict[str, typing.Any] = {}
+
+
+class Features(BaseModel):
+    # Features of the datasets, all built-in features by default
+    requested: typing.Optional[typing.List[str]] = None
+    # Additional features or redefinitions of the built-in ones
+    definitions: typing.Dict[str, FeatureDefinition] = {}
+
+
+class WalkForward(BaseModel):
+    # Forecast model evaluated against the persistence baseline: ridge
+    model: str = 'ridge'
+    # Keyword arguments of the model, e.g. alpha of ridge
+    model_parameters: typing.Dict[str, typing.Any] = {}
+    # Worker processes evaluating the folds, one per CPU if not set
+    max_workers: typing.Optional[int] = None
+
+
+class FeatureReduction(BaseModel):
+    # Principal components replacing the joined dataset features, fitted before split_time
+    components: int
+    standardize: bool = True
+    random_state: typing.Optional[int] = 0
+
+
 class MachineLearning(BaseModel):
     time_range: TimeRange
     split_time: datetime
     cross_validation_strategy: str
+    cross_validation: CrossValidation = CrossValidation()
+    lagged_windows: LaggedWindows = LaggedWindows()
+    features: Features = Features()
+    # No reduction of the joined dataset features if not set
+    feature_reduction: typing.Optional[FeatureReduction] = None
+    walk_forward: WalkForward = WalkForward()
 
 
 class Research(BaseModel):
@@ -54,6 +143,9 @@ class Research(BaseModel):
     machine_learning: MachineLearning
     target_quoted_instrument: QuotedInstrument
     quoted_instruments: typing.List[QuotedInstrument]
+    universe: typing.Optional[Universe] = None
+    # Keep instrument and dataset frames Arrow-backed (pandas ArrowDtype) from loading through export
+    arrow_backed_frames: bool = False
 
 
 class Config(BaseModel):
@@ -0,0 +1,204 @@
+import math
+import pickle
+import re
+import typing
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config_logging as clog
+
+
+class _SpilledEntry:
+    def __init__(self, path: Path, nbytes: int):
+        self.path = path
+        self.nbytes = nbytes
+
+
+def estimate_nbytes(value: typing.Any, _seen: set[int] | None = None) -> int:
+    """Approximate memory held by a context entry: frames and arrays, also inside containers and objects."""
+    seen = _seen if _seen is not None else set[int]()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=False))
+    if isinstance(value, np.ndarray):
+        # Views hold the memory of their base
+        return 0 if value.base is not None else value.nbytes
+    if isinstance(value, typing.Mapping):
+        return sum(estimate_nbytes(item, seen) for item in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_nbytes(item, seen) for item in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sum(estimate_nbytes(item, seen) for item in vars(value).values())
+    return 0
+
+
+class ContextStore(MutableMapping):
+    """Workflow context that frees entries no later stage consumes.
+
+    `stage_consumers` maps every workflow stage to the context keys its command reads
+    (`None` when unknown: the stage is assumed to read everything). After a stage has
+    been executed forward, the entries whose last consumer it was are released; entries
+    never consumed (results) and `retained_keys` are kept. If the resident entries exceed
+    `memory_budget` bytes, the entries used furthest in the future are pickled to
+    `spill_directory` and loaded back transparently on access.
+
+    Released entries are gone: re-executing earlier stages needs the resident
+    processor checkpoints (see `Processor`).
+    """
+
+    LOGGER = clog.get_logger('ContextStore')
+
+    def __init__(self, stage_consumers: typing.Mapping[str, typing.Iterable[str] | None],
+                 memory_budget: int | None = None,
+                 spill_directory: str = '.cache/context',
+                 retained_keys: typing.Iterable[str] = ('config',)):
+        self.__stages = list(stage_consumers.keys())
+        self.__stage_consumers = {
+            stage: set(keys) if keys is not None else None for stage, keys in stage_consumers.items()
+        }
+        self.__memory_budget = memory_budget
+        self.__spill_directory = Path(spill_directory)
+        self.__retained_keys = set(retained_keys)
+        self.__entries = OrderedDict[str, typing.Any]()
+        self.__versions = dict[str, int]()
+        self.__version = 0
+        # Versions of the entries that failed to pickle, not spilled again
+        self.__unpicklable_versions = set[int]()
+
+    def __getitem__(self, key: str) -> typing.Any:
+        value = self.__entries[key]
+        if isinstance(value, _SpilledEntry):
+            value = self.__load(key, value)
+        return value
+
+    def __setitem__(self, key: str, value: typing.Any):
+        self.__discard_spilled(key)
+        self.__entries[key] = value
+        self.__version += 1
+        self.__versions[key] = self.__version
+
+    def __delitem__(self, key: str):
+        self.__discard_spilled(key)
+        del self.__entries[key]
+        del self.__versions[key]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.__entries)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def clear(self):
+        # Without loading the spilled entries as MutableMapping.popitem would
+        for key in list(self.__entries.keys()):
+            del self[key]
+
+    def copy(self) -> OrderedDict:
+        return OrderedDict(self.items())
+
+    def identities(self) -> dict[str, int]:
+        """Versions of the entries, bumped on every assignment; unlike `id()` stable over spilling."""
+        return dict(self.__versions)
+
+    def release_after(self, stage: str):
+        """Free the entries whose consumers have all been executed by `stage`, then fit the memory budget."""
+        position = self.__stages.index(stage)
+        for key in list(self.__entries.keys()):
+            # After the last stage the whole context is the result
+            if key in self.__retained_keys or position == len(self.__stages) - 1:
+                continue
+            consumer_positions = self.__consumer_positions(key)
+            if consumer_positions and max(consumer_positions) <= position:
+                self.LOGGER.info(f"[{stage}] Releasing the context entry '{key}': no later stage consumes it")
+                del self[key]
+        self.__fit_memory_budget(position)
+        self.LOGGER.info(f"[{stage}] Resident context: {self.resident_nbytes / 2**20:.1f} MiB, \
+spilled entries: {self.spilled_keys}")
+
+    def __consumer_positions(self, key: str) -> list[int]:
+        return [
+            position for position, stage in enumerate(self.__stages)
+            if self.__stage_consumers[stage] is None or key in self.__stage_consumers[stage]
+        ]
+
+    def __fit_memory_budget(self, position: int):
+        if self.__memory_budget is None:
+            return
+        sizes = {
+            key: estimate_nbytes(value) for key, value in self.__entries.items()
+            if not isinstance(value, _SpilledEntry)
+        }
+        resident_nbytes = sum(sizes.values())
+        if resident_nbytes <= self.__memory_budget:
+            return
+
+        def next_use(key: str) -> float:
+            later_positions = [consumer for consumer in self.__consumer_positions(key) if consumer > position]
+            return min(later_positions) if later_positions else math.inf
+
+        # Furthest next use first (Belady); the entries of the next stage stay
+        for key in sorted(sizes.keys(), key=lambda key: (next_use(key), sizes[key]), reverse=True):
+            if resident_nbytes <= self.__memory_budget:
+                break
+            if next_use(key) == position + 1 or sizes[key] == 0:
+                continue
+            if self.__spill(key, sizes[key]):
+                resident_nbytes -= sizes[key]
+
+    def __spill_path(self, key: str) -> Path:
+        return Path(self.__spill_directory, f"{self.__versions[key]}-{re.sub(r'[^0-9A-Za-z_.-]', '_', key)}.pickle")
+
+    def __spill(self, key: str, nbytes: int) -> bool:
+        """Whether the entry was spilled; one that can't be pickled stays in memory."""
+        if self.__versions[key] in self.__unpicklable_versions:
+            return False
+        self.__spill_directory.mkdir(parents=True, exist_ok=True)
+        path = self.__spill_path(key)
+        try:
+            with open(path, 'wb') as spill_file:
+                pickle.dump(self.__entries[key], spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as exception:
+            path.unlink(missing_ok=True)
+            self.__unpicklable_versions.add(self.__versions[key])
+            self.LOGGER.warning(f"Keeping the context entry '{key}' in memory, it can't be pickled: {exception}")
+            return False
+        self.__entries[key] = _SpilledEntry(path, nbytes)
+        self.LOGGER.info(f"Spilled the context entry '{key}' ({nbytes / 2**20:.1f} MiB) to {path}")
+        return True
+
+    def __load(self, key: str, spilled_entry: _SpilledEntry) -> typing.Any:
+        with open(spilled_entry.path, 'rb') as spill_file:
+            value = pickle.load(spill_file)
+        spilled_entry.path.unlink(missing_ok=True)
+        # Resident again: in-place modifications must not be lost
+        self.__entries[key] = value
+        self.LOGGER.info(f"Loaded the spilled context entry '{key}'")
+        return value
+
+    def __discard_spilled(self, key: str):
+        value = self.__entries.get(key)
+        if isinstance(value, _SpilledEntry):
+            value.path.unlink(missing_ok=True)
+
+    @property
+    def spilled_keys(self) -> list[str]:
+        return [key for key, value in self.__entries.items() if isinstance(value, _SpilledEntry)]
+
+    @property
+    def resident_nbytes(self) -> int:
+        return sum(
+            estimate_nbytes(value) for value in self.__entries.values() if not isinstance(value, _SpilledEntry)
+        )
+
+    def close(self):
+        """Remove the spill files."""
+        for key in self.spilled_keys:
+            self.__discard_spilled(key)
@@ -0,0 +1,123 @@
+import typing
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import arrow_frames as af
+import config_model as cfgm
+
+
+SLIDING_WINDOW_STRATEGY = 'sliding_window'
+
+
+@dataclass(frozen=True)
+class Fold:
+    """Train/validation windows of a time series as positional index ranges."""
+    number: int
+    train: slice
+    validation: slice
+
+    def train_index(self, index: pd.Index) -> pd.Index:
+        return index[self.train]
+
+    def validation_index(self, index: pd.Index) -> pd.Index:
+        return index[self.validation]
+
+
+class SlidingWindowSplitter:
+    """Time series splitter with a fixed size train window sliding by `step` rows,
+    each train window followed by `horizon` validation rows.
+
+    Folds are index ranges; `windows` exposes all folds at once as strided views
+    of a single feature matrix, so the number of folds doesn't multiply memory.
+    """
+
+    def __init__(self, window: int, step: int, horizon: int):
+        if window <= 0 or step <= 0 or horizon <= 0:
+            raise ValueError(f"Window, step and horizon must be positive: window={window}, step={step}, horizon={horizon}")
+        self.__window = window
+        self.__step = step
+        self.__horizon = horizon
+
+    @classmethod
+    def from_config(cls, machine_learning: cfgm.MachineLearning) -> 'SlidingWindowSplitter':
+        if machine_learning.cross_validation_strategy != SLIDING_WINDOW_STRATEGY:
+            raise ValueError(f"Unsupported cross-validation strategy '{machine_learning.cross_validation_strategy}'")
+        cross_validation = machine_learning.cross_validation
+        return cls(cross_validation.window, cross_validation.step, cross_validation.horizon)
+
+    @property
+    def window(self) -> int:
+        return self.__window
+
+    @property
+    def step(self) -> int:
+        return self.__step
+
+    @property
+    def horizon(self) -> int:
+        return self.__horizon
+
+    def n_folds(self, n_samples: int) -> int:
+        fold_span = self.__window + self.__horizon
+        if n_samples < fold_span:
+            return 0
+        return (n_samples - fold_span) // self.__step + 1
+
+    def split(self, n_samples: int) -> typing.Iterator[Fold]:
+        for number in range(self.n_folds(n_samples)):
+            train_begin = number * self.__step
+            train_end = train_begin + self.__window
+            yield Fold(
+                number,
+                slice(train_begin, train_end),
+                slice(train_end, train_end + self.__horizon)
+            )
+
+    def split_dataset(self, dataset: pd.DataFrame, split_time: datetime | None = None) -> typing.Iterator[Fold]:
+        """Folds over the dataset rows before `split_time`; later rows are left for the final test."""
+        return self.split(self.n_samples(dataset, split_time))
+
+    def holdout_fold(self, dataset: pd.DataFrame, split_time: datetime) -> Fold | None:
+        """The last train window before `split_time` followed by all rows from `split_time` on;
+        numbered after the folds of `split_dataset`."""
+        n_samples = self.n_samples(dataset, split_time)
+        if n_samples == 0 or n_samples == len(dataset):
+            return None
+        return Fold(
+            self.n_folds(n_samples),
+            slice(max(n_samples - self.__window, 0), n_samples),
+            slice(n_samples, len(dataset))
+        )
+
+    @staticmethod
+    def n_samples(dataset: pd.DataFrame, split_time: datetime | None = None) -> int:
+        if split_time is None:
+            return len(dataset)
+        return int(np.searchsorted(dataset.index.to_numpy(), np.datetime64(split_time), side='left'))
+
+    def windows(self, values: np.ndarray, n_samples: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Train windows (folds, window, ...) and validation windows (folds, horizon, ...)
+        as read-only views of `values`, fold by fold aligned with `split`."""
+        if n_samples is None:
+            n_samples = values.shape[0]
+        n_folds = self.n_folds(n_samples)
+        if n_folds == 0:
+            return (np.empty((0, self.__window) + values.shape[1:], dtype=values.dtype),
+                    np.empty((0, self.__horizon) + values.shape[1:], dtype=values.dtype))
+
+        train_windows = np.moveaxis(
+            np.lib.stride_tricks.sliding_window_view(values[:n_samples], self.__window, axis=0), -1, 1
+        )[::self.__step][:n_folds]
+        validation_windows = np.moveaxis(
+            np.lib.stride_tricks.sliding_window_view(values[self.__window:n_samples], self.__horizon, axis=0), -1, 1
+        )[::self.__step][:n_folds]
+
+        return train_windows, validation_windows
+
+
+def dataset_matrix(dataset: pd.DataFrame) -> np.ndarray:
+    """Feature matrix of a dataset; a view for single dtype datasets, one copy otherwise."""
+    return af.float_values(dataset)
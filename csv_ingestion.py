@@ -0,0 +1,117 @@
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as papq
+
+import config_logging as clog
+import config_model as cfgm
+
+
+LOGGER = clog.get_logger('CsvIngestion')
+
+# Parsed by Arrow's ISO 8601 parser, faster than strptime
+ISO_DATE_FORMATS = [
+    '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S%z', '%Y-%m-%dT%H:%M:%S%z'
+]
+
+
+def arrow_type(type_name: str) -> pa.DataType:
+    try:
+        return pa.type_for_alias(type_name)
+    except ValueError:
+        raise ValueError(f"Unknown Arrow type '{type_name}' (e.g. float64, int64, bool, string)") from None
+
+
+def convert_options(date_column: str, ingestion: cfgm.CsvIngestion) -> pacsv.ConvertOptions:
+    """Explicit types of the configured columns; the date column parsed with `date_format` only."""
+    # Dates with an offset are instants: Arrow parses them as UTC
+    date_type = pa.timestamp('ns', tz='UTC') if '%z' in ingestion.date_format else pa.timestamp('ns')
+    column_types = {column: arrow_type(type_name) for column, type_name in ingestion.column_types.items()}
+    column_types[date_column] = date_type
+    date_parser = pacsv.ISO8601 if ingestion.date_format in ISO_DATE_FORMATS else ingestion.date_format
+    return pacsv.ConvertOptions(column_types=column_types, timestamp_parsers=[date_parser])
+
+
+def _dictionary_columns(schema: pa.Schema) -> list[str]:
+    # Dictionary encoding of prices costs several times the rest of the conversion and saves nothing
+    return [field.name for field in schema if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)]
+
+
+def _in_time_zone(batch: pa.RecordBatch, date_column: str, time_zone: str | None) -> pa.RecordBatch:
+    if time_zone is None:
+        return batch
+    position = batch.schema.get_field_index(date_column)
+    dates = batch.column(position)
+    if dates.type.tz is None:
+        dates = pc.assume_timezone(dates, time_zone)
+    else:
+        dates = dates.cast(pa.timestamp(dates.type.unit, tz=time_zone))
+    return pa.RecordBatch.from_arrays(
+        [dates if number == position else column for number, column in enumerate(batch.columns)],
+        names=batch.schema.names
+    )
+
+
+def ingest_csv(csv_path: str, date_column: str, ingestion: cfgm.CsvIngestion, compression: str = 'snappy') -> int:
+    """Convert a CSV file into `ingestion.parquet_file_name` in one streaming pass; returns the rows written.
+
+    The file is parsed by the streaming Arrow reader `block_size` bytes at a time
+    and every block becomes a Parquet row group, so files larger than memory convert
+    in bounded memory. Columns absent from `column_types` get the type inferred from
+    the first block. The Parquet file is written to a temporary file and renamed into place.
+    """
+    parquet_path = Path(ingestion.parquet_file_name)
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = parquet_path.with_name(f".{parquet_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=ingestion.block_size),
+        convert_options=convert_options(date_column, ingestion)
+    )
+    rows = 0
+    writer = None
+    try:
+        for batch in reader:
+            batch = _in_time_zone(batch, date_column, ingestion.time_zone)
+            if writer is None:
+                writer = papq.ParquetWriter(str(temporary_path), batch.schema, compression=compression,
+                                            use_dictionary=_dictionary_columns(batch.schema))
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:
+            # A CSV file with a header only
+            batch = _in_time_zone(pa.RecordBatch.from_pylist([], schema=reader.schema), date_column, ingestion.time_zone)
+            writer = papq.ParquetWriter(str(temporary_path), batch.schema, compression=compression)
+        writer.close()
+        writer = None
+        os.replace(temporary_path, parquet_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if temporary_path.exists():
+            temporary_path.unlink()
+
+    LOGGER.info(f"Ingested {rows} rows of {csv_path} into {parquet_path}")
+    return rows
+
+
+def is_ingested(csv_path: str, ingestion: cfgm.CsvIngestion) -> bool:
+    """Whether the Parquet file exists and isn't older than the CSV file."""
+    parquet_path = Path(ingestion.parquet_file_name)
+    return parquet_path.is_file() and parquet_path.stat().st_mtime >= Path(csv_path).stat().st_mtime
+
+
+def read_ingested(date_column: str, ingestion: cfgm.CsvIngestion, arrow_backed: bool = False) -> pd.DataFrame:
+    """The ingested frame indexed by the date column, with Arrow-backed columns if `arrow_backed`."""
+    table = papq.read_table(ingestion.parquet_file_name)
+    index = pd.DatetimeIndex(table.column(date_column).to_pandas(), name=date_column)
+    table = table.drop([date_column])
+    dataframe = table.to_pandas(types_mapper=pd.ArrowDtype) if arrow_backed else table.to_pandas()
+    dataframe.index = index
+    return dataframe
@@ -2,13 +2,28 @@ from typing import Optional
 from enum import Enum
 from datetime import datetime
 from pprint import pformat
+import hashlib
 import os.path as path
 
 import pandas as pd
-import yfinance as yf
 
+import arrow_frames as af
 import config_model as cfgm
 import data_load_model as model
+import snapshot_store as snst
+
+
+def store_csv(data_frame: pd.DataFrame, file_path: str) -> bool:
+    """Write the frame as CSV unless the file has the same content already; whether it was written."""
+    data = data_frame.to_csv().encode()
+    if path.isfile(file_path) and path.getsize(file_path) == len(data):
+        with open(file_path, 'rb') as stored_file:
+            if hashlib.sha256(stored_file.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    with open(file_path, 'wb') as csv_file:
+        csv_file.write(data)
+    return True
+
 
 class AbstractDataLoader:
     def __init__(self, quoted_instrument: cfgm.QuotedInstrument):
@@ -19,8 +34,9 @@ class AbstractDataLoader:
 
 
 class RemoteDataLoader(AbstractDataLoader):
-    def __init__(self, quoted_instrument: cfgm.QuotedInstrument):
+    def __init__(self, quoted_instrument: cfgm.QuotedInstrument, arrow_backed: bool=False):
         super().__init__(quoted_instrument)
+        self.__arrow_backed = arrow_backed
 
     def load_data(self) -> model.RemoteData:
         data_loading_config = self._quoted_instrument.data_loading
@@ -39,6 +55,8 @@ class RemoteDataLoader(AbstractDataLoader):
                 start=remote_data_loading_config.time_range.begin_time,
                 end=remote_data_loading_config.time_range.end_time
             )
+            if self.__arrow_backed:
+                local_data_table = af.to_arrow_backed(local_data_table)
             remote_data = model.RemoteData(
                 remote_data_adapter,
                 remote_data_source_name,
@@ -54,15 +72,21 @@ class RemoteDataLoader(AbstractDataLoader):
         target_file_path = required_file_path if required_file_path else file_path
 
         data = self.load_data()
-        data_table = data.loaded_data
-        data_table.to_csv(target_file_path)
+        store_csv(data.loaded_data, target_file_path)
+        return data
+
+    def store_snapshot(self, snapshot_store: snst.SnapshotStore) -> model.RemoteData:
+        data = self.load_data()
+        snapshot_store.put_dataframe(self._quoted_instrument.ticker, data.loaded_data)
         return data
 
 
 class LocalDataLoader(AbstractDataLoader):
-    def __init__(self, quoted_instrument: cfgm.QuotedInstrument, remote_data_loader: Optional[RemoteDataLoader]=None):
+    def __init__(self, quoted_instrument: cfgm.QuotedInstrument, remote_data_loader: Optional[RemoteDataLoader]=None,
+                 arrow_backed: bool=False):
         super().__init__(quoted_instrument)
         self.__remote_data_loader = remote_data_loader
+        self.__arrow_backed = arrow_backed
 
     def load_data(self) -> model.LocalData:
         data_loading_config = self._quoted_instrument.data_loading
@@ -74,11 +98,21 @@ class LocalDataLoader(AbstractDataLoader):
             if not path.isfile(file_path):
                 raise FileNotFoundError(f"File {file_path} does not exist.")
 
-            data_frame = pd.read_csv(
-                file_path,
-                index_col=data_loading_config.date_column,
-                parse_dates=True
-            )
+            ingestion = data_loading_config.local_data_loading.ingestion
+            if ingestion is not None:
+                import csv_ingestion as csvi
+
+                if not csvi.is_ingested(file_path, ingestion):
+                    csvi.ingest_csv(file_path, data_loading_config.date_column, ingestion)
+                data_frame = csvi.read_ingested(data_loading_config.date_column, ingestion, arrow_backed=self.__arrow_backed)
+            elif self.__arrow_backed:
+                data_frame = af.read_csv(file_path, index_column=data_loading_config.date_column)
+            else:
+                data_frame = pd.read_csv(
+                    file_path,
+                    index_col=data_loading_config.date_column,
+                    parse_dates=True
+                )
         else:
             remote_data = self.__remote_data_loader.load_data()
             data_frame = remote_data.loaded_data
@@ -92,15 +126,15 @@ class LocalDataLoader(AbstractDataLoader):
         target_file_path = required_file_path if required_file_path else file_path
 
         data = self.load_data()
-        data_table = data.data.history_data()
-        data_table.to_csv(target_file_path)
+        store_csv(data.data.history_data(), target_file_path)
         return data
 
 
 class StrategyBasedDataLoader(AbstractDataLoader):
 
-    def __init__(self, quoted_instrument: cfgm.QuotedInstrument):
+    def __init__(self, quoted_instrument: cfgm.QuotedInstrument, arrow_backed: bool=False):
         super().__init__(quoted_instrument)
+        self.__arrow_backed = arrow_backed
 
     def load_data(self) -> model.ComplexData:
         data_loading_config = self._quoted_instrument.data_loading
@@ -128,15 +162,19 @@ class StrategyBasedDataLoader(AbstractDataLoader):
         else:
             raise ValueError(f"Data loading strategy {strategy_name} is not supported for remote data.")
 
-        remote_data_loader = RemoteDataLoader(self._quoted_instrument)
-        remote_data = remote_data_loader.store_data(required_file_path=target_remote_file_path)
+        remote_data_loader = RemoteDataLoader(self._quoted_instrument, arrow_backed=self.__arrow_backed)
+        if remote_config.snapshot_directory:
+            # The snapshot store keeps both the history and the latest download
+            remote_data = remote_data_loader.store_snapshot(snst.SnapshotStore(remote_config.snapshot_directory))
+        else:
+            remote_data = remote_data_loader.store_data(required_file_path=target_remote_file_path)
         # =================================================================
 
         # =================================================================
         target_local_file_path = None
         local_data_loader = None
         if model.DataLoadingStrategyName.LOAD_REMOTE_TO_LOCAL_AND_REMOTE_AS_LATEST == strategy_name:
-            local_data_loader = LocalDataLoader(self._quoted_instrument, remote_data_loader)
+            local_data_loader = LocalDataLoader(self._quoted_instrument, remote_data_loader, arrow_backed=self.__arrow_backed)
         else:
             raise ValueError(f"Data loading strategy {strategy_name} is not supported for local data.")
 
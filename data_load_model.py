@@ -7,8 +7,6 @@ import pandas as pd
 
 from dataclasses import dataclass
 
-import yfinance as yf
-
 
 class RemoteDataSourceName(Enum):
     YAHOO_FINANCE = 'Yahoo! Finance'
@@ -111,8 +109,22 @@ class BasicLocalDataAdapter(IDataAdapter):
 
 class YahooFinanceRemoteDataAdapter(IDataAdapter):
     def __init__(self, ticker_name):
+        import yfinance as yf
+
+        self.__ticker_name = ticker_name
         self.__ticker = yf.Ticker(ticker_name)
 
+    def __deepcopy__(self, memo):
+        # A handle of the remote source holding no data; sessions and locks can't be copied
+        return self
+
+    def __getstate__(self):
+        # Pickled as the ticker name only, the session is opened again on unpickling
+        return {'ticker_name': self.__ticker_name}
+
+    def __setstate__(self, state):
+        self.__init__(state['ticker_name'])
+
     def history_data(self, start: Optional[datetime]=None, end: Optional[datetime]=None, interval: str = '1d') -> pd.DataFrame:
         return self.__ticker.history(interval=interval, start=start, end=end, keepna=True)
 
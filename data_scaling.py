@@ -0,0 +1,162 @@
+import json
+import typing
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import arrow_frames as af
+
+
+SCALERS = ['standardization', 'min_max']
+
+
+class RunningMoments:
+    """Per column count, mean, sum of squared deviations (M2), minimum and maximum,
+    accumulated chunk by chunk: Welford's update merged with Chan's parallel formula.
+
+    Chunks may come from any source (frame slices, Arrow record batches...), so the
+    statistics of data larger than memory are fitted in one pass. NaNs are skipped.
+    """
+
+    def __init__(self, n_columns: int):
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.mean = np.zeros(n_columns, dtype=np.float64)
+        self.m2 = np.zeros(n_columns, dtype=np.float64)
+        self.minimum = np.full(n_columns, np.inf)
+        self.maximum = np.full(n_columns, -np.inf)
+
+    def update(self, values: np.ndarray) -> 'RunningMoments':
+        """Add a chunk of rows (rows, columns)."""
+        values = np.asarray(values, dtype=np.float64)
+        finite = ~np.isnan(values)
+        chunk_count = finite.sum(axis=0)
+        if not chunk_count.any():
+            return self
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk_mean = np.where(chunk_count > 0, np.nansum(values, axis=0) / chunk_count, 0.0)
+        chunk_m2 = (np.where(finite, values - chunk_mean, 0.0) ** 2).sum(axis=0)
+        self.minimum = np.minimum(self.minimum, np.where(finite, values, np.inf).min(axis=0))
+        self.maximum = np.maximum(self.maximum, np.where(finite, values, -np.inf).max(axis=0))
+
+        total_count = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk_share = np.where(total_count > 0, chunk_count / total_count, 0.0)
+        self.mean = self.mean + delta * chunk_share
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * chunk_share
+        self.count = total_count
+        return self
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance (ddof=1), as pandas `std` uses."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+@dataclass
+class FittedScaler:
+    """Affine transform `(x - offset) / scale` of the columns of an instrument."""
+    scaler: str
+    columns: list[str]
+    offset: list[float]
+    scale: list[float]
+    fitted_rows: int
+
+    @classmethod
+    def from_moments(cls, scaler: str, columns: list[str], moments: RunningMoments) -> 'FittedScaler':
+        if scaler == 'standardization':
+            offset, scale = moments.mean, moments.std
+        elif scaler == 'min_max':
+            offset, scale = moments.minimum, moments.maximum - moments.minimum
+        else:
+            raise ValueError(f"Unknown scaler '{scaler}'. Scalers: {SCALERS}")
+        # Constant or empty columns are only shifted
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        offset = np.where(np.isfinite(offset), offset, 0.0)
+        return cls(scaler, list(columns), offset.tolist(), scale.tolist(), int(moments.count.max(initial=0)))
+
+    def transform(self, values: np.ndarray) -> np.ndarray:
+        """Scale the float array (rows, columns) in place."""
+        values -= np.asarray(self.offset)
+        values /= np.asarray(self.scale)
+        return values
+
+    def inverse_transform(self, values: np.ndarray) -> np.ndarray:
+        values *= np.asarray(self.scale)
+        values += np.asarray(self.offset)
+        return values
+
+    def transform_frame(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        """Scale the columns of the frame, writing them back in place."""
+        values = self.transform(af.float_values(dataframe[self.columns], copy=True))
+        if af.is_arrow_backed(dataframe):
+            dataframe[self.columns] = af.to_arrow_backed(pd.DataFrame(values, index=dataframe.index, columns=self.columns))
+        else:
+            dataframe[self.columns] = values
+        return dataframe
+
+    def transform_values(self, values: typing.MutableMapping[str, float]) -> typing.MutableMapping[str, float]:
+        """Scale the fitted columns present in a single row, e.g. of a streamed bar."""
+        for column, offset, scale in zip(self.columns, self.offset, self.scale):
+            if column in values:
+                values[column] = (float(values[column]) - offset) / scale
+        return values
+
+
+def fit_scaler(chunks: typing.Iterable[np.ndarray], columns: list[str], scaler: str) -> FittedScaler:
+    """Fit `scaler` in one pass over the chunks (rows, columns) of the training rows."""
+    moments = RunningMoments(len(columns))
+    for chunk in chunks:
+        moments.update(chunk)
+    return FittedScaler.from_moments(scaler, columns, moments)
+
+
+def frame_chunks(dataframe: pd.DataFrame, columns: list[str], chunk_size: int) -> typing.Iterator[np.ndarray]:
+    column_positions = [dataframe.columns.get_loc(column) for column in columns]
+    for begin in range(0, len(dataframe), chunk_size):
+        yield af.float_values(dataframe.iloc[begin:begin + chunk_size, column_positions])
+
+
+class ScalingParameters:
+    """Scalers fitted per instrument, applied in order; persisted as JSON so new data
+    (e.g. streamed bars) is scaled exactly as the training data without refitting."""
+
+    def __init__(self, split_time: str | None = None,
+                 scalers: typing.Mapping[str, list[FittedScaler]] | None = None):
+        self.split_time = split_time
+        self.scalers = dict[str, list[FittedScaler]](scalers or {})
+
+    def transform_frame(self, ticker: str, dataframe: pd.DataFrame) -> pd.DataFrame:
+        for fitted_scaler in self.scalers.get(ticker, []):
+            fitted_scaler.transform_frame(dataframe)
+        return dataframe
+
+    def transform_values(self, ticker: str, values: typing.MutableMapping[str, float]) -> typing.MutableMapping[str, float]:
+        for fitted_scaler in self.scalers.get(ticker, []):
+            fitted_scaler.transform_values(values)
+        return values
+
+    def save(self, file_path: str):
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(file_path).write_text(json.dumps({
+            'split_time': self.split_time,
+            'scalers': {
+                ticker: [asdict(fitted_scaler) for fitted_scaler in fitted_scalers]
+                for ticker, fitted_scalers in self.scalers.items()
+            }
+        }, indent=2))
+
+    @classmethod
+    def load(cls, file_path: str) -> 'ScalingParameters':
+        parameters = json.loads(Path(file_path).read_text())
+        return cls(parameters['split_time'], {
+            ticker: [FittedScaler(**fitted_scaler) for fitted_scaler in fitted_scalers]
+            for ticker, fitted_scalers in parameters['scalers'].items()
+        })
@@ -0,0 +1,92 @@
+import typing
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import arrow_frames as af
+
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+VOLUME_COLUMN = 'volume'
+
+VALIDATION_RULES = [
+    'missing_value',
+    'duplicate_index',
+    'non_monotonic_index',
+    'gap',
+    'high_below_low',
+    'open_outside_range',
+    'close_outside_range',
+    'non_positive_price',
+    'negative_volume',
+]
+
+
+def validate_instruments(frames: typing.Mapping[str, pd.DataFrame],
+                         max_gap: timedelta = timedelta(days=5)) -> pd.DataFrame:
+    """Violation counts of `VALIDATION_RULES` per instrument (rows) of tended frames.
+
+    All instruments are stacked into one matrix and every rule is a single vectorized
+    comparison over it; counts per instrument are segment sums. Absent columns (e.g.
+    no volume) are skipped. Duplicates are counted once per extra entry. A gap is a
+    step between consecutive index entries longer than `max_gap`.
+    """
+    tickers = list(frames.keys())
+    columns = PRICE_COLUMNS + [VOLUME_COLUMN]
+    lengths = np.array([len(frames[ticker]) for ticker in tickers], dtype=np.int64)
+    total_rows = int(lengths.sum())
+    segment_begins = np.r_[0, np.cumsum(lengths)[:-1]].astype(np.int64)
+
+    values = np.full((total_rows, len(columns)), np.nan, dtype=np.float64)
+    present = np.zeros((len(tickers), len(columns)), dtype=bool)
+    index_values = np.empty(total_rows, dtype=np.int64)
+    for number, ticker in enumerate(tickers):
+        frame = frames[ticker]
+        begin, end = segment_begins[number], segment_begins[number] + lengths[number]
+        frame_columns = [column for column in columns if column in frame.columns]
+        column_positions = [columns.index(column) for column in frame_columns]
+        values[begin:end, column_positions] = af.float_values(frame[frame_columns])
+        present[number, column_positions] = True
+        index_values[begin:end] = pd.DatetimeIndex(frame.index).asi8
+
+    open_values, high, low, close, volume = (values[:, position] for position in range(len(columns)))
+    with np.errstate(invalid='ignore'):
+        index_steps = np.diff(index_values, prepend=index_values[:1])
+        # The first row of each instrument has no predecessor
+        first_rows = np.zeros(total_rows, dtype=bool)
+        first_rows[segment_begins[lengths > 0]] = True
+        index_steps[first_rows] = 1
+
+        # Duplicates need not be adjacent in a non-monotonic index: compare in sorted order
+        segment_numbers = np.arange(len(tickers)).repeat(lengths)
+        sorted_order = np.lexsort((index_values, segment_numbers))
+        duplicates = np.zeros(total_rows, dtype=bool)
+        duplicates[sorted_order[1:]] = (np.diff(index_values[sorted_order]) == 0) & \
+            (np.diff(segment_numbers[sorted_order]) == 0)
+
+        violations = np.column_stack([
+            np.isnan(values).sum(axis=1) - (~present).sum(axis=1).repeat(lengths),
+            duplicates,
+            index_steps < 0,
+            index_steps > pd.Timedelta(max_gap).value,
+            high < low,
+            (open_values < low) | (open_values > high),
+            (close < low) | (close > high),
+            (values[:, :len(PRICE_COLUMNS)] <= 0).any(axis=1),
+            volume < 0,
+        ]).astype(np.int64)
+
+    non_empty = lengths > 0
+    counts = np.zeros((len(tickers), len(VALIDATION_RULES)), dtype=np.int64)
+    if total_rows:
+        counts[non_empty] = np.add.reduceat(violations, segment_begins[non_empty], axis=0)
+
+    summary = pd.DataFrame(counts, index=pd.Index(tickers, name='ticker'), columns=VALIDATION_RULES)
+    summary.insert(0, 'rows', lengths)
+    largest_steps = np.zeros(len(tickers), dtype=np.int64)
+    if total_rows:
+        steps = np.where(first_rows, 0, index_steps)
+        largest_steps[non_empty] = np.maximum.reduceat(steps, segment_begins[non_empty])
+    summary['largest_gap'] = pd.to_timedelta(largest_steps)
+    return summary
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import arrow_frames as af
+import config_logging as clog
+import file_system as fs
+
+
+class DatasetFormat(Enum):
+    CSV = 'csv'
+    PARQUET = 'parquet'
+    FEATHER = 'feather'
+    NPY = 'npy'
+
+    @classmethod
+    def from_str(cls, value: str):
+        if value == cls.CSV.value:
+            return cls.CSV
+        elif value == cls.PARQUET.value:
+            return cls.PARQUET
+        elif value == cls.FEATHER.value:
+            return cls.FEATHER
+        elif value == cls.NPY.value:
+            return cls.NPY
+        else:
+            raise ValueError(f"Unknown DatasetFormat: {value}")
+
+    @classmethod
+    def has_value(cls, value: str):
+        return value in cls._value2member_map_
+
+    @classmethod
+    def values(cls):
+        return list(cls._value2member_map_.values())
+
+
+CSV_COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'bz2': '.bz2',
+    'xz': '.xz',
+    'zstd': '.zst',
+}
+PARQUET_COMPRESSIONS = ['snappy', 'gzip', 'brotli', 'lz4', 'zstd']
+FEATHER_COMPRESSIONS = ['lz4', 'zstd', 'uncompressed']
+
+
+class DatasetExporter:
+    """Writes datasets concurrently in a binary or CSV format.
+
+    Every file is written to a temporary file first and renamed into place, so readers
+    never see a partial dataset. The content hash of each dataset is kept in a
+    `<file>.sha256` sidecar; a dataset whose hash matches the sidecar isn't rewritten.
+    The `npy` format stores the values as a float64 matrix readable as a memmap,
+    with the index in `<name>.index.npy` and columns and dtypes in `<name>.schema.json`.
+    """
+
+    LOGGER = clog.get_logger('DatasetExporter')
+
+    def __init__(self,
+                 directory: str='data/generated/datasets',
+                 dataset_format: DatasetFormat=DatasetFormat.CSV,
+                 compression: str | None = None,
+                 max_workers: int=4):
+        self.__check_compression(dataset_format, compression)
+        self.__directory = Path(directory)
+        self.__dataset_format = dataset_format
+        self.__compression = compression
+        self.__max_workers = max_workers
+
+    @staticmethod
+    def __check_compression(dataset_format: DatasetFormat, compression: str | None):
+        if compression is None:
+            return
+        if dataset_format == DatasetFormat.CSV and compression not in CSV_COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported CSV compression '{compression}'. Supported: {list(CSV_COMPRESSION_SUFFIXES)}")
+        if dataset_format == DatasetFormat.PARQUET and compression not in PARQUET_COMPRESSIONS:
+            raise ValueError(f"Unsupported Parquet compression '{compression}'. Supported: {PARQUET_COMPRESSIONS}")
+        if dataset_format == DatasetFormat.FEATHER and compression not in FEATHER_COMPRESSIONS:
+            raise ValueError(f"Unsupported Feather compression '{compression}'. Supported: {FEATHER_COMPRESSIONS}")
+        if dataset_format == DatasetFormat.NPY:
+            raise ValueError("The npy format is memory mapped and can't be compressed.")
+
+    def dataset_path(self, dataset_name: str) -> Path:
+        if self.__dataset_format == DatasetFormat.CSV:
+            return Path(self.__directory, dataset_name + '.csv' + CSV_COMPRESSION_SUFFIXES.get(self.__compression, ''))
+        return Path(self.__directory, dataset_name + '.' + self.__dataset_format.value)
+
+    def export(self, datasets: typing.Mapping[str, pd.DataFrame]) -> dict[str, Path]:
+        """Write all datasets concurrently; returns the paths of the datasets actually written."""
+        fs.make_directory(str(self.__directory))
+        with ThreadPoolExecutor(max_workers=self.__max_workers, thread_name_prefix='DatasetExport') as executor:
+            futures = {
+                dataset_name: executor.submit(self.export_dataset, dataset_name, dataset)
+                for dataset_name, dataset in datasets.items()
+            }
+            written_paths = {dataset_name: future.result() for dataset_name, future in futures.items()}
+        return {dataset_name: path for dataset_name, path in written_paths.items() if path is not None}
+
+    def export_dataset(self, dataset_name: str, dataset: pd.DataFrame) -> Path | None:
+        dataset_path = self.dataset_path(dataset_name)
+        hash_path = Path(str(dataset_path) + '.sha256')
+        content_hash = self.content_hash(dataset)
+
+        if dataset_path.is_file() and hash_path.is_file() and hash_path.read_text().strip() == content_hash:
+            self.LOGGER.info(f"[{dataset_name}] Unchanged, keeping {dataset_path}")
+            return None
+
+        self.LOGGER.info(f"[{dataset_name}] Writing {dataset.shape} to {dataset_path}...")
+        if self.__dataset_format == DatasetFormat.CSV:
+            _write_atomically(dataset_path, lambda path: dataset.to_csv(path, compression=self.__compression))
+        elif self.__dataset_format == DatasetFormat.PARQUET:
+            _write_atomically(dataset_path, lambda path: dataset.to_parquet(path, compression=self.__compression))
+        elif self.__dataset_format == DatasetFormat.FEATHER:
+            # Feather keeps no index: store it as the first column
+            _write_atomically(dataset_path, lambda path: dataset.reset_index().to_feather(path, compression=self.__compression))
+        elif self.__dataset_format == DatasetFormat.NPY:
+            self.__write_npy(dataset_name, dataset)
+        else:
+            raise ValueError(f"Dataset format {self.__dataset_format} is not supported.")
+
+        _write_atomically(hash_path, lambda path: Path(path).write_text(content_hash))
+        return dataset_path
+
+    def __write_npy(self, dataset_name: str, dataset: pd.DataFrame):
+        schema = {
+            'columns': [str(column) for column in dataset.columns],
+            'dtypes': [str(dtype) for dtype in dataset.dtypes],
+            'index_name': dataset.index.name,
+            'index_dtype': str(dataset.index.dtype),
+            'shape': list(dataset.shape),
+        }
+
+        def write_values(path: str):
+            values = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=dataset.shape)
+            values[...] = dataset.to_numpy(dtype=np.float64)
+            values.flush()
+            del values
+
+        def write_index(path: str):
+            with open(path, 'wb') as index_file:
+                np.save(index_file, dataset.index.to_numpy(), allow_pickle=False)
+
+        _write_atomically(Path(self.__directory, dataset_name + '.index.npy'), write_index)
+        _write_atomically(Path(self.__directory, dataset_name + '.schema.json'),
+                          lambda path: Path(path).write_text(json.dumps(schema, indent=2)))
+        # The values file goes last: it marks the dataset complete
+        _write_atomically(self.dataset_path(dataset_name), write_values)
+
+    def content_hash(self, dataset: pd.DataFrame) -> str:
+        content_hash = hashlib.sha256()
+        content_hash.update(f"{self.__dataset_format.value}:{self.__compression}".encode())
+        content_hash.update(repr([(str(column), str(dtype)) for column, dtype in dataset.dtypes.items()]).encode())
+        content_hash.update(repr((dataset.index.name, str(dataset.index.dtype))).encode())
+        content_hash.update(pd.util.hash_pandas_object(dataset, index=True).to_numpy().tobytes())
+        return content_hash.hexdigest()
+
+
+def _write_atomically(target_path: Path, write: typing.Callable[[str], typing.Any]):
+    temporary_path = target_path.with_name(f".{target_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        write(str(temporary_path))
+        os.replace(temporary_path, target_path)
+    finally:
+        if temporary_path.exists():
+            temporary_path.unlink()
+
+
+def load_dataset(dataset_path: str, mmap: bool=True, arrow_backed: bool=False) -> pd.DataFrame:
+    """Read a dataset written by `DatasetExporter`; npy values stay memory mapped if `mmap`,
+    Parquet and Feather columns stay Arrow-backed if `arrow_backed`."""
+    path = Path(dataset_path)
+    if path.suffix == '.parquet':
+        return af.read_parquet(str(path)) if arrow_backed else pd.read_parquet(path)
+    if path.suffix == '.feather':
+        dataset = af.read_feather(str(path)) if arrow_backed else pd.read_feather(path)
+        return dataset.set_index(dataset.columns[0])
+    if path.suffix == '.npy':
+        dataset_name = path.name[:-len('.npy')]
+        schema = json.loads(Path(path.parent, dataset_name + '.schema.json').read_text())
+        values = np.load(path, mmap_mode='r' if mmap else None)
+        index = pd.Index(np.load(Path(path.parent, dataset_name + '.index.npy')), name=schema['index_name'])
+        dataset = pd.DataFrame(values, index=index, columns=schema['columns'], copy=False)
+        float_columns = [column for column, dtype in zip(schema['columns'], schema['dtypes']) if dtype == 'float64']
+        if len(float_columns) == len(schema['columns']):
+            return dataset
+        # Restoring other dtypes costs one copy
+        return dataset.astype(dict(zip(schema['columns'], schema['dtypes'])))
+    return pd.read_csv(path, index_col=0, parse_dates=True)
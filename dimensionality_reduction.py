@@ -0,0 +1,71 @@
+import typing
+
+import numpy as np
+
+
+class RandomizedPCA:
+    """Principal components by randomized truncated SVD (Halko, Martinsson, Tropp).
+
+    The range of the centered data is sampled with `n_components + oversampling`
+    random projections refined by `power_iterations` subspace iterations, so fitting
+    costs O(rows x columns x components) instead of the O(rows x columns^2) of a full
+    SVD: thousands of columns stay tractable. With `standardize` the columns are scaled
+    to unit variance first, so prices and volumes weigh alike. Rows with NaNs are not
+    fitted on and project to NaNs.
+    """
+
+    def __init__(self, n_components: int, oversampling: int = 10, power_iterations: int = 4,
+                 standardize: bool = True, random_state: int | None = 0):
+        if n_components <= 0:
+            raise ValueError(f"The number of components must be positive: {n_components}")
+        self.n_components = n_components
+        self.oversampling = oversampling
+        self.power_iterations = power_iterations
+        self.standardize = standardize
+        self.random_state = random_state
+        self.mean_: np.ndarray | None = None
+        self.scale_: np.ndarray | None = None
+        self.components_: np.ndarray | None = None
+        self.explained_variance_ratio_: np.ndarray | None = None
+
+    def fit(self, values: np.ndarray) -> 'RandomizedPCA':
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values).any(axis=1)]
+        n_rows, n_columns = values.shape
+        if self.n_components > min(n_rows, n_columns):
+            raise ValueError(f"Cannot fit {self.n_components} components on {n_rows} complete rows of {n_columns} columns")
+
+        self.mean_ = values.mean(axis=0)
+        scale = values.std(axis=0, ddof=1) if self.standardize and n_rows > 1 else np.ones(n_columns)
+        self.scale_ = np.where(scale > 0, scale, 1.0)
+        centered = (values - self.mean_) / self.scale_
+
+        random_generator = np.random.default_rng(self.random_state)
+        n_samples = min(self.n_components + self.oversampling, n_columns)
+        basis, _ = np.linalg.qr(centered @ random_generator.standard_normal((n_columns, n_samples)))
+        for _ in range(self.power_iterations):
+            # Re-orthonormalized in between: the plain powers lose the small singular values
+            basis, _ = np.linalg.qr(centered.T @ basis)
+            basis, _ = np.linalg.qr(centered @ basis)
+
+        _, singular_values, right_vectors = np.linalg.svd(basis.T @ centered, full_matrices=False)
+        self.components_ = right_vectors[:self.n_components]
+        total_variance = (centered ** 2).sum()
+        self.explained_variance_ratio_ = singular_values[:self.n_components] ** 2 / total_variance \
+            if total_variance > 0 else np.zeros(self.n_components)
+        return self
+
+    def transform(self, values: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """Project the rows batch by batch: only one batch of centered data is held at a time."""
+        if self.components_ is None:
+            raise ValueError('The PCA is not fitted')
+        projected = np.empty((len(values), self.n_components), dtype=np.float64)
+        for begin in range(0, len(values), batch_size):
+            batch = (np.asarray(values[begin:begin + batch_size], dtype=np.float64) - self.mean_) / self.scale_
+            projected[begin:begin + batch_size] = batch @ self.components_.T
+        return projected
+
+    def batches(self, chunks: typing.Iterable[np.ndarray]) -> typing.Iterator[np.ndarray]:
+        """Project chunks of rows as they come, e.g. read out of core."""
+        for chunk in chunks:
+            yield self.transform(chunk)
@@ -1,29 +1,214 @@
+import typing
+
+import numpy as np
 import bokeh as bkh
+import bokeh.events as bkhe
+import bokeh.models as bkhm
+import bokeh.palettes as bkhpl
 import bokeh.plotting as bkhp
 
 
-def create_2d_figure(title: str, label_abscissa: str = 'x', label_ordinate: str = 'y') -> bkhp.figure:
-    return bkhp.figure(title=title, x_axis_label=label_abscissa, y_axis_label=label_ordinate, x_axis_type="datetime", y_axis_type=None)
+DOWNSAMPLING_METHODS = ['lttb', 'minmax']
+
+
+def create_2d_figure(title: str, label_abscissa: str = 'x', label_ordinate: str = 'y',
+                     webgl: bool = False, width: int = 1200) -> bkhp.figure:
+    """With `webgl` the lines are drawn by the GPU, which keeps large series smooth on pan and zoom."""
+    return bkhp.figure(title=title, x_axis_label=label_abscissa, y_axis_label=label_ordinate, x_axis_type="datetime", y_axis_type=None,
+                       output_backend='webgl' if webgl else 'canvas', width=width)
+
 
+def plot_2d_line(figure: bkhp.figure, x, y, label, width: int = 2,
+                 max_points: int | None = None, method: str = 'lttb', color: str | None = None):
+    """Plot a line; with `max_points` only a downsampled shape of the series is sent to the browser."""
+    series = DownsampledSeries(x, y, max_points=max_points, method=method)
+    return figure.line('x', 'y', source=series.source, legend_label=label, line_width=width,
+                       **({'line_color': color} if color is not None else {}))
 
-def plot_2d_line(figure: bkhp.figure, x, y, label, width: int = 2):
-    return figure.line(x, y, legend_label=label, line_width=width)
 
+def plot_2d_lines(figure: bkhp.figure, x, ys: typing.Mapping[str, typing.Any], width: int = 2,
+                  max_points: int | None = None, method: str = 'lttb') -> list['DownsampledSeries']:
+    """Plot series sharing the abscissa `x`, e.g. the columns of a dataset: `ys={'open': dataset['open'], ...}`.
 
-def plot_2d_lines(figure: bkhp.figure, x, y, label, width: int = 2):
-    figure.multi_line()
-    return figure.line(x, y, legend_label=label, line_width=width)
+    Returns the downsampled series, to be passed to `enable_zoom_reaggregation`.
+    """
+    colors = bkhpl.Category10[10]
+    series_list = []
+    for number, (label, y) in enumerate(ys.items()):
+        series = DownsampledSeries(x, y, max_points=max_points, method=method)
+        figure.line('x', 'y', source=series.source, legend_label=str(label), line_width=width,
+                    line_color=colors[number % len(colors)])
+        series_list.append(series)
+    return series_list
 
 
 def show_2d_figure(figure: bkhp.figure):
     bkhp.show(figure)
 
 
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `n_out` points preserving the visual shape.
+
+    `x` must be sorted; the first and the last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+
+    # Buckets of the points between the first and the last ones
+    bucket_edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for bucket in range(n_out - 2):
+        begin, end = bucket_edges[bucket], bucket_edges[bucket + 1]
+        # The average point of the next bucket is the third triangle vertex
+        next_begin, next_end = end, bucket_edges[bucket + 2] if bucket + 2 < n_out - 1 else n
+        next_x, next_y = x[next_begin:next_end].mean(), y[next_begin:next_end].mean()
+
+        areas = np.abs(
+            (x[selected] - next_x) * (y[begin:end] - y[selected])
+            - (x[selected] - x[begin:end]) * (next_y - y[selected])
+        )
+        selected = begin + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def min_max_indices(x: np.ndarray, y: np.ndarray, n_bins: int) -> np.ndarray:
+    """Indices of the first, last, minimum and maximum points of each of `n_bins`
+    equal width abscissa bins (i.e. pixels): no spike of the series is lost.
+
+    `x` must be sorted. Runs in O(n).
+    """
+    n = len(x)
+    if n <= 4 * n_bins:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    if x[-1] == x[0]:
+        # A single abscissa: one bin
+        bins = np.zeros(n, dtype=np.int64)
+    else:
+        bins = np.minimum(((x - x[0]) / (x[-1] - x[0]) * n_bins).astype(np.int64), n_bins - 1)
+    bin_begins = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    bin_ends = np.r_[bin_begins[1:], n]
+    bin_sizes = bin_ends - bin_begins
+
+    minimums = np.minimum.reduceat(y, bin_begins)
+    maximums = np.maximum.reduceat(y, bin_begins)
+    # Positions of the first minimum and maximum of each bin
+    bin_numbers = np.repeat(np.arange(len(bin_begins)), bin_sizes)
+    minimum_positions = np.flatnonzero(y == np.repeat(minimums, bin_sizes))
+    maximum_positions = np.flatnonzero(y == np.repeat(maximums, bin_sizes))
+    _, first_minimums = np.unique(bin_numbers[minimum_positions], return_index=True)
+    _, first_maximums = np.unique(bin_numbers[maximum_positions], return_index=True)
+
+    return np.unique(np.concatenate([
+        bin_begins, bin_ends - 1, minimum_positions[first_minimums], maximum_positions[first_maximums]
+    ]))
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: int, method: str = 'lttb') -> np.ndarray:
+    if method == 'lttb':
+        return lttb_indices(x, y, max_points)
+    elif method == 'minmax':
+        # Up to 4 points per bin
+        return min_max_indices(x, y, max(max_points // 4, 1))
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}'. Methods: {DOWNSAMPLING_METHODS}")
+
+
+class DownsampledSeries:
+    """A series kept in full on the Python side, with a downsampled `source` for Bokeh.
+
+    The source holds at most `max_points` points of the visible abscissa range;
+    `update` re-aggregates it for a new range, e.g. after a zoom.
+    """
+
+    def __init__(self, x, y, max_points: int | None = None, method: str = 'lttb'):
+        if method not in DOWNSAMPLING_METHODS:
+            raise ValueError(f"Unknown downsampling method '{method}'. Methods: {DOWNSAMPLING_METHODS}")
+        x = np.asarray(x)
+        y = np.asarray(y, dtype=np.float64)
+        if max_points is not None:
+            # Gaps would spoil the bin extrema
+            finite = np.isfinite(y)
+            x, y = x[finite], y[finite]
+        self.__x = x
+        self.__y = y
+        self.__is_datetime = np.issubdtype(self.__x.dtype, np.datetime64)
+        # Datetime abscissas as int64 nanoseconds, the order of Bokeh range milliseconds
+        self.__x_numeric = self.__x.astype('datetime64[ns]').view(np.int64) if self.__is_datetime \
+            else self.__x.astype(np.float64)
+        self.__max_points = max_points
+        self.__method = method
+        self.source = bkhm.ColumnDataSource(data=self.__data(0, len(self.__x)))
+
+    def __data(self, begin: int, end: int) -> dict[str, np.ndarray]:
+        x, y = self.__x[begin:end], self.__y[begin:end]
+        if self.__max_points is not None:
+            indices = downsample_indices(self.__x_numeric[begin:end], y, self.__max_points, self.__method)
+            x, y = x[indices], y[indices]
+        return {'x': x, 'y': y}
+
+    def update(self, x_start: float | None, x_end: float | None):
+        """Re-aggregate for the abscissa range given in Bokeh units (milliseconds for datetimes)."""
+        scale = 1_000_000 if self.__is_datetime else 1
+        begin = 0 if x_start is None else int(np.searchsorted(self.__x_numeric, x_start * scale, side='left'))
+        end = len(self.__x) if x_end is None else int(np.searchsorted(self.__x_numeric, x_end * scale, side='right'))
+        # One point beyond each side, so the line reaches the plot borders
+        self.source.data = self.__data(max(begin - 1, 0), min(end + 1, len(self.__x)))
+
+    def __len__(self) -> int:
+        return len(self.__x)
+
+
+def enable_zoom_reaggregation(figure: bkhp.figure, series: typing.Iterable[DownsampledSeries]):
+    """Re-aggregate the series to the visible range after every pan or zoom.
+
+    Python callbacks run only in a Bokeh server document (`bokeh serve` or `serve_2d_figure`);
+    a static `show_2d_figure` page keeps the overview downsampling.
+    """
+    series = list(series)
+
+    def reaggregate(event: bkhe.RangesUpdate):
+        for item in series:
+            item.update(event.x0, event.x1)
+
+    figure.on_event(bkhe.RangesUpdate, reaggregate)
+
+
+def serve_2d_figure(figure_factory: typing.Callable[[], bkhp.figure], port: int = 5006):
+    """Serve figures with zoom re-aggregation; `figure_factory` builds a new figure per browser session."""
+    from bokeh.server.server import Server
+
+    def document(doc):
+        doc.add_root(figure_factory())
+
+    server = Server({'/': document}, port=port)
+    server.start()
+    server.io_loop.add_callback(server.show, '/')
+    server.io_loop.start()
+
+
 # figure = dioplot.create_2d_figure(
 #     title='Акции Tesla',
-#     label_abscissa='Время', label_ordinate='Стоимость, $'
+#     label_abscissa='Время', label_ordinate='Стоимость, $',
+#     webgl=True
 # )
 # dioplot.plot_2d_line(
-#     figure, x=dataset_target.index, y=dataset_target['open'], label='open'
+#     figure, x=dataset_target.index, y=dataset_target['open'], label='open', max_points=2000
 # )
-# dioplot.show_2d_figure(figure)
\ No newline at end of file
+# dioplot.show_2d_figure(figure)
+#
+# def zoomable_figure():
+#     figure = dioplot.create_2d_figure(title='Акции Tesla', webgl=True)
+#     series = dioplot.plot_2d_lines(
+#         figure, x=dataset_target.index, ys={'open': dataset_target['open'], 'close': dataset_target['close']},
+#         max_points=2000, method='minmax'
+#     )
+#     dioplot.enable_zoom_reaggregation(figure, series)
+#     return figure
+# dioplot.serve_2d_figure(zoomable_figure)
@@ -0,0 +1,324 @@
+import typing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import arrow_frames as af
+import config_model as cfgm
+
+
+COLUMNS_OHLC_DEFAULT = {
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close'
+}
+
+# Single price columns of instruments reduced by the data treatment, in the order of preference
+PRICE_PROXY_COLUMNS = ['OHLC', 'HLC', 'close']
+
+
+# Every operation takes (time x instrument) frames and returns a frame of the same shape
+FEATURE_OPERATIONS: dict[str, typing.Callable[..., pd.DataFrame]] = {
+    'mean': lambda *inputs: sum(inputs[1:], inputs[0]) / len(inputs),
+    'sub': lambda minuend, subtrahend: minuend - subtrahend,
+    # augend + scale * addend, e.g. Bollinger Bands
+    'add_scaled': lambda augend, addend, scale=1.0: augend + (addend * scale),
+    'diff': lambda prices, periods=1: prices.diff(periods=periods),
+    'shift': lambda prices, periods=1: prices.shift(periods),
+    'rolling_mean': lambda prices, window: prices.rolling(window=window).mean(),
+    'rolling_min': lambda prices, window: prices.rolling(window=window).min(),
+    'rolling_max': lambda prices, window: prices.rolling(window=window).max(),
+    'rolling_std': lambda prices, window: prices.rolling(window=window).std(),
+    'ewm_mean': lambda prices, span: prices.ewm(span=span, adjust=False).mean(),
+    # Stochastic oscillator %K: position of the price in the low-high range, percents
+    'stochastic_k': lambda prices, lows, highs: 100*((prices - lows) / (highs - lows) ),
+}
+
+
+def _feature(operation: str, *inputs: str, **parameters) -> cfgm.FeatureDefinition:
+    return cfgm.FeatureDefinition(operation=operation, inputs=list(inputs), parameters=parameters)
+
+
+BUILTIN_FEATURES = OrderedDict[str, cfgm.FeatureDefinition]([
+    # OHLC and HLC features
+    ('OHLC', _feature('mean', 'open', 'high', 'low', 'close')),
+    ('HLC', _feature('mean', 'high', 'low', 'close')),
+    # Close difference feature
+    ('close_diff', _feature('diff', 'close')),
+    # Moving averages - different periods
+    *((f"MA{window}", _feature('rolling_mean', 'close', window=window)) for window in [200, 100, 50, 26, 20, 12, 4, 3]),
+    # SMA Differences - different periods
+    ('DIFF-MA200-MA50', _feature('sub', 'MA200', 'MA50')),
+    ('DIFF-MA200-MA100', _feature('sub', 'MA200', 'MA100')),
+    ('DIFF-MA200-CLOSE', _feature('sub', 'MA200', 'close')),
+    ('DIFF-MA100-CLOSE', _feature('sub', 'MA100', 'close')),
+    ('DIFF-MA50-CLOSE', _feature('sub', 'MA50', 'close')),
+    # Moving Averages on high, lows, and std - different periods
+    ('MA200_low', _feature('rolling_min', 'low', window=200)),
+    ('MA14_low', _feature('rolling_min', 'low', window=14)),
+    ('MA200_high', _feature('rolling_max', 'high', window=200)),
+    ('MA14_high', _feature('rolling_max', 'high', window=14)),
+    ('MA20dSTD', _feature('rolling_std', 'close', window=20)),
+    # Exponential Moving Averages (EMAS) - different periods
+    *((f"EMA{span}", _feature('ewm_mean', 'close', span=span)) for span in [12, 20, 26, 100, 200]),
+    # Shifts (one day before and two days before)
+    ('close_shift-1', _feature('shift', 'close', periods=-1)),
+    ('close_shift-2', _feature('shift', 'close', periods=-2)),
+    # Bollinger Bands
+    ('Bollinger_Upper', _feature('add_scaled', 'MA20', 'MA20dSTD', scale=2)),
+    ('Bollinger_Lower', _feature('add_scaled', 'MA20', 'MA20dSTD', scale=-2)),
+    # Relative Strength Index (RSI)
+    ('K-ratio', _feature('stochastic_k', 'close', 'MA14_low', 'MA14_high')),
+    ('RSI', _feature('rolling_mean', 'K-ratio', window=3)),
+    # Moving Average Convergence/Divergence (MACD)
+    ('MACD', _feature('sub', 'EMA12', 'EMA26')),
+])
+
+
+class FeatureGraph:
+    """Features as a dependency graph over the prices.
+
+    Only the requested features and their ancestors are evaluated, each exactly once,
+    so a slimmer feature set costs proportionally less. Feature definitions of the
+    configuration extend or replace the built-in ones.
+    """
+
+    PRICES = list(COLUMNS_OHLC_DEFAULT.keys())
+
+    def __init__(self, definitions: typing.Mapping[str, cfgm.FeatureDefinition] = BUILTIN_FEATURES,
+                 default_requested: typing.List[str] | None = None):
+        self.__definitions = OrderedDict(definitions)
+        self.__default_requested = list(default_requested) if default_requested is not None \
+            else list(BUILTIN_FEATURES.keys())
+        self.__check_definitions()
+        self.__check_requested(self.__default_requested)
+
+    @classmethod
+    def from_config(cls, features: cfgm.Features) -> 'FeatureGraph':
+        return cls(OrderedDict([*BUILTIN_FEATURES.items(), *features.definitions.items()]),
+                   default_requested=features.requested)
+
+    def __check_definitions(self):
+        for name, definition in self.__definitions.items():
+            if name in self.PRICES:
+                raise ValueError(f"Feature '{name}' shadows a price")
+            if definition.operation not in FEATURE_OPERATIONS:
+                raise ValueError(f"Feature '{name}': unknown operation '{definition.operation}'. \
+Operations: {list(FEATURE_OPERATIONS.keys())}")
+            unknown_inputs = [
+                input_name for input_name in definition.inputs
+                if input_name not in self.PRICES and input_name not in self.__definitions
+            ]
+            if unknown_inputs:
+                raise ValueError(f"Feature '{name}': unknown inputs {unknown_inputs}")
+        # Raises on cycles
+        self.plan(self.__definitions.keys())
+
+    def __check_requested(self, requested: typing.Iterable[str]):
+        unknown_features = [name for name in requested if name not in self.__definitions]
+        if unknown_features:
+            raise ValueError(f"Unknown features {unknown_features}. Features: {list(self.__definitions.keys())}")
+
+    @property
+    def definitions(self) -> OrderedDict:
+        return self.__definitions
+
+    @property
+    def default_requested(self) -> list[str]:
+        return self.__default_requested
+
+    def look_ahead_features(self) -> list[str]:
+        """Features reading later rows (a `shift` or `diff` by negative periods) and the features built on them.
+
+        E.g. 'close_shift-1' is the next close: a target, never a feature of a forecast.
+        """
+        look_ahead = set[str]()
+        for name in self.plan(self.__definitions.keys()):
+            definition = self.__definitions[name]
+            reads_later_rows = definition.operation in ('shift', 'diff') and definition.parameters.get('periods', 1) < 0
+            if reads_later_rows or any(input_name in look_ahead for input_name in definition.inputs):
+                look_ahead.add(name)
+        return [name for name in self.__definitions.keys() if name in look_ahead]
+
+    def plan(self, requested: typing.Iterable[str]) -> list[str]:
+        """The requested features and their ancestors, every feature after its inputs."""
+        planned = list[str]()
+        states = dict[str, str]()
+
+        def visit(name: str, path: tuple):
+            if name in self.PRICES or states.get(name) == 'planned':
+                return
+            if states.get(name) == 'visiting':
+                raise ValueError(f"Features have a circular dependency: {' -> '.join(path + (name,))}")
+            states[name] = 'visiting'
+            for input_name in self.__definitions[name].inputs:
+                visit(input_name, path + (name,))
+            states[name] = 'planned'
+            planned.append(name)
+
+        for name in requested:
+            visit(name, ())
+        return planned
+
+    def evaluate(self, prices: typing.Mapping[str, pd.DataFrame],
+                 requested: typing.List[str] | None = None) -> dict[str, pd.DataFrame]:
+        """Requested features, in the requested order, of the (time x instrument) price frames."""
+        requested = self.__default_requested if requested is None else requested
+        self.__check_requested(requested)
+        values = dict[str, pd.DataFrame](prices)
+        for name in self.plan(requested):
+            definition = self.__definitions[name]
+            values[name] = FEATURE_OPERATIONS[definition.operation](
+                *(values[input_name] for input_name in definition.inputs), **definition.parameters
+            )
+        return {name: values[name] for name in requested}
+
+
+DEFAULT_FEATURE_GRAPH = FeatureGraph()
+
+
+def financial_features_matrix(open_prices: pd.DataFrame,
+                              high_prices: pd.DataFrame,
+                              low_prices: pd.DataFrame,
+                              close_prices: pd.DataFrame,
+                              feature_graph: FeatureGraph = DEFAULT_FEATURE_GRAPH,
+                              feature_names: typing.List[str] | None = None) -> dict[str, pd.DataFrame]:
+    """Tech analysis features of many instruments at once.
+
+    Every price argument is a (time x instrument) frame with the same index and columns;
+    every feature is returned as a frame of the same shape, in the requested order.
+    """
+    # Rolling and exponential windows compute on NumPy columns
+    open_prices, high_prices, low_prices, close_prices = (
+        af.to_numpy_backed(prices) for prices in [open_prices, high_prices, low_prices, close_prices]
+    )
+    features = feature_graph.evaluate(
+        {'open': open_prices, 'high': high_prices, 'low': low_prices, 'close': close_prices},
+        requested=feature_names
+    )
+
+    # Replace NAs by the last close price of each instrument
+    nareplace = close_prices.loc[close_prices.index.max()].to_numpy()
+    return {name: _fill_missing_values(feature, nareplace) for name, feature in features.items()}
+
+
+def _fill_missing_values(feature: pd.DataFrame, column_values: np.ndarray) -> pd.DataFrame:
+    # One broadcast pass instead of DataFrame.fillna's column by column alignment
+    values = feature.to_numpy()
+    return pd.DataFrame(
+        np.where(np.isnan(values), column_values, values),
+        index=feature.index, columns=feature.columns, copy=False
+    )
+
+
+def financial_features(dataset: pd.DataFrame,
+                       ticker: str = '',
+                       columns_ohlc: dict = COLUMNS_OHLC_DEFAULT,
+                       feature_graph: FeatureGraph = DEFAULT_FEATURE_GRAPH,
+                       feature_names: typing.List[str] | None = None) -> pd.DataFrame:
+    """Feature Engineering including some features from tech analysis."""
+    open_c = columns_ohlc['open'] if columns_ohlc['open'] else 'open'
+    high = columns_ohlc['high'] if columns_ohlc['high'] else 'high'
+    low = columns_ohlc['low'] if columns_ohlc['low'] else 'low'
+    close = columns_ohlc['close'] if columns_ohlc['close'] else 'close'
+
+    # One instrument matrices: the same column label, so the prices align
+    feature_matrices = financial_features_matrix(
+        *(dataset[[column]].set_axis([ticker], axis=1) for column in [open_c, high, low, close]),
+        feature_graph=feature_graph, feature_names=feature_names
+    )
+    features = pd.DataFrame(
+        {name: feature_matrix.iloc[:, 0] for name, feature_matrix in feature_matrices.items()},
+        index=dataset.index
+    )
+
+    if ticker:
+        features = features.add_suffix('_' + ticker)
+
+    featured_dataset = pd.concat([dataset, features], axis=1)
+
+    return featured_dataset
+
+
+def look_ahead_columns(columns: typing.Iterable[str], tickers: typing.Iterable[str] = (),
+                       feature_graph: FeatureGraph = DEFAULT_FEATURE_GRAPH) -> list[str]:
+    """Dataset columns of look-ahead features, named '<feature>' or '<feature>_<ticker>'."""
+    look_ahead_names = set(feature_graph.look_ahead_features())
+    look_ahead_names |= {f"{name}_{ticker}" for name in look_ahead_names for ticker in tickers}
+    return [column for column in columns if column in look_ahead_names]
+
+
+def instrument_price_columns(columns: typing.Iterable[str], suffix: str = '') -> dict[str, str]:
+    """OHLC columns of an instrument in a joined dataset.
+
+    Prices dropped by the dimensionality reduction are replaced by the reduced
+    price column (e.g. 'OHLC'), the best proxy of the price left in the dataset.
+    """
+    columns = set(columns)
+    proxy = next((name + suffix for name in PRICE_PROXY_COLUMNS if name + suffix in columns), None)
+    price_columns = {}
+    for price in COLUMNS_OHLC_DEFAULT.keys():
+        if price + suffix in columns:
+            price_columns[price] = price + suffix
+        elif proxy is not None:
+            price_columns[price] = proxy
+        else:
+            raise ValueError(f"No '{price}' price column nor its proxy {PRICE_PROXY_COLUMNS} with the suffix '{suffix}'")
+    return price_columns
+
+
+def cross_instrument_financial_features(dataset: pd.DataFrame,
+                                        instruments_columns: typing.Mapping[str, dict],
+                                        max_workers: int | None = None,
+                                        feature_graph: FeatureGraph = DEFAULT_FEATURE_GRAPH,
+                                        feature_names: typing.List[str] | None = None) -> pd.DataFrame:
+    """The tech analysis features of every instrument of a joined dataset.
+
+    `instruments_columns` maps a ticker to its OHLC columns in `dataset`. The prices
+    are arranged into (time x instrument) matrices and the features are computed
+    for chunks of instruments on a thread pool: the rolling and ewm kernels work on
+    NumPy arrays and release the GIL. Features are named '<feature>_<ticker>'.
+    """
+    tickers = list(instruments_columns.keys())
+    prices = {
+        price: pd.DataFrame(
+            {ticker: dataset[columns_ohlc[price]] for ticker, columns_ohlc in instruments_columns.items()},
+            index=dataset.index, dtype=np.float64
+        )
+        for price in COLUMNS_OHLC_DEFAULT.keys()
+    }
+
+    n_chunks = max(min(max_workers or len(tickers), len(tickers)), 1)
+    ticker_chunks = [list(chunk) for chunk in np.array_split(np.array(tickers, dtype=object), n_chunks) if len(chunk)]
+
+    def chunk_features(chunk_tickers: list[str]) -> tuple[list[str], np.ndarray]:
+        feature_matrices = financial_features_matrix(
+            *(prices[price][chunk_tickers] for price in COLUMNS_OHLC_DEFAULT.keys()),
+            feature_graph=feature_graph, feature_names=feature_names
+        )
+        # (time, instrument, feature)
+        values = np.empty((len(dataset.index), len(chunk_tickers), len(feature_matrices)), dtype=np.float64)
+        for number, feature in enumerate(feature_matrices.values()):
+            values[:, :, number] = feature.to_numpy()
+        return list(feature_matrices.keys()), values
+
+    with ThreadPoolExecutor(max_workers=n_chunks, thread_name_prefix='FinancialFeatures') as executor:
+        chunks_features = list(executor.map(chunk_features, ticker_chunks))
+
+    feature_names = chunks_features[0][0]
+    feature_values = np.concatenate([values for _, values in chunks_features], axis=1)
+    # Feature columns grouped by instrument as in the single instrument datasets
+    features = pd.DataFrame(
+        feature_values.reshape(feature_values.shape[0], -1),
+        index=dataset.index,
+        columns=[f"{name}_{ticker}" for ticker in tickers for name in feature_names],
+        copy=False
+    )
+    # A price-treated instrument (e.g. 'OHLC_<ticker>') has the treated price as all four
+    # OHLC columns, so the feature of the same name repeats the dataset column
+    features = features.loc[:, ~features.columns.isin(dataset.columns)]
+
+    return pd.concat([dataset, features], axis=1)
@@ -0,0 +1,147 @@
+import typing
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import arrow_frames as af
+import config_model as cfgm
+
+
+@dataclass
+class LaggedBatch:
+    """Supervised samples `begin` ... `end - 1`:
+    lag windows (samples, lags, features) and targets (samples, horizon, targets)."""
+    begin: int
+    end: int
+    lags: np.ndarray
+    targets: np.ndarray
+
+
+class LaggedWindowGenerator:
+    """Builds supervised samples of `lags` consecutive feature rows followed by
+    `horizon` target rows as strided views over the feature and target matrices.
+
+    Sample `i` consists of the feature rows `i ... i + lags - 1` and the target rows
+    `i + lags ... i + lags + horizon - 1`. No sample is copied: batches are slices
+    of the views, so only the consumer decides what to materialize.
+    """
+
+    def __init__(self, lags: int, horizon: int, batch_size: int):
+        if lags <= 0 or horizon <= 0 or batch_size <= 0:
+            raise ValueError(f"Lags, horizon and batch size must be positive: lags={lags}, horizon={horizon}, batch_size={batch_size}")
+        self.__lags = lags
+        self.__horizon = horizon
+        self.__batch_size = batch_size
+
+    @classmethod
+    def from_config(cls, machine_learning: cfgm.MachineLearning) -> 'LaggedWindowGenerator':
+        lagged_windows = machine_learning.lagged_windows
+        return cls(lagged_windows.lags, lagged_windows.horizon, lagged_windows.batch_size)
+
+    @property
+    def lags(self) -> int:
+        return self.__lags
+
+    @property
+    def horizon(self) -> int:
+        return self.__horizon
+
+    @property
+    def batch_size(self) -> int:
+        return self.__batch_size
+
+    def n_samples(self, n_rows: int) -> int:
+        return max(n_rows - self.__lags - self.__horizon + 1, 0)
+
+    def samples(self, features: np.ndarray, targets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """All samples as read-only views: (samples, lags, features), (samples, horizon, targets)."""
+        if features.shape[0] != targets.shape[0]:
+            raise ValueError(f"Features and targets must have the same number of rows: {features.shape[0]} != {targets.shape[0]}")
+        n_samples = self.n_samples(features.shape[0])
+        if n_samples == 0:
+            return (np.empty((0, self.__lags) + features.shape[1:], dtype=features.dtype),
+                    np.empty((0, self.__horizon) + targets.shape[1:], dtype=targets.dtype))
+
+        lag_windows = np.moveaxis(
+            np.lib.stride_tricks.sliding_window_view(features, self.__lags, axis=0), -1, 1
+        )[:n_samples]
+        target_windows = np.moveaxis(
+            np.lib.stride_tricks.sliding_window_view(targets[self.__lags:], self.__horizon, axis=0), -1, 1
+        )[:n_samples]
+        return lag_windows, target_windows
+
+    def batches(self, features: np.ndarray, targets: np.ndarray,
+                rows: slice | None = None) -> typing.Iterator[LaggedBatch]:
+        """Stream batches of samples whose rows all lie within `rows` (e.g. a cross-validation fold)."""
+        row_begin, row_end, _ = (rows or slice(None)).indices(features.shape[0])
+        lag_windows, target_windows = self.samples(features[row_begin:row_end], targets[row_begin:row_end])
+
+        for begin in range(0, lag_windows.shape[0], self.__batch_size):
+            end = min(begin + self.__batch_size, lag_windows.shape[0])
+            yield LaggedBatch(
+                row_begin + begin, row_begin + end,
+                lag_windows[begin:end], target_windows[begin:end]
+            )
+
+
+class LaggedWindowDataset:
+    """Feature and target matrices of a joined dataset with their lagged window generator.
+
+    The features are `feature_columns` (all dataset columns by default) without `exclude_columns`.
+    """
+
+    def __init__(self, dataset: pd.DataFrame, generator: LaggedWindowGenerator,
+                 target_columns: typing.List[str], feature_columns: typing.List[str] | None = None,
+                 exclude_columns: typing.Iterable[str] = ()):
+        missing_columns = [
+            column for column in target_columns + (feature_columns or []) if column not in dataset.columns
+        ]
+        if missing_columns:
+            raise ValueError(f"Target or feature columns {missing_columns} are not in the dataset")
+        if feature_columns is None:
+            feature_columns = dataset.columns.to_list()
+        exclude_columns = set(exclude_columns)
+        feature_columns = [column for column in feature_columns if column not in exclude_columns]
+
+        self.__generator = generator
+        self.__index = dataset.index
+        self.__feature_columns = feature_columns
+        self.__target_columns = target_columns
+        # The only materialization: one float matrix each, a view for single dtype datasets
+        self.__features = af.float_values(dataset[feature_columns])
+        self.__targets = af.float_values(dataset[target_columns])
+
+    @property
+    def generator(self) -> LaggedWindowGenerator:
+        return self.__generator
+
+    @property
+    def index(self) -> pd.Index:
+        return self.__index
+
+    @property
+    def feature_columns(self) -> typing.List[str]:
+        return self.__feature_columns
+
+    @property
+    def target_columns(self) -> typing.List[str]:
+        return self.__target_columns
+
+    @property
+    def features(self) -> np.ndarray:
+        return self.__features
+
+    @property
+    def targets(self) -> np.ndarray:
+        return self.__targets
+
+    def target_index(self, batch: LaggedBatch) -> pd.Index:
+        """Time of the first target row of each sample in the batch."""
+        return self.__index[batch.begin + self.__generator.lags:batch.end + self.__generator.lags]
+
+    def batches(self, rows: slice | None = None) -> typing.Iterator[LaggedBatch]:
+        return self.__generator.batches(self.__features, self.__targets, rows=rows)
+
+    def __len__(self) -> int:
+        return self.__generator.n_samples(self.__features.shape[0])
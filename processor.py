@@ -1,3 +1,4 @@
+import copy
 from collections import OrderedDict
 
 from typing import Callable
@@ -6,40 +7,182 @@ import config_logging as clog
 import workflow as wf
 import config_model as cfgm
 import config as cfg
+import bar_stream as bst
+import context_store as cst
+import stage_profiling as sprof
 
 
 class Processor(object):
 
     LOGGER = clog.get_logger('Processor')
 
-    def __init__(self, config_loader: cfg.ConfigLoader, workflow: wf.Workflow, worflow_context: OrderedDict):
+    def __init__(self, config_loader: cfg.ConfigLoader, workflow: wf.Workflow, worflow_context: OrderedDict,
+                 resident: bool=False, checkpoint_stages: list[str] | None = None,
+                 managed_context: bool=False, context_memory_budget: int | None = None,
+                 profiled_stages: list[str] | None = None, profiler: str='cprofile',
+                 profiles_directory: str='data/generated/profiles'):
+        """In the `resident` mode the processor keeps a copy of the workflow context taken
+        before each of the `checkpoint_stages` (none by default), so `resume_from`
+        re-executes only the stages from a given one onward on the warm data. A checkpoint
+        copies only the entries read by its stage and the later ones: the others can't
+        change afterwards.
+
+        With `managed_context` the workflow context is a `ContextStore`: entries are
+        released after their last consuming stage and spilled to disk above
+        `context_memory_budget` bytes.
+
+        The `profiled_stages` are profiled one by one with the `profiler` ('cprofile' or
+        'sampling'), writing pstats, folded stacks and speedscope files per stage key to
+        `profiles_directory`."""
+        clog.init_logger()
         self.__config_loader = config_loader
         self.__config = self.__config_loader.load_config()
         self.__workflow = workflow
-        self.__workflow_context = worflow_context.copy()
+        if profiled_stages is not None:
+            self.__workflow.stage_profiler = sprof.StageProfiler(
+                profiled_stages, profiler=profiler, directory=profiles_directory
+            )
+        if managed_context:
+            self.__workflow_context = cst.ContextStore(workflow.context_consumers, memory_budget=context_memory_budget)
+            self.__workflow_context.update(worflow_context)
+        else:
+            self.__workflow_context = worflow_context.copy()
         self.__init_workflow_context()
 
+        self.__resident = resident
+        self.__checkpoint_stages = list(checkpoint_stages or [])
+        unknown_stages = set(self.__checkpoint_stages) - set(workflow.stages)
+        if unknown_stages:
+            raise ValueError(f"Unknown checkpoint stages {unknown_stages}. Stages: {workflow.stages}")
+        self.__checkpoints = OrderedDict[str, dict]()
+
     def __init_workflow_context(self):
         self.__workflow_context['config'] = self.__config
 
-    def process(self):
+    def process(self) -> wf.CommandState:
         self.LOGGER.info('Start of processing')
-        self.workflow.execute(self.__workflow_context)
+        if self.__resident:
+            workflow_state = self.__process_from(self.__workflow.stages[0])
+        else:
+            workflow_state = self.workflow.execute(self.__workflow_context)
         self.LOGGER.info('Finished processing')
+        return workflow_state
+
+    def resume_from(self, stage: str, reload_config: bool=True) -> wf.CommandState:
+        """Re-execute the workflow from `stage` onward on the warm context.
+
+        The context is restored from the nearest checkpoint at or before `stage`,
+        so in-place modifications made by the later stages are undone.
+        """
+        if not self.__resident:
+            raise ValueError('Resuming from a stage requires the resident mode.')
+
+        stages = self.__workflow.stages
+        if stage not in stages:
+            raise ValueError(f"Unknown workflow stage '{stage}'. Stages: {stages}")
+        checkpoint_stage = next(
+            (checkpoint_stage for checkpoint_stage in reversed(stages[:stages.index(stage) + 1])
+             if checkpoint_stage in self.__checkpoints),
+            None
+        )
+        if checkpoint_stage is None:
+            self.LOGGER.warning(f"No checkpoint at or before the stage {stage}, processing from the beginning.")
+            checkpoint_stage = stages[0]
+            self.__workflow_context.clear()
+        else:
+            self.LOGGER.info(f"Resuming from the stage {stage} using the checkpoint of {checkpoint_stage}...")
+            # Entries created from the checkpoint stage on are dropped by the rewind, the ones not
+            # in the checkpoint weren't read, so not changed, by the re-executed stages
+            self.__workflow_context.update(copy.deepcopy(self.__checkpoints[checkpoint_stage]))
+
+        if reload_config:
+            config = self.__config_loader.load_config(print_short_report=False)
+            if config != self.__config:
+                self.LOGGER.info('Configuration changed since the last processing.')
+            self.__config = config
+        self.__init_workflow_context()
+
+        workflow_state = self.__process_from(checkpoint_stage)
+        self.LOGGER.info(f"Finished resuming from the stage {stage}. State: {workflow_state}")
+        return workflow_state
+
+    def __process_from(self, stage: str) -> wf.CommandState:
+        stages = self.__workflow.stages
+        self.__workflow.rewind_to(self.__workflow_context, stage)
+        workflow_state = self.__workflow.current_state
+        for next_stage in stages[stages.index(stage):]:
+            if next_stage in self.__checkpoint_stages:
+                self.__checkpoints[next_stage] = self.__checkpoint(next_stage)
+            workflow_state = self.__workflow.execute_next_stage(self.__workflow_context)
+            if workflow_state == wf.CommandState.FAILED or workflow_state == wf.CommandState.ABORTED:
+                self.LOGGER.warning(f"Processing is interrupted on the stage {next_stage}. State: {workflow_state}")
+                break
+        return workflow_state
 
-    def process_next_stage(self):
+    def __checkpoint(self, stage: str) -> dict:
+        """Copies of the entries that `stage` and the later stages may change in place."""
+        context_consumers = self.__workflow.context_consumers
+        stages = self.__workflow.stages
+        consumed_keys = set[str]()
+        for later_stage in stages[stages.index(stage):]:
+            stage_consumed_keys = context_consumers[later_stage]
+            if stage_consumed_keys is None:
+                # A stage reading unknown keys may change any entry
+                consumed_keys = set(self.__workflow_context.keys())
+                break
+            consumed_keys.update(stage_consumed_keys)
+        consumed_keys.discard('config')
+        return copy.deepcopy(
+            {key: value for key, value in self.__workflow_context.items() if key in consumed_keys}
+        )
+
+    @property
+    def checkpoints(self) -> list[str]:
+        """Stages the resident processor can resume from without reloading earlier stages."""
+        return list(self.__checkpoints.keys())
+
+    def process_until(self, stage: str) -> wf.CommandState:
+        self.LOGGER.info(f"Start of processing until the stage {stage}...")
+        workflow_state = self.__workflow.execute_until(self.__workflow_context, stage)
+        self.LOGGER.info(f"Finished processing until the stage {stage}. State: {workflow_state}")
+        return workflow_state
+
+    def stream(self, bar_feed: bst.AbstractBarFeed, max_bars: int | None = None,
+               selected_data_context_name: str='selected-data',
+               history_window: int=1000,
+               scaling_context_name: str='scaling-parameters') -> bst.LatencyStats:
+        """Process live bars incrementally on top of the warm, already treated data.
+
+        If the data was scaled, the bars are scaled with the fitted parameters from the
+        workflow context. The streamer and its latency statistics are kept in the workflow
+        context as 'bar-streamer' and 'bar-stream-latency'.
+        """
+        if selected_data_context_name not in self.__workflow_context:
+            raise ValueError(f"No '{selected_data_context_name}' in the workflow context: process the batch stages first.")
+        streamer = bst.BarStreamer(
+            self.__config, self.__workflow_context[selected_data_context_name], history_window=history_window,
+            scaling_parameters=self.__workflow_context.get(scaling_context_name)
+        )
+        self.__workflow_context['bar-streamer'] = streamer
+        self.LOGGER.info('Start of streaming...')
+        latency = streamer.run(bar_feed, max_bars=max_bars)
+        self.__workflow_context['bar-stream-latency'] = latency.summary()
+        self.LOGGER.info(f"Finished streaming. Latency: {latency}")
+        return latency
+
+    def process_next_stage(self) -> wf.CommandState | None:
         self.LOGGER.info('Start of processing next stage...')
         try:
-            self.__workflow.execute_next_stage(self.__workflow_context)
+            return self.__workflow.execute_next_stage(self.__workflow_context)
         except Exception as exception:
             self.LOGGER.error(f"Error on the stage {self.__workflow.current_stage}: {exception}", exc_info=True)
         finally:
             self.LOGGER.info('Finished processing next stage')
 
-    def process_previous_stage(self):
+    def process_previous_stage(self) -> wf.CommandState | None:
         self.LOGGER.info('Start of processing previous stage...')
         try:
-            self.__workflow.execute_previous_stage(self.__workflow_context)
+            return self.__workflow.execute_previous_stage(self.__workflow_context)
         except Exception as exception:
             self.LOGGER.error(f"Error on the stage {self.__workflow.current_stage}: {exception}", exc_info=True)
         finally:
@@ -49,6 +192,14 @@ class Processor(object):
     def config(self) -> cfgm.Config:
         return self.__config
 
+    @property
+    def workflow(self) -> wf.Workflow:
+        return self.__workflow
+
+    @property
+    def workflow_context(self) -> OrderedDict:
+        return self.__workflow_context
+
     @property
     def current_workflow_stage(self) -> str:
         return self.__workflow.current_stage
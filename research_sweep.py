@@ -0,0 +1,174 @@
+import itertools
+import multiprocessing
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import config_logging as clog
+import config_model as cfgm
+import processor as prc
+import shared_frames as sfr
+import workflow as wf
+
+
+@dataclass
+class SweepVariantResult:
+    number: int
+    overrides: dict
+    state: wf.CommandState | None
+    datasets: dict[str, pd.DataFrame] = field(default_factory=dict)
+    stage_timings: dict[str, float] = field(default_factory=dict)
+    total_time: float = 0.0
+    error: str | None = None
+
+
+# State of a sweep worker process, set once by the pool initializer
+_SWEEP_CONTEXT: dict | None = None
+_SWEEP_WORKFLOW: wf.Workflow | None = None
+
+
+def _init_sweep_worker(logging_initargs: tuple, context: dict, frame_handles: dict, workflow: wf.Workflow):
+    global _SWEEP_CONTEXT, _SWEEP_WORKFLOW
+    clog.init_worker_logging(*logging_initargs)
+    # Read-only: an in-place change would reach every variant
+    _SWEEP_CONTEXT = {**context, **sfr.attach_context(frame_handles, read_only=True)}
+    _SWEEP_WORKFLOW = workflow
+
+
+def _run_sweep_variant(number: int, overrides: dict, config: cfgm.Config,
+                       dataset_context_prefix: str) -> SweepVariantResult:
+    logger = clog.get_logger('ResearchSweep')
+    context = dict(_SWEEP_CONTEXT)
+    context['config'] = config
+    # A fresh workflow: positions and timings are per variant
+    workflow = _SWEEP_WORKFLOW.sub_workflow()
+
+    start_time = time.perf_counter()
+    try:
+        state = workflow.execute(context)
+    except Exception as exception:
+        logger.error(f"[variant {number}] {overrides} failed: {exception}", exc_info=True)
+        return SweepVariantResult(
+            number, overrides, wf.CommandState.FAILED,
+            stage_timings=dict(workflow.stage_timings),
+            total_time=time.perf_counter() - start_time,
+            error=repr(exception)
+        )
+
+    datasets = {
+        key: value for key, value in context.items()
+        if key.startswith(dataset_context_prefix) and isinstance(value, pd.DataFrame)
+    }
+    return SweepVariantResult(
+        number, overrides, state, datasets,
+        stage_timings=dict(workflow.stage_timings),
+        total_time=time.perf_counter() - start_time
+    )
+
+
+class ResearchSweep:
+    """Runs the downstream workflow stages for a grid of `MachineLearning` overrides.
+
+    Data are loaded and tended once by the processor up to `shared_until_stage`;
+    the rest of the workflow runs per variant in a process pool. The frames of the
+    shared context ('data', frames and mappings of frames) are published to shared
+    memory, which workers attach to read-only without copying; the other entries are
+    pickled once per worker, not per variant. The shared memory is released when the
+    sweep ends, also on a failure.
+
+    Grid example: `{'split_time': ['2022-06-01T00:00:00', '2022-12-10T00:00:00'],
+                    'time_range': [{'begin_time': '2020-07-10T00:00:00', 'end_time': '2022-12-30T00:00:00'}]}`
+    """
+
+    LOGGER = clog.get_logger('ResearchSweep')
+
+    def __init__(self, processor: prc.Processor,
+                 grid: dict[str, list],
+                 shared_until_stage: str='02-data_tending',
+                 dataset_context_prefix: str='dataset',
+                 max_workers: int | None = None):
+        unknown_parameters = set(grid.keys()) - set(cfgm.MachineLearning.__fields__.keys())
+        if unknown_parameters:
+            raise ValueError(f"Unknown MachineLearning parameters in the sweep grid: {unknown_parameters}")
+        self.__processor = processor
+        self.__grid = grid
+        self.__shared_until_stage = shared_until_stage
+        self.__dataset_context_prefix = dataset_context_prefix
+        self.__max_workers = max_workers
+
+    def variants(self) -> list[dict]:
+        parameter_names = list(self.__grid.keys())
+        return [
+            dict(zip(parameter_names, parameter_values))
+            for parameter_values in itertools.product(*(self.__grid[name] for name in parameter_names))
+        ]
+
+    def variant_config(self, overrides: dict) -> cfgm.Config:
+        config = self.__processor.config
+        machine_learning = cfgm.MachineLearning.parse_obj({
+            **config.research.machine_learning.dict(), **overrides
+        })
+        variant_config = config.copy(deep=True)
+        variant_config.research.machine_learning = machine_learning
+        return variant_config
+
+    def run(self) -> list[SweepVariantResult]:
+        variants = self.variants()
+        # Validate all variants before loading anything
+        variant_configs = [self.variant_config(overrides) for overrides in variants]
+
+        shared_start_time = time.perf_counter()
+        shared_state = self.__processor.process_until(self.__shared_until_stage)
+        if shared_state in (wf.CommandState.FAILED, wf.CommandState.ABORTED):
+            raise RuntimeError(f"Shared stages until '{self.__shared_until_stage}' finished with the state {shared_state}")
+        self.LOGGER.info(f"Shared stages until '{self.__shared_until_stage}' took \
+{time.perf_counter() - shared_start_time:.3f} s. Running {len(variants)} variants...")
+
+        workflow = self.__processor.workflow
+        stages = workflow.stages
+        downstream_stages = stages[stages.index(self.__shared_until_stage) + 1:]
+        if not downstream_stages:
+            raise ValueError(f"No workflow stages after the shared stage '{self.__shared_until_stage}'")
+        downstream_workflow = workflow.sub_workflow(from_stage=downstream_stages[0])
+
+        shared_context = dict(self.__processor.workflow_context)
+        start_methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+
+        with sfr.SharedFrameStore() as store:
+            frame_handles = dict[str, typing.Any]()
+            for key, value in shared_context.items():
+                if not sfr.is_shareable(value):
+                    continue
+                try:
+                    frame_handles.update(sfr.publish_context(store, shared_context, [key]))
+                except TypeError as exception:
+                    self.LOGGER.info(f"Context entry '{key}' is passed to the workers as it is: {exception}")
+            worker_context = {key: value for key, value in shared_context.items() if key not in frame_handles}
+            self.LOGGER.info(f"Published {list(frame_handles.keys())} to shared memory, {store.nbytes} bytes")
+
+            with ProcessPoolExecutor(
+                    max_workers=self.__max_workers,
+                    mp_context=mp_context,
+                    initializer=_init_sweep_worker,
+                    initargs=(clog.worker_logging_initargs(), worker_context, frame_handles, downstream_workflow)) as executor:
+                futures = [
+                    executor.submit(_run_sweep_variant, number, overrides, variant_config, self.__dataset_context_prefix)
+                    for number, (overrides, variant_config) in enumerate(zip(variants, variant_configs))
+                ]
+                results = [future.result() for future in futures]
+
+        for result in results:
+            self.LOGGER.info(f"[variant {result.number}] {result.overrides}: state {result.state}, \
+total {result.total_time:.3f} s, datasets {list(result.datasets.keys())}")
+        return results
+
+    @staticmethod
+    def timings_frame(results: typing.Iterable[SweepVariantResult]) -> pd.DataFrame:
+        """Per variant and stage timings, seconds."""
+        return pd.DataFrame.from_records(
+            [{'variant': result.number, **result.stage_timings, 'total': result.total_time} for result in results]
+        ).set_index('variant')
@@ -0,0 +1,325 @@
+import typing
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import config_logging as clog
+import data_load_model as dlm
+
+
+LOGGER = clog.get_logger('SharedFrames')
+
+
+@dataclass(frozen=True)
+class SharedArrayHandle:
+    """Picklable reference to an array in a shared memory segment."""
+    segment_name: str
+    shape: tuple
+    dtype: str
+
+
+@dataclass(frozen=True)
+class SharedFrameHandle:
+    """Picklable reference to a DataFrame published to shared memory.
+
+    Columns of one dtype are stored as one (rows, columns) array, so single dtype
+    frames (e.g. tended instrument frames) attach without any copy.
+    """
+    blocks: tuple[tuple[tuple, SharedArrayHandle], ...]
+    columns: tuple
+    columns_name: typing.Any
+    index_kind: str
+    index: SharedArrayHandle | None
+    index_values: typing.Any
+    index_name: typing.Any
+    index_timezone: str | None
+
+    @property
+    def segment_names(self) -> list[str]:
+        names = [array_handle.segment_name for _, array_handle in self.blocks]
+        if self.index is not None:
+            names.append(self.index.segment_name)
+        return names
+
+
+def _create_array(values: np.ndarray) -> tuple[shared_memory.SharedMemory, SharedArrayHandle]:
+    segment = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    shared_values = np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)
+    shared_values[...] = values
+    return segment, SharedArrayHandle(segment.name, values.shape, values.dtype.str)
+
+
+def _attach_array(array_handle: SharedArrayHandle, segments: dict[str, shared_memory.SharedMemory],
+                  read_only: bool = False) -> np.ndarray:
+    segment = segments.get(array_handle.segment_name)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=array_handle.segment_name)
+        segments[array_handle.segment_name] = segment
+    values = np.ndarray(array_handle.shape, dtype=np.dtype(array_handle.dtype), buffer=segment.buf)
+    if read_only:
+        values.flags.writeable = False
+    return values
+
+
+def _publish(dataframe: pd.DataFrame, segments: dict[str, shared_memory.SharedMemory]) -> SharedFrameHandle:
+    created = list[shared_memory.SharedMemory]()
+    try:
+        blocks = []
+        for dtype, dtype_columns in dataframe.columns.groupby(dataframe.dtypes).items():
+            if not isinstance(dtype, np.dtype) or dtype == np.dtype('O'):
+                raise TypeError(f"Columns of the dtype {dtype} can't be shared: {list(dtype_columns)}")
+            segment, array_handle = _create_array(dataframe[dtype_columns].to_numpy())
+            created.append(segment)
+            blocks.append((tuple(dtype_columns), array_handle))
+
+        index = dataframe.index
+        index_handle, index_values, index_timezone = None, None, None
+        if isinstance(index, pd.RangeIndex):
+            index_kind = 'range'
+            index_values = (index.start, index.stop, index.step)
+        elif isinstance(index, pd.DatetimeIndex):
+            index_kind = 'datetime'
+            index_timezone = str(index.tz) if index.tz is not None else None
+            segment, index_handle = _create_array(index.asi8)
+            created.append(segment)
+        elif isinstance(index.dtype, np.dtype) and index.dtype != np.dtype('O'):
+            index_kind = 'array'
+            segment, index_handle = _create_array(index.to_numpy())
+            created.append(segment)
+        else:
+            index_kind = 'list'
+            index_values = index.to_list()
+    except BaseException:
+        for segment in created:
+            segment.close()
+            segment.unlink()
+        raise
+
+    for segment in created:
+        segments[segment.name] = segment
+    return SharedFrameHandle(
+        tuple(blocks), tuple(dataframe.columns), dataframe.columns.name,
+        index_kind, index_handle, index_values, index.name, index_timezone
+    )
+
+
+def _attach(frame_handle: SharedFrameHandle, segments: dict[str, shared_memory.SharedMemory],
+            read_only: bool = False) -> pd.DataFrame:
+    if frame_handle.index_kind == 'range':
+        index = pd.RangeIndex(*frame_handle.index_values, name=frame_handle.index_name)
+    elif frame_handle.index_kind == 'datetime':
+        index_values = _attach_array(frame_handle.index, segments, read_only)
+        index = pd.DatetimeIndex(index_values.view('M8[ns]'), name=frame_handle.index_name)
+        if frame_handle.index_timezone is not None:
+            index = index.tz_localize('UTC').tz_convert(frame_handle.index_timezone)
+    elif frame_handle.index_kind == 'array':
+        index = pd.Index(_attach_array(frame_handle.index, segments, read_only), name=frame_handle.index_name, copy=False)
+    else:
+        index = pd.Index(frame_handle.index_values, name=frame_handle.index_name)
+
+    frames = [
+        pd.DataFrame(_attach_array(array_handle, segments, read_only), index=index, columns=list(columns), copy=False)
+        for columns, array_handle in frame_handle.blocks
+    ]
+    if len(frames) == 1:
+        dataframe = frames[0]
+    elif frames:
+        # Mixed dtypes: one copy to consolidate the blocks
+        dataframe = pd.concat(frames, axis=1)[list(frame_handle.columns)]
+    else:
+        dataframe = pd.DataFrame(index=index)
+    dataframe.columns.name = frame_handle.columns_name
+    return dataframe
+
+
+class SharedFrameStore:
+    """Owner of shared memory segments holding workflow context frames.
+
+    The parent publishes frames before starting workers and adopts the frames workers
+    publish back; closing the store (also on an exception when used as a context
+    manager) unlinks every owned segment, so a failed stage doesn't leak memory.
+
+    Usage:
+        with SharedFrameStore() as store:
+            handles = store.publish_mapping(context['selected-data'])
+            results = executor.map(worker_function, handles.values())
+            frames = [store.adopt(handle) for handle in results]
+    """
+
+    def __init__(self):
+        self.__segments = dict[str, shared_memory.SharedMemory]()
+
+    def publish(self, dataframe: pd.DataFrame) -> SharedFrameHandle:
+        return _publish(dataframe, self.__segments)
+
+    def publish_mapping(self, dataframes: typing.Mapping[str, pd.DataFrame]) -> dict[str, SharedFrameHandle]:
+        return {key: self.publish(dataframe) for key, dataframe in dataframes.items()}
+
+    def attach(self, frame_handle: SharedFrameHandle) -> pd.DataFrame:
+        return _attach(frame_handle, self.__segments)
+
+    def adopt(self, frame_handle: SharedFrameHandle) -> pd.DataFrame:
+        """Take the ownership of a frame published by a worker and attach to it."""
+        return self.attach(frame_handle)
+
+    def adopt_mapping(self, frame_handles: typing.Mapping[str, SharedFrameHandle]) -> dict[str, pd.DataFrame]:
+        return {key: self.adopt(frame_handle) for key, frame_handle in frame_handles.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.size for segment in self.__segments.values())
+
+    def close(self):
+        """Release and unlink all owned segments. Attached frames must not be used afterwards."""
+        while self.__segments:
+            name, segment = self.__segments.popitem()
+            try:
+                segment.close()
+            except BufferError:
+                # Still exported by a live array, the memory is freed when it's gone
+                LOGGER.debug(f"Shared memory segment {name} is still referenced")
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> 'SharedFrameStore':
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+        return False
+
+
+# Segments a worker process is attached to or has published, by segment name
+_WORKER_SEGMENTS = dict[str, shared_memory.SharedMemory]()
+
+
+def attach(frame_handle: SharedFrameHandle, read_only: bool = False) -> pd.DataFrame:
+    """Worker side: attach to a published frame without copying.
+
+    With `read_only` an in-place change of the frame raises instead of changing
+    the frame of every process attached to it.
+    """
+    return _attach(frame_handle, _WORKER_SEGMENTS, read_only)
+
+
+def attach_mapping(frame_handles: typing.Mapping[str, SharedFrameHandle],
+                   read_only: bool = False) -> dict[str, pd.DataFrame]:
+    return {key: attach(frame_handle, read_only) for key, frame_handle in frame_handles.items()}
+
+
+def publish(dataframe: pd.DataFrame) -> SharedFrameHandle:
+    """Worker side: publish a result frame; the parent takes its ownership with `SharedFrameStore.adopt`."""
+    published_segments = dict[str, shared_memory.SharedMemory]()
+    frame_handle = _publish(dataframe, published_segments)
+    _WORKER_SEGMENTS.update(published_segments)
+    return frame_handle
+
+
+def detach(unlink_published: typing.Iterable[SharedFrameHandle] = ()):
+    """Worker side: close all segments of this process.
+
+    Frames published by a failed task and never adopted by the parent are passed
+    as `unlink_published` to be removed.
+    """
+    for frame_handle in unlink_published:
+        for name in frame_handle.segment_names:
+            segment = _WORKER_SEGMENTS.get(name)
+            if segment is not None:
+                segment.unlink()
+    while _WORKER_SEGMENTS:
+        _, segment = _WORKER_SEGMENTS.popitem()
+        try:
+            segment.close()
+        except BufferError:
+            pass
+
+
+@dataclass(frozen=True)
+class SharedComplexDataHandle:
+    """Picklable `ComplexData` of a loaded instrument: its remote and local frames are published,
+    the rest (e.g. the remote data adapter) travels as it is."""
+    remote_data: dlm.RemoteData
+    remote_frame: SharedFrameHandle
+    ticker: str
+    local_source_path: str
+    local_frame: SharedFrameHandle
+
+
+def _is_shareable_complex_data(value: typing.Any) -> bool:
+    return isinstance(value, dlm.ComplexData) and isinstance(value.local_data.data, dlm.BasicLocalDataAdapter) \
+        and isinstance(value.remote_data.loaded_data, pd.DataFrame)
+
+
+def is_shareable(value: typing.Any) -> bool:
+    """Frames, and mappings of frames or of loaded instrument data (the 'data' entry)."""
+    if isinstance(value, pd.DataFrame):
+        return True
+    return isinstance(value, typing.Mapping) and len(value) > 0 and (
+        all(isinstance(item, pd.DataFrame) for item in value.values())
+        or all(_is_shareable_complex_data(item) for item in value.values())
+    )
+
+
+def _publish_complex_data(store: SharedFrameStore, data: dlm.ComplexData,
+                          published: dict[int, SharedFrameHandle]) -> SharedComplexDataHandle:
+    def publish_once(dataframe: pd.DataFrame) -> SharedFrameHandle:
+        # The local data of a remote download is the same frame: published once
+        if id(dataframe) not in published:
+            published[id(dataframe)] = store.publish(dataframe)
+        return published[id(dataframe)]
+
+    local_adapter: dlm.BasicLocalDataAdapter = data.local_data.data
+    return SharedComplexDataHandle(
+        dlm.RemoteData(data.remote_data.data, data.remote_data.source, None),
+        publish_once(data.remote_data.loaded_data),
+        local_adapter.symbol,
+        data.local_data.source_path,
+        publish_once(local_adapter.history_data())
+    )
+
+
+def _attach_complex_data(handle: SharedComplexDataHandle, read_only: bool) -> dlm.ComplexData:
+    return dlm.ComplexData(
+        dlm.RemoteData(handle.remote_data.data, handle.remote_data.source, attach(handle.remote_frame, read_only)),
+        dlm.LocalData(dlm.BasicLocalDataAdapter(handle.ticker, attach(handle.local_frame, read_only)),
+                      handle.local_source_path)
+    )
+
+
+def publish_context(store: SharedFrameStore, context: dict, keys: typing.Iterable[str]) -> dict[str, typing.Any]:
+    """Handles of the context entries that are frames or mappings of frames (e.g. 'selected-data')
+    or of loaded instrument data ('data'), see `is_shareable`."""
+    handles = dict[str, typing.Any]()
+    published = dict[int, SharedFrameHandle]()
+    for key in keys:
+        value = context[key]
+        if isinstance(value, pd.DataFrame):
+            handles[key] = store.publish(value)
+        elif is_shareable(value) and all(isinstance(item, pd.DataFrame) for item in value.values()):
+            handles[key] = type(value)(store.publish_mapping(value))
+        elif is_shareable(value):
+            handles[key] = type(value)(
+                (ticker, _publish_complex_data(store, data, published)) for ticker, data in value.items()
+            )
+        else:
+            raise TypeError(f"Context entry '{key}' of type {type(value)} can't be shared")
+    return handles
+
+
+def attach_context(handles: dict[str, typing.Any], read_only: bool = False) -> dict[str, typing.Any]:
+    """Worker side counterpart of `publish_context`."""
+    context = dict[str, typing.Any]()
+    for key, value in handles.items():
+        if isinstance(value, SharedFrameHandle):
+            context[key] = attach(value, read_only)
+        elif all(isinstance(item, SharedFrameHandle) for item in value.values()):
+            context[key] = type(value)(attach_mapping(value, read_only))
+        else:
+            context[key] = type(value)(
+                (ticker, _attach_complex_data(handle, read_only)) for ticker, handle in value.items()
+            )
+    return context
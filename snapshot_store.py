@@ -0,0 +1,197 @@
+import bisect
+import hashlib
+import io
+import json
+import os
+import threading
+import zlib
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import config_logging as clog
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+SNAPSHOT_TIME_FORMAT = '%Y-%m-%dT%H-%M-%S.%f'
+
+
+@dataclass
+class SnapshotManifest:
+    name: str
+    snapshot_time: str
+    codec: str
+    size: int
+    content_hash: str
+    chunks: list[str]
+
+    @property
+    def time(self) -> datetime:
+        return datetime.strptime(self.snapshot_time, SNAPSHOT_TIME_FORMAT)
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("The snapshot is compressed with zstd: install the 'zstandard' package to read it.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _write_atomically(target_path: Path, data: bytes):
+    temporary_path = target_path.with_name(f".{target_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        temporary_path.write_bytes(data)
+        os.replace(temporary_path, target_path)
+    finally:
+        if temporary_path.exists():
+            temporary_path.unlink()
+
+
+def line_aligned_chunks(data: bytes, average_size: int = 64 * 1024,
+                        min_size: int = 16 * 1024, max_size: int = 256 * 1024) -> list[bytes]:
+    """Content-defined chunks ending at line ends.
+
+    A chunk ends after a line whose hash matches a mask, so boundaries depend on the
+    lines themselves, not on their offsets: rows appended to or edited in a CSV
+    change only the chunks around them and every other chunk deduplicates.
+    """
+    # One line in 2**k ends a chunk: `average_size` bytes for lines of ~64 bytes
+    mask = (1 << max(int(average_size).bit_length() - 1 - 6, 0)) - 1
+    chunks = []
+    chunk_begin = 0
+    line_begin = 0
+    data_size = len(data)
+    while line_begin < data_size:
+        line_end = data.find(b'\n', line_begin)
+        line_end = data_size if line_end < 0 else line_end + 1
+        chunk_size = line_end - chunk_begin
+        if chunk_size >= max_size or (chunk_size >= min_size and zlib.crc32(data[line_begin:line_end]) & mask == 0):
+            chunks.append(data[chunk_begin:line_end])
+            chunk_begin = line_end
+        line_begin = line_end
+    if chunk_begin < data_size:
+        chunks.append(data[chunk_begin:])
+    return chunks
+
+
+class SnapshotStore:
+    """Content-addressed history of downloaded files.
+
+    Every snapshot is a JSON manifest listing compressed, deduplicated chunks
+    (`chunks/<codec>/<sha256[:2]>/<sha256>`), so keeping all downloads of a slowly
+    growing history costs little more than its latest version; a download equal to
+    the latest snapshot adds nothing. `get(name, as_of)` returns
+    the last snapshot taken at or before `as_of`. Chunks are compressed with zstd
+    if the `zstandard` package is installed, with zlib otherwise.
+    """
+
+    LOGGER = clog.get_logger('SnapshotStore')
+
+    def __init__(self, directory: str, codec: str | None = None):
+        self.__directory = Path(directory)
+        self.__codec = codec if codec is not None else ('zstd' if zstandard is not None else 'zlib')
+        if self.__codec not in ['zstd', 'zlib']:
+            raise ValueError(f"Unsupported snapshot codec '{self.__codec}'. Supported: ['zstd', 'zlib']")
+        if self.__codec == 'zstd' and zstandard is None:
+            raise ValueError("The zstd codec requires the 'zstandard' package.")
+
+    def __chunk_path(self, chunk_hash: str) -> Path:
+        codec, digest = chunk_hash.split('-', 1)
+        return Path(self.__directory, 'chunks', codec, digest[:2], digest)
+
+    def __read_chunk(self, chunk_hash: str) -> bytes:
+        chunk_path = self.__chunk_path(chunk_hash)
+        if not chunk_path.is_file():
+            # Stores written before the fan-out on the digest
+            chunk_path = Path(self.__directory, 'chunks', chunk_hash[:2], chunk_hash)
+        return chunk_path.read_bytes()
+
+    def __manifest_directory(self, name: str) -> Path:
+        return Path(self.__directory, 'manifests', name)
+
+    def put(self, name: str, data: bytes, snapshot_time: datetime | None = None) -> SnapshotManifest:
+        """Snapshot of `data`; the latest snapshot if its content is the same."""
+        snapshot_time = snapshot_time if snapshot_time is not None else datetime.now()
+        content_hash = hashlib.sha256(data).hexdigest()
+        if self.snapshot_times(name):
+            latest_manifest = self.manifest(name)
+            if latest_manifest.content_hash == content_hash:
+                self.LOGGER.info(f"[{name}] Unchanged since the snapshot {latest_manifest.snapshot_time}")
+                return latest_manifest
+
+        chunk_hashes = []
+        written_chunks, written_nbytes = 0, 0
+        for chunk in line_aligned_chunks(data):
+            # The codec is a part of the address: chunks of both codecs may coexist
+            chunk_hash = self.__codec + '-' + hashlib.sha256(chunk).hexdigest()
+            chunk_path = self.__chunk_path(chunk_hash)
+            if not chunk_path.is_file():
+                compressed_chunk = _compress(self.__codec, chunk)
+                chunk_path.parent.mkdir(parents=True, exist_ok=True)
+                _write_atomically(chunk_path, compressed_chunk)
+                written_chunks += 1
+                written_nbytes += len(compressed_chunk)
+            chunk_hashes.append(chunk_hash)
+
+        manifest = SnapshotManifest(
+            name, snapshot_time.strftime(SNAPSHOT_TIME_FORMAT), self.__codec,
+            len(data), content_hash, chunk_hashes
+        )
+        manifest_directory = self.__manifest_directory(name)
+        manifest_directory.mkdir(parents=True, exist_ok=True)
+        _write_atomically(Path(manifest_directory, manifest.snapshot_time + '.json'),
+                          json.dumps(asdict(manifest)).encode())
+        self.LOGGER.info(f"[{name}] Snapshot {manifest.snapshot_time}: {len(data)} bytes in {len(chunk_hashes)} chunks, \
+{written_chunks} new chunks of {written_nbytes} compressed bytes")
+        return manifest
+
+    def put_dataframe(self, name: str, dataframe: pd.DataFrame, snapshot_time: datetime | None = None) -> SnapshotManifest:
+        return self.put(name, dataframe.to_csv().encode(), snapshot_time)
+
+    def snapshot_times(self, name: str) -> list[datetime]:
+        manifest_directory = self.__manifest_directory(name)
+        if not manifest_directory.is_dir():
+            return []
+        return sorted(
+            datetime.strptime(path.stem, SNAPSHOT_TIME_FORMAT) for path in manifest_directory.glob('*.json')
+        )
+
+    def manifest(self, name: str, as_of: datetime | None = None) -> SnapshotManifest:
+        """Manifest of the last snapshot taken at or before `as_of` (the latest one by default)."""
+        snapshot_times = self.snapshot_times(name)
+        position = len(snapshot_times) if as_of is None else bisect.bisect_right(snapshot_times, as_of)
+        if position == 0:
+            raise FileNotFoundError(f"No snapshot of '{name}' as of {as_of} in {self.__directory}")
+        snapshot_time = snapshot_times[position - 1].strftime(SNAPSHOT_TIME_FORMAT)
+        manifest_path = Path(self.__manifest_directory(name), snapshot_time + '.json')
+        return SnapshotManifest(**json.loads(manifest_path.read_text()))
+
+    def get(self, name: str, as_of: datetime | None = None) -> bytes:
+        manifest = self.manifest(name, as_of)
+        data = b''.join(
+            _decompress(manifest.codec, self.__read_chunk(chunk_hash)) for chunk_hash in manifest.chunks
+        )
+        if hashlib.sha256(data).hexdigest() != manifest.content_hash:
+            raise ValueError(f"Snapshot '{name}' {manifest.snapshot_time} is corrupted")
+        return data
+
+    def get_dataframe(self, name: str, as_of: datetime | None = None, index_col: str | int = 0) -> pd.DataFrame:
+        return pd.read_csv(io.BytesIO(self.get(name, as_of)), index_col=index_col, parse_dates=True)
+
+    @property
+    def stored_nbytes(self) -> int:
+        """Disk usage of the chunks and manifests."""
+        return sum(path.stat().st_size for path in self.__directory.rglob('*') if path.is_file())
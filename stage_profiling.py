@@ -0,0 +1,209 @@
+import collections
+import contextlib
+import cProfile
+import json
+import pstats
+import re
+import sys
+import threading
+import time
+import typing
+from pathlib import Path
+
+import config_logging as clog
+
+
+PROFILERS = ['cprofile', 'sampling']
+
+# Frames are "function (file:line)", the usual notation of flame graph tools
+_Frame = str
+
+
+def _frame_name(file_name: str, line: int, function_name: str) -> _Frame:
+    return f"{function_name} ({file_name}:{line})"
+
+
+def pstats_stacks(stats: pstats.Stats, max_depth: int = 64,
+                  min_seconds: float = 1e-5) -> collections.Counter[tuple[_Frame, ...]]:
+    """Seconds per call stack reconstructed from the caller/callee edges of a cProfile run.
+
+    cProfile records only the edges, so the own time of a function is split among its
+    stacks in proportion to the time each caller spent in it: exact for call trees,
+    an approximation for functions called from several places. Stacks taking less
+    than `min_seconds` are not expanded.
+    """
+    entries = stats.stats
+    callees = collections.defaultdict(dict)
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, edge_cumulative_time) in callers.items():
+            callees[caller][function] = edge_cumulative_time
+    roots = [
+        function for function, (_, _, _, _, callers) in entries.items()
+        if not callers or set(callers.keys()) == {function}
+    ]
+
+    stacks = collections.Counter[tuple[_Frame, ...]]()
+
+    def visit(function, path: tuple, share: float):
+        _, _, own_time, cumulative_time, _ = entries[function]
+        stack = path + (_frame_name(*function),)
+        if own_time * share > 0:
+            stacks[stack] += own_time * share
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_cumulative_time in callees[function].items():
+            callee_cumulative_time = entries[callee][3]
+            # Recursion is folded into the outermost call
+            if callee == function or _frame_name(*callee) in stack or callee_cumulative_time <= 0 \
+                    or share * edge_cumulative_time < min_seconds:
+                continue
+            visit(callee, stack, share * edge_cumulative_time / callee_cumulative_time)
+
+    for root in roots:
+        visit(root, (), 1.0)
+    return stacks
+
+
+def write_folded(stacks: typing.Mapping[tuple[_Frame, ...], float], file_path: Path, unit: float = 1e-6):
+    """Collapsed stacks ("a;b;c <weight>") for flamegraph.pl, inferno or speedscope; weights in `unit` seconds."""
+    with open(file_path, 'w') as folded_file:
+        for stack, seconds in stacks.items():
+            weight = int(round(seconds / unit))
+            if weight > 0:
+                folded_file.write(';'.join(frame.replace(';', ':') for frame in stack) + f" {weight}\n")
+
+
+def write_speedscope(stacks: typing.Mapping[tuple[_Frame, ...], float], file_path: Path, name: str):
+    """A sampled profile of the speedscope file format (https://www.speedscope.app)."""
+    frames = list[dict]()
+    frame_numbers = dict[_Frame, int]()
+    samples, weights = [], []
+    for stack, seconds in stacks.items():
+        sample = []
+        for frame in stack:
+            if frame not in frame_numbers:
+                frame_numbers[frame] = len(frames)
+                match = re.fullmatch(r'(.*) \((.*):(\d+)\)', frame)
+                frames.append(
+                    {'name': match[1], 'file': match[2], 'line': int(match[3])} if match is not None else {'name': frame}
+                )
+            sample.append(frame_numbers[frame])
+        samples.append(sample)
+        weights.append(seconds)
+    file_path.write_text(json.dumps({
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled', 'name': name, 'unit': 'seconds',
+            'startValue': 0, 'endValue': sum(weights), 'samples': samples, 'weights': weights
+        }],
+        'name': name,
+        'exporter': 'stage_profiling'
+    }))
+
+
+class _StackSampler:
+    """Samples the call stack of a thread every `interval` seconds from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.__thread_id = thread_id
+        self.__interval = interval
+        self.__stacks = collections.Counter[tuple[_Frame, ...]]()
+        self.__stopped = threading.Event()
+        self.__sampler_thread = threading.Thread(target=self.__sample, name='stage-sampler', daemon=True)
+
+    def __sample(self):
+        previous_time = time.perf_counter()
+        while not self.__stopped.wait(self.__interval):
+            current_time = time.perf_counter()
+            frame = sys._current_frames().get(self.__thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code.co_filename, frame.f_code.co_firstlineno, frame.f_code.co_name))
+                frame = frame.f_back
+            if stack:
+                # Weighted by the wall time elapsed since the previous sample
+                self.__stacks[tuple(reversed(stack))] += current_time - previous_time
+            previous_time = current_time
+
+    def __enter__(self) -> '_StackSampler':
+        self.__sampler_thread.start()
+        return self
+
+    def __exit__(self, *exception_info):
+        self.__stopped.set()
+        self.__sampler_thread.join()
+
+    @property
+    def stacks(self) -> collections.Counter[tuple[_Frame, ...]]:
+        return self.__stacks
+
+
+class StageProfiler:
+    """Profiles workflow stages one by one.
+
+    With the deterministic 'cprofile' profiler every stage gets `<stage>.pstats`
+    (for `pstats`, snakeviz...), with the 'sampling' profiler the stack of the
+    executing thread is sampled every `sampling_interval` seconds at a lower overhead.
+    Both write `<stage>.folded` collapsed stacks for flame graphs and
+    `<stage>.speedscope.json` to `directory`. `stages=None` profiles all stages.
+    """
+
+    LOGGER = clog.get_logger('StageProfiler')
+
+    def __init__(self, stages: typing.Iterable[str] | None = None, profiler: str = 'cprofile',
+                 directory: str = 'data/generated/profiles', sampling_interval: float = 0.001):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}'. Profilers: {PROFILERS}")
+        self.__stages = set(stages) if stages is not None else None
+        self.__profiler = profiler
+        self.__directory = Path(directory)
+        self.__sampling_interval = sampling_interval
+        self.__profile_files = collections.OrderedDict[str, list[Path]]()
+
+    @property
+    def stages(self) -> set[str] | None:
+        return self.__stages
+
+    def profiles(self, stage: str) -> bool:
+        return self.__stages is None or stage in self.__stages
+
+    @contextlib.contextmanager
+    def profile(self, stage: str) -> typing.Iterator[None]:
+        """Profile the enclosed code as `stage` if selected."""
+        if not self.profiles(stage):
+            yield
+            return
+
+        self.__directory.mkdir(parents=True, exist_ok=True)
+        # Stage keys are file names already, e.g. '11-dataset_command'
+        file_stem = re.sub(r'[^0-9A-Za-z_.-]', '_', stage)
+        profile_files = []
+        if self.__profiler == 'cprofile':
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                stats_path = Path(self.__directory, file_stem + '.pstats')
+                profile.dump_stats(stats_path)
+                profile_files.append(stats_path)
+                stacks = pstats_stacks(pstats.Stats(profile))
+        else:
+            with _StackSampler(threading.get_ident(), self.__sampling_interval) as sampler:
+                yield
+            stacks = sampler.stacks
+
+        folded_path = Path(self.__directory, file_stem + '.folded')
+        write_folded(stacks, folded_path)
+        speedscope_path = Path(self.__directory, file_stem + '.speedscope.json')
+        write_speedscope(stacks, speedscope_path, name=stage)
+        profile_files.extend([folded_path, speedscope_path])
+        self.__profile_files[stage] = profile_files
+        self.LOGGER.info(f"[{stage}] Profiled with {self.__profiler}: {[str(path) for path in profile_files]}")
+
+    @property
+    def profile_files(self) -> collections.OrderedDict[str, list[Path]]:
+        """Files written for each profiled stage by the last profiling."""
+        return self.__profile_files
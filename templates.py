@@ -25,17 +25,32 @@ def to_string(object) -> str:
 
 class TemplateFactory():
 
-    ENVIRONMENT = jinja.Environment(loader=jinja.FileSystemLoader('./data/templates/'))
+    TEMPLATES_DIRECTORY: Path = Path('./data/templates/')
+    # Compiled templates persist between runs, keyed by template name and source checksum
+    BYTECODE_CACHE_DIRECTORY: Path = Path('./.cache/jinja')
+
+    ENVIRONMENT: jinja.Environment | None = None
     TEMPLATES = dict[str, jinja.Template]()
 
+    @classmethod
+    def environment(cls) -> jinja.Environment:
+        if cls.ENVIRONMENT is None:
+            cls.BYTECODE_CACHE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+            cls.ENVIRONMENT = jinja.Environment(
+                loader=jinja.FileSystemLoader(str(cls.TEMPLATES_DIRECTORY)),
+                bytecode_cache=jinja.FileSystemBytecodeCache(str(cls.BYTECODE_CACHE_DIRECTORY)),
+                auto_reload=False
+            )
+            for template_function in GLOBAL_TEMPLATE_FUNCTIONS:
+                cls.ENVIRONMENT.globals[template_function.__name__] = template_function
+        return cls.ENVIRONMENT
+
     @classmethod
     def make_template(cls, template_name: str) -> jinja.Template:
         if template_name in cls.TEMPLATES:
             return cls.TEMPLATES[template_name]
 
-        template = cls.ENVIRONMENT.get_template(template_name)
-        for template_function in GLOBAL_TEMPLATE_FUNCTIONS:
-            template.globals[template_function.__name__] = template_function
+        template = cls.environment().get_template(template_name)
 
         cls.TEMPLATES[template_name] = template
         return template
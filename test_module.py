@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cross_validation as cv
+import financial_features as ff
+import lagged_windows as lw
+import walk_forward as wfe
+
+
+def _random_walk_dataset(rows: int = 400) -> pd.DataFrame:
+    random_generator = np.random.default_rng(0)
+    close = 100.0 + random_generator.standard_normal(rows).cumsum()
+    dataset = pd.DataFrame(
+        {'close': close, 'noise': random_generator.standard_normal(rows)},
+        index=pd.date_range('2020-01-01', periods=rows, freq='D', name='date')
+    )
+    dataset['close_shift-1'] = dataset['close'].shift(-1)
+    return dataset
+
+
+def _walk_forward_evaluation(exclude_columns: list[str]) -> pd.DataFrame:
+    dataset = _random_walk_dataset()
+    lagged_window_dataset = lw.LaggedWindowDataset(
+        dataset, lw.LaggedWindowGenerator(lags=5, horizon=1, batch_size=64),
+        target_columns=['close'], exclude_columns=exclude_columns
+    )
+    folds = list(cv.SlidingWindowSplitter(window=200, step=50, horizon=50).split(len(dataset)))
+    return wfe.WalkForwardEvaluator(max_workers=1).evaluate(lagged_window_dataset, folds)
+
+
+def test_walk_forward_evaluation_fails_on_forward_shifted_target():
+    with pytest.raises(ValueError, match='close_shift-1'):
+        _walk_forward_evaluation(exclude_columns=[])
+
+
+def test_walk_forward_evaluation_without_look_ahead_features_has_no_skill_on_random_walk():
+    evaluation = _walk_forward_evaluation(exclude_columns=ff.look_ahead_columns(_random_walk_dataset().columns))
+    assert evaluation['error'].isna().all()
+    # Persistence is the best forecast of a random walk: a leak would make the skill close to 1
+    assert evaluation['skill'].mean() < 0.5
+
+
+def test_look_ahead_columns_are_negative_shifts_and_their_descendants():
+    columns = ['close', 'close_shift-1', 'close_shift-2_TSLA', 'close_shift1', 'MA20_TSLA']
+    assert ff.look_ahead_columns(columns, tickers=['TSLA']) == ['close_shift-1', 'close_shift-2_TSLA']
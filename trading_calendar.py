@@ -0,0 +1,111 @@
+import functools
+import typing
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import config_logging as clog
+import config_model as cfgm
+
+
+# Trading days of the week; the supported exchanges trade from Monday to Friday
+EXCHANGE_WEEKMASKS = {
+    'NYSE': '1111100',
+    'ECB': '1111100',
+}
+
+def _nyse_traded(day: date, name: str) -> bool:
+    # New Year's Day on a Saturday is not observed on the Friday before; Juneteenth was first observed in 2022
+    return (day.month == 12 and day.day == 31) or ('Juneteenth' in name and day.year < 2022)
+
+
+# Rules of the days, with their names, the `holidays` financial calendars mark as holidays
+# although the exchange traded
+EXCHANGE_SESSION_CORRECTIONS: dict[str, typing.Callable[[date, str], bool]] = {
+    'NYSE': _nyse_traded,
+}
+
+
+class TradingCalendar:
+    """Trading sessions of an exchange.
+
+    A session bitmap (one boolean per calendar day) is precomputed once per year
+    from the exchange weekmask and its `holidays` financial calendar, so checking
+    or generating sessions of any index is a vectorized lookup.
+    """
+
+    LOGGER = clog.get_logger('TradingCalendar')
+
+    def __init__(self, exchange: str):
+        if exchange not in EXCHANGE_WEEKMASKS:
+            raise ValueError(f"Unsupported exchange '{exchange}'. Supported: {list(EXCHANGE_WEEKMASKS.keys())}")
+        self.__exchange = exchange
+        self.__weekmask = EXCHANGE_WEEKMASKS[exchange]
+        self.__session_bitmaps = dict[int, np.ndarray]()
+
+    @property
+    def exchange(self) -> str:
+        return self.__exchange
+
+    def session_bitmap(self, year: int) -> np.ndarray:
+        """Booleans of the days of `year`: True for trading sessions."""
+        if year not in self.__session_bitmaps:
+            from holidays import financial_holidays
+
+            days = np.arange(f"{year}-01-01", f"{year + 1}-01-01", dtype='datetime64[D]')
+            traded = EXCHANGE_SESSION_CORRECTIONS.get(self.__exchange, lambda day, name: False)
+            exchange_holidays = np.array(
+                [
+                    day for day, name in financial_holidays(self.__exchange, years=year).items()
+                    if day.year == year and not traded(day, name)
+                ],
+                dtype='datetime64[D]'
+            )
+            self.__session_bitmaps[year] = np.is_busday(days, weekmask=self.__weekmask, holidays=exchange_holidays)
+            self.LOGGER.debug(f"[{self.__exchange}] {year}: {self.__session_bitmaps[year].sum()} sessions")
+        return self.__session_bitmaps[year]
+
+    def __days_bitmap(self, first_year: int, last_year: int) -> np.ndarray:
+        return np.concatenate([self.session_bitmap(year) for year in range(first_year, last_year + 1)])
+
+    def is_session(self, timestamps) -> np.ndarray:
+        """Booleans of the timestamps (of any time of the day) falling on trading sessions."""
+        days = pd.DatetimeIndex(timestamps).values.astype('datetime64[D]')
+        if len(days) == 0:
+            return np.zeros(0, dtype=bool)
+        years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+        first_day = np.datetime64(f"{years.min()}-01-01", 'D')
+        return self.__days_bitmap(int(years.min()), int(years.max()))[(days - first_day).astype(np.int64)]
+
+    def is_holiday(self, timestamps) -> np.ndarray:
+        """Booleans of the timestamps falling on exchange holidays, i.e. days of the trading week without a session."""
+        days = pd.DatetimeIndex(timestamps).values.astype('datetime64[D]')
+        return np.is_busday(days, weekmask=self.__weekmask) & ~self.is_session(days)
+
+    def is_holiday_adjacent(self, timestamps) -> np.ndarray:
+        """Booleans of the timestamps right before or after an exchange holiday: the previous or
+        the next day of the trading week has no session."""
+        days = pd.DatetimeIndex(timestamps).values.astype('datetime64[D]')
+        if len(days) == 0:
+            return np.zeros(0, dtype=bool)
+        previous_days = np.busday_offset(days, -1, roll='backward', weekmask=self.__weekmask)
+        next_days = np.busday_offset(days, 1, roll='forward', weekmask=self.__weekmask)
+        return self.is_holiday(previous_days) | self.is_holiday(next_days)
+
+    def sessions(self, begin_time: datetime | date, end_time: datetime | date) -> pd.DatetimeIndex:
+        """Session days from `begin_time` to `end_time`, both inclusive."""
+        all_days = pd.date_range(pd.Timestamp(begin_time).normalize(), pd.Timestamp(end_time).normalize(), freq='D')
+        return all_days[self.is_session(all_days)]
+
+
+@functools.lru_cache(maxsize=None)
+def trading_calendar(exchange: str) -> TradingCalendar:
+    """Shared calendar of `exchange`: its session bitmaps are computed once per process."""
+    return TradingCalendar(exchange)
+
+
+def instrument_trading_calendar(quoted_instrument: cfgm.QuotedInstrument) -> TradingCalendar | None:
+    """Calendar of the `trading_calendar` exchange of the instrument clearing, None if not set."""
+    exchange = (quoted_instrument.data_transformation.clearing or {}).get('trading_calendar')
+    return trading_calendar(exchange) if exchange else None
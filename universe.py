@@ -0,0 +1,86 @@
+import typing
+from collections.abc import Mapping
+from pathlib import Path
+
+import pandas as pd
+
+import config_model as cfgm
+import dataset_export as dex
+
+
+def read_tickers(tickers_file: str) -> list[str]:
+    """Tickers of a file with one ticker per line; blank lines, '#' comments and repetitions are skipped."""
+    tickers = dict[str, None]()
+    for line in Path(tickers_file).read_text().splitlines():
+        ticker = line.split('#', 1)[0].strip()
+        if ticker:
+            tickers[ticker] = None
+    return list(tickers.keys())
+
+
+def _format_ticker(value: typing.Any, ticker: str) -> typing.Any:
+    if isinstance(value, str):
+        return value.replace('{ticker}', ticker)
+    if isinstance(value, dict):
+        return type(value)((key, _format_ticker(item, ticker)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_format_ticker(item, ticker) for item in value]
+    return value
+
+
+def universe_instrument(defaults: cfgm.UniverseDefaults, ticker: str) -> cfgm.QuotedInstrument:
+    return cfgm.QuotedInstrument.parse_obj({'ticker': ticker, **_format_ticker(defaults.dict(), ticker)})
+
+
+def universe_instruments(universe: cfgm.Universe) -> typing.Iterator[cfgm.QuotedInstrument]:
+    """Instruments of the universe, built one by one from the shared defaults."""
+    for ticker in read_tickers(universe.tickers_file):
+        yield universe_instrument(universe.defaults, ticker)
+
+
+def instrument_chunks(instruments: typing.Iterable[cfgm.QuotedInstrument],
+                      chunk_size: int) -> typing.Iterator[list[cfgm.QuotedInstrument]]:
+    if chunk_size <= 0:
+        raise ValueError(f"The chunk size must be positive: {chunk_size}")
+    chunk = []
+    for instrument in instruments:
+        chunk.append(instrument)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def chunk_config(config: cfgm.Config, chunk: list[cfgm.QuotedInstrument]) -> cfgm.Config:
+    """The configuration of a chunk: its first instrument as the target, the others as quoted instruments."""
+    research = config.research.copy(update={
+        'target_quoted_instrument': chunk[0],
+        'quoted_instruments': chunk[1:],
+    })
+    return config.copy(update={'research': research})
+
+
+class UniverseData(Mapping):
+    """Processed frames of a universe, stored per ticker on disk and read on access."""
+
+    def __init__(self, dataset_paths: typing.Mapping[str, Path] | None = None,
+                 failed_tickers: typing.Iterable[str] = ()):
+        self.__dataset_paths = dict[str, Path](dataset_paths or {})
+        self.failed_tickers = list(failed_tickers)
+
+    def add(self, ticker: str, dataset_path: Path):
+        self.__dataset_paths[ticker] = dataset_path
+
+    def __getitem__(self, ticker: str) -> pd.DataFrame:
+        return dex.load_dataset(str(self.__dataset_paths[ticker]))
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.__dataset_paths)
+
+    def __len__(self) -> int:
+        return len(self.__dataset_paths)
+
+    @property
+    def dataset_paths(self) -> dict[str, Path]:
+        return dict(self.__dataset_paths)
@@ -0,0 +1,283 @@
+import multiprocessing
+import os
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+
+import numpy as np
+import pandas as pd
+
+import config_logging as clog
+import config_model as cfgm
+import cross_validation as cv
+import lagged_windows as lw
+
+
+LOGGER = clog.get_logger('WalkForward')
+
+
+class AbstractForecastModel:
+    """Model evaluated fold by fold: fitted on the train samples of a fold, then predicting its validation targets.
+
+    Lags are (samples, lags, features) and targets (samples, horizon, targets), as the
+    samples of `lagged_windows.LaggedWindowGenerator`; both may be read-only views.
+    """
+
+    def fit(self, lags: np.ndarray, targets: np.ndarray) -> 'AbstractForecastModel':
+        raise NotImplementedError("Abstract forecast model has no implementation.")
+
+    def predict(self, lags: np.ndarray) -> np.ndarray:
+        raise NotImplementedError("Abstract forecast model has no implementation.")
+
+
+class RidgeModel(AbstractForecastModel):
+    """Ridge regression of the flattened, standardized lag windows on all target steps.
+
+    With fewer samples than lag values (the usual case) the dual form is solved,
+    a (samples x samples) system instead of a (lag values x lag values) one.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        if alpha <= 0:
+            raise ValueError(f"The ridge alpha must be positive: {alpha}")
+        self.__alpha = alpha
+        self.__mean = None
+        self.__scale = None
+        self.__weights = None
+        self.__intercept = None
+        self.__target_shape = None
+
+    def __design(self, lags: np.ndarray) -> np.ndarray:
+        return (lags.reshape(lags.shape[0], -1) - self.__mean) / self.__scale
+
+    def fit(self, lags: np.ndarray, targets: np.ndarray) -> 'RidgeModel':
+        values = lags.reshape(lags.shape[0], -1)
+        self.__mean = values.mean(axis=0)
+        scale = values.std(axis=0)
+        self.__scale = np.where(scale > 0, scale, 1.0)
+        design = self.__design(lags)
+
+        self.__target_shape = targets.shape[1:]
+        target_values = targets.reshape(targets.shape[0], -1)
+        self.__intercept = target_values.mean(axis=0)
+        centered_targets = target_values - self.__intercept
+
+        n_samples, n_values = design.shape
+        if n_samples < n_values:
+            gram = design @ design.T
+            gram[np.diag_indices_from(gram)] += self.__alpha
+            self.__weights = design.T @ np.linalg.solve(gram, centered_targets)
+        else:
+            gram = design.T @ design
+            gram[np.diag_indices_from(gram)] += self.__alpha
+            self.__weights = np.linalg.solve(gram, design.T @ centered_targets)
+        return self
+
+    def predict(self, lags: np.ndarray) -> np.ndarray:
+        if self.__weights is None:
+            raise ValueError("The model isn't fitted")
+        predictions = self.__design(lags) @ self.__weights + self.__intercept
+        return predictions.reshape((lags.shape[0],) + self.__target_shape)
+
+
+MODELS: dict[str, type[AbstractForecastModel]] = {
+    'ridge': RidgeModel,
+}
+
+
+@dataclass
+class FoldEvaluation:
+    """Metrics of a fold in the units of the (scaled) targets, with the persistence baseline
+    (the last known target value over the whole horizon) and timings in seconds."""
+    number: int
+    holdout: bool
+    train_samples: int
+    validation_samples: int
+    mae: float
+    rmse: float
+    directional_accuracy: float
+    baseline_mae: float
+    baseline_rmse: float
+    # 1 - MSE / baseline MSE: positive if the model beats persistence
+    skill: float
+    fit_time: float
+    predict_time: float
+    total_time: float
+    worker: int
+    error: str | None = None
+
+
+@dataclass
+class _EvaluationInputs:
+    features: np.ndarray
+    targets: np.ndarray
+    generator: lw.LaggedWindowGenerator
+    model_class: type[AbstractForecastModel]
+    model_parameters: dict
+
+
+def _complete_samples(features: np.ndarray, targets: np.ndarray, generator: lw.LaggedWindowGenerator,
+                      rows: slice) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Lags, targets and last known targets of the samples within `rows` without NaNs."""
+    lags, sample_targets = generator.samples(features[rows], targets[rows])
+    last_targets = targets[rows.start + generator.lags - 1:][:lags.shape[0]]
+    complete = ~(np.isnan(lags).any(axis=(1, 2)) | np.isnan(sample_targets).any(axis=(1, 2)))
+    if complete.all():
+        return lags, sample_targets, last_targets
+    return lags[complete], sample_targets[complete], last_targets[complete]
+
+
+def _evaluate_fold(inputs: _EvaluationInputs, fold: cv.Fold, holdout: bool) -> FoldEvaluation:
+    start_time = time.perf_counter()
+    generator = inputs.generator
+    train_lags, train_targets, _ = _complete_samples(inputs.features, inputs.targets, generator, fold.train)
+    # Validation samples may look back into the train window, their targets are all validation rows
+    validation_rows = slice(max(fold.validation.start - generator.lags, 0), fold.validation.stop)
+    validation_lags, validation_targets, last_targets = _complete_samples(
+        inputs.features, inputs.targets, generator, validation_rows
+    )
+    evaluation = dict(
+        number=fold.number, holdout=holdout,
+        train_samples=train_lags.shape[0], validation_samples=validation_lags.shape[0],
+        worker=os.getpid()
+    )
+    if train_lags.shape[0] == 0 or validation_lags.shape[0] == 0:
+        return _failed_evaluation(evaluation, start_time, 'No complete train or validation samples')
+
+    fit_start_time = time.perf_counter()
+    try:
+        model = inputs.model_class(**inputs.model_parameters).fit(train_lags, train_targets)
+        predict_start_time = time.perf_counter()
+        predictions = model.predict(validation_lags)
+    except Exception as exception:
+        LOGGER.error(f"[fold {fold.number}] {inputs.model_class.__name__} failed: {exception}", exc_info=True)
+        return _failed_evaluation(evaluation, start_time, repr(exception))
+    predict_end_time = time.perf_counter()
+
+    errors = predictions - validation_targets
+    baseline_errors = last_targets[:, np.newaxis, :] - validation_targets
+    mse = float(np.mean(errors ** 2))
+    baseline_mse = float(np.mean(baseline_errors ** 2))
+    directions = np.sign(validation_targets - last_targets[:, np.newaxis, :])
+    predicted_directions = np.sign(predictions - last_targets[:, np.newaxis, :])
+    return FoldEvaluation(
+        **evaluation,
+        mae=float(np.mean(np.abs(errors))),
+        rmse=float(np.sqrt(mse)),
+        directional_accuracy=float(np.mean(predicted_directions == directions)),
+        baseline_mae=float(np.mean(np.abs(baseline_errors))),
+        baseline_rmse=float(np.sqrt(baseline_mse)),
+        skill=1.0 - mse / baseline_mse if baseline_mse > 0 else np.nan,
+        fit_time=predict_start_time - fit_start_time,
+        predict_time=predict_end_time - predict_start_time,
+        total_time=predict_end_time - start_time
+    )
+
+
+def _failed_evaluation(evaluation: dict, start_time: float, error: str) -> FoldEvaluation:
+    return FoldEvaluation(
+        **evaluation, mae=np.nan, rmse=np.nan, directional_accuracy=np.nan,
+        baseline_mae=np.nan, baseline_rmse=np.nan, skill=np.nan,
+        fit_time=0.0, predict_time=0.0, total_time=time.perf_counter() - start_time, error=error
+    )
+
+
+def look_ahead_features(dataset: lw.LaggedWindowDataset) -> list[str]:
+    """Feature columns equal to a target 1 to `horizon` rows later wherever both are known:
+    forward-shifted targets (e.g. close_shift-1) that would leak them into the lag windows."""
+    features, targets = dataset.features, dataset.targets
+    leaking = np.zeros(features.shape[1], dtype=bool)
+    for step in range(1, dataset.generator.horizon + 1):
+        step_features = features[:-step]
+        for target in targets[step:].T:
+            known = ~np.isnan(step_features) & ~np.isnan(target)[:, np.newaxis]
+            equal = np.isclose(step_features, target[:, np.newaxis], rtol=1e-9, atol=0.0) | ~known
+            leaking |= equal.all(axis=0) & (known.sum(axis=0) > 1)
+    return [column for column, leaks in zip(dataset.feature_columns, leaking) if leaks]
+
+
+# Inputs of a walk-forward worker process, set once by the pool initializer
+_WORKER_INPUTS: _EvaluationInputs | None = None
+
+
+def _init_walk_forward_worker(logging_initargs: tuple, inputs: _EvaluationInputs):
+    global _WORKER_INPUTS
+    clog.init_worker_logging(*logging_initargs)
+    _WORKER_INPUTS = inputs
+
+
+def _evaluate_worker_fold(fold: cv.Fold, holdout: bool) -> FoldEvaluation:
+    return _evaluate_fold(_WORKER_INPUTS, fold, holdout)
+
+
+class WalkForwardEvaluator:
+    """Fits and evaluates a forecast model on every cross-validation fold and the holdout fold.
+
+    The feature and target matrices of the lagged window dataset are computed once;
+    folds read their samples as views of them. Folds run in a process pool: with the
+    `fork` start method the workers share the matrices copy-on-write, otherwise they
+    are pickled once per worker, not per fold.
+    """
+
+    LOGGER = clog.get_logger('WalkForwardEvaluator')
+
+    def __init__(self, model_class: type[AbstractForecastModel] = RidgeModel,
+                 model_parameters: dict | None = None,
+                 max_workers: int | None = None):
+        self.__model_class = model_class
+        self.__model_parameters = dict(model_parameters or {})
+        self.__max_workers = max_workers
+
+    @classmethod
+    def from_config(cls, machine_learning: cfgm.MachineLearning) -> 'WalkForwardEvaluator':
+        walk_forward = machine_learning.walk_forward
+        if walk_forward.model not in MODELS:
+            raise ValueError(f"Unknown forecast model '{walk_forward.model}'. Models: {list(MODELS.keys())}")
+        return cls(MODELS[walk_forward.model], walk_forward.model_parameters, walk_forward.max_workers)
+
+    def evaluate(self, dataset: lw.LaggedWindowDataset, folds: typing.Sequence[cv.Fold],
+                 holdout_fold: cv.Fold | None = None) -> pd.DataFrame:
+        """Evaluations of the folds (rows), with the train and validation time ranges.
+
+        Fails if features leak the targets, see `look_ahead_features`.
+        """
+        leaking_columns = look_ahead_features(dataset)
+        if leaking_columns:
+            raise ValueError(f"Features {leaking_columns} equal the targets {dataset.target_columns} up to \
+{dataset.generator.horizon} rows later: leave them out of the lagged window features")
+
+        fold_holdouts = [(fold, False) for fold in folds]
+        if holdout_fold is not None:
+            fold_holdouts.append((holdout_fold, True))
+        inputs = _EvaluationInputs(
+            dataset.features, dataset.targets, dataset.generator, self.__model_class, self.__model_parameters
+        )
+
+        max_workers = min(self.__max_workers or os.cpu_count() or 1, len(fold_holdouts))
+        start_time = time.perf_counter()
+        if max_workers <= 1:
+            evaluations = [_evaluate_fold(inputs, fold, holdout) for fold, holdout in fold_holdouts]
+        else:
+            start_methods = multiprocessing.get_all_start_methods()
+            mp_context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+            with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=mp_context,
+                    initializer=_init_walk_forward_worker,
+                    initargs=(clog.worker_logging_initargs(), inputs)) as executor:
+                futures = [executor.submit(_evaluate_worker_fold, fold, holdout) for fold, holdout in fold_holdouts]
+                evaluations = [future.result() for future in futures]
+        self.LOGGER.info(f"Evaluated {len(evaluations)} folds of {self.__model_class.__name__} \
+{self.__model_parameters} on {max_workers} workers in {time.perf_counter() - start_time:.3f} s")
+
+        index = dataset.index
+        return pd.DataFrame.from_records([
+            {
+                'number': fold.number, 'holdout': holdout,
+                'train_begin': index[fold.train.start], 'train_end': index[fold.train.stop - 1],
+                'validation_begin': index[fold.validation.start], 'validation_end': index[fold.validation.stop - 1],
+                **asdict(evaluation)
+            }
+            for (fold, holdout), evaluation in zip(fold_holdouts, evaluations)
+        ]).set_index('number')
@@ -1,9 +1,12 @@
 import typing
+import time
 from enum import Enum
 
 from collections import OrderedDict
 
 import config_logging
+import context_store as cst
+import stage_profiling as sprof
 
 
 class CommandState(Enum):
@@ -21,6 +24,10 @@ class AbstractCommand(object):
         """throws a NotImplementedError"""
         raise NotImplementedError('Not implemented!')
 
+    def consumed_context_keys(self) -> list[str] | None:
+        """Context keys the command reads; None if unknown."""
+        return None
+
 
 class DummyCommand(AbstractCommand):
     """Concrete Command # 1: Child class of AbstractCommand"""
@@ -33,14 +40,21 @@ class Workflow(AbstractCommand):
 
     LOGGER = config_logging.get_logger('Workflow')
 
-    def __init__(self, commands: OrderedDict[str, AbstractCommand]):
+    def __init__(self, commands: OrderedDict[str, AbstractCommand],
+                 stage_profiler: sprof.StageProfiler | None = None):
+        """With a `stage_profiler` its stages are profiled one by one, see `StageProfiler`."""
         self.__commands = commands
+        self.__stage_profiler = stage_profiler
         self.__workflow_stages = list(self.__commands.keys())
         self.__workflow_position = -1
         self.__workflow_state = CommandState.INITIALIZED
+        self.__stage_timings = OrderedDict[str, float]()
+        self.__stage_outputs = OrderedDict[str, set[str]]()
+        self.__key_producers = dict[str, str]()
 
     def execute(self, context: dict) -> CommandState:
         self.LOGGER.info('Executing workflow entirely...')
+        self.__workflow_position = -1
         self.LOGGER.info(f"Commands: {self.__commands}")
         for workflow_stage, workflow_command in self.__commands.items():
             workflow_state = self.execute_next_stage(context)
@@ -50,11 +64,57 @@ class Workflow(AbstractCommand):
         self.LOGGER.info('Executed workflow entirely... Done.')
         return self.__workflow_state
 
-    def execute_next_stage(self, context: dict):
-        self.__execute_sibling_stage(context, direction=1)
+    def execute_until(self, context: dict, stage: str) -> CommandState:
+        """Execute the stages after the current one up to and including `stage`."""
+        stage_position = self.__stage_position(stage)
+        while self.__workflow_position < stage_position:
+            workflow_state = self.__execute_sibling_stage(context, direction=1)
+            if workflow_state == CommandState.FAILED or workflow_state == CommandState.ABORTED:
+                self.LOGGER.warn(f"Workflow execution is interrupted. State: {workflow_state}")
+                break
+        return self.__workflow_state
 
-    def execute_previous_stage(self, context: dict):
-        self.__execute_sibling_stage(context, direction=-1)
+    def execute_from(self, context: dict, stage: str) -> CommandState:
+        """Re-execute the workflow from `stage` onward, see `rewind_to`."""
+        self.rewind_to(context, stage)
+        self.LOGGER.info(f"Executing workflow from the stage {stage}...")
+        return self.execute_until(context, self.__workflow_stages[-1])
+
+    def rewind_to(self, context: dict, stage: str):
+        """Make `stage` the next stage to execute.
+
+        Context entries created by `stage` and the later stages are dropped.
+        Entries of earlier stages are kept as they are: restoring them if a later
+        stage modified them in place is up to the caller (see `Processor.resume_from`).
+        """
+        stage_position = self.__stage_position(stage)
+        later_stages = set(self.__workflow_stages[stage_position:])
+        for key, producer_stage in list(self.__key_producers.items()):
+            if producer_stage in later_stages:
+                # Not `pop`: it would load a spilled `ContextStore` entry just to drop it
+                if key in context:
+                    del context[key]
+                del self.__key_producers[key]
+        self.__workflow_position = stage_position - 1
+
+    def sub_workflow(self, from_stage: str | None = None, to_stage: str | None = None) -> 'Workflow':
+        """New workflow of the stages from `from_stage` up to and including `to_stage`."""
+        from_position = self.__stage_position(from_stage) if from_stage is not None else 0
+        to_position = self.__stage_position(to_stage) if to_stage is not None else len(self.__workflow_stages) - 1
+        return Workflow(OrderedDict[str, AbstractCommand](
+            (stage, self.__commands[stage]) for stage in self.__workflow_stages[from_position:to_position + 1]
+        ), stage_profiler=self.__stage_profiler)
+
+    def __stage_position(self, stage: str) -> int:
+        if stage not in self.__commands:
+            raise ValueError(f"Unknown workflow stage '{stage}'. Stages: {self.__workflow_stages}")
+        return self.__workflow_stages.index(stage)
+
+    def execute_next_stage(self, context: dict) -> CommandState:
+        return self.__execute_sibling_stage(context, direction=1)
+
+    def execute_previous_stage(self, context: dict) -> CommandState:
+        return self.__execute_sibling_stage(context, direction=-1)
 
     def __execute_sibling_stage(self, context: dict, direction: int) -> CommandState:
         assert direction != 0
@@ -72,12 +132,73 @@ class Workflow(AbstractCommand):
         workflow_command = self.__commands[workflow_stage]
 
         self.LOGGER.info(f"\t - executing workflow stage {workflow_stage} ...")
-        self.__workflow_state = workflow_command.execute(context)
+        context_before = self.__context_identities(context)
+        stage_start_time = time.perf_counter()
+        if self.__stage_profiler is not None:
+            with self.__stage_profiler.profile(workflow_stage):
+                self.__workflow_state = workflow_command.execute(context)
+        else:
+            self.__workflow_state = workflow_command.execute(context)
+        self.__stage_timings[workflow_stage] = time.perf_counter() - stage_start_time
+        self.__track_stage_outputs(workflow_stage, context_before, context)
         self.__workflow_position = assumed_workflow_position
-        self.LOGGER.info(f"\t   ... Done. State: {self.__workflow_state}.")
+        if direction > 0 and isinstance(context, cst.ContextStore):
+            context.release_after(workflow_stage)
+        self.LOGGER.info(f"\t   ... Done. State: {self.__workflow_state}. \
+Time: {self.__stage_timings[workflow_stage]:.3f} s.")
 
         return self.__workflow_state
 
+    @staticmethod
+    def __context_identities(context: dict) -> dict[str, int]:
+        if isinstance(context, cst.ContextStore):
+            # Without loading spilled entries
+            return context.identities()
+        return {key: id(value) for key, value in context.items()}
+
+    def __track_stage_outputs(self, workflow_stage: str, context_before: dict[str, int], context: dict):
+        context_after = self.__context_identities(context)
+        created_keys = {key for key in context_after.keys() if key not in context_before}
+        rebound_keys = {
+            key for key, identity in context_after.items() if key in context_before and identity != context_before[key]
+        }
+        self.__stage_outputs[workflow_stage] = created_keys | rebound_keys
+        for key in created_keys:
+            self.__key_producers[key] = workflow_stage
+
+    @property
+    def stage_profiler(self) -> sprof.StageProfiler | None:
+        return self.__stage_profiler
+
+    @stage_profiler.setter
+    def stage_profiler(self, stage_profiler: sprof.StageProfiler | None):
+        if stage_profiler is not None and stage_profiler.stages is not None:
+            unknown_stages = stage_profiler.stages - set(self.__workflow_stages)
+            if unknown_stages:
+                raise ValueError(f"Unknown profiled stages {unknown_stages}. Stages: {self.__workflow_stages}")
+        self.__stage_profiler = stage_profiler
+
+    @property
+    def stages(self) -> list[str]:
+        return list(self.__workflow_stages)
+
+    @property
+    def context_consumers(self) -> OrderedDict[str, list[str] | None]:
+        """Context keys read by each stage, see `AbstractCommand.consumed_context_keys`."""
+        return OrderedDict[str, list[str] | None](
+            (stage, command.consumed_context_keys()) for stage, command in self.__commands.items()
+        )
+
+    @property
+    def stage_timings(self) -> OrderedDict[str, float]:
+        """Seconds spent by the last execution of each stage."""
+        return self.__stage_timings
+
+    @property
+    def stage_outputs(self) -> OrderedDict[str, set[str]]:
+        """Context keys created or rebound by the last execution of each stage."""
+        return self.__stage_outputs
+
     @property
     def current_stage(self) -> str:
         return self.__workflow_stages[self.__workflow_position]
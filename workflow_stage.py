@@ -1,33 +1,53 @@
+import gc
 import typing
 from typing import cast
 from typing import Any
 import warnings
 from collections import OrderedDict
-from datetime import datetime
+from datetime import datetime, timedelta
+from io import StringIO
+from pprint import pformat
 import numpy as np
 
-import shutil
 from pathlib import Path
-import fsutil
 
 import pandas as pd
 
-from holidays.utils import country_holidays, financial_holidays
-
-import sweetviz as eda_sv
-import pandas_profiling as eda_pp
-
 import strings as ustr
 import collections_iterables as colit
 import file_system as fs
 import config_logging as clog
+import arrow_frames as af
 import config_model as cfgm
+import cross_validation as cv
+import data_scaling as dsc
+import data_validation as dval
+import dataset_export as dex
+import dimensionality_reduction as dred
+import financial_features as ff
+import lagged_windows as lw
 import data_load as dl
 import data_load_model as dlm
 import templates
+import trading_calendar as tcal
+import universe as uni
+import walk_forward as wfe
 import workflow as wf
 
 
+def _dataframe_summary(dataframe: pd.DataFrame) -> str:
+    return f"""\
+            Begin time: {dataframe.index.min()}, End time: {dataframe.index.max()};
+            Shape: {dataframe.shape};
+            NaN rows:\n{dataframe.isna().sum()}"""
+
+
+def _dataframe_info(dataframe: pd.DataFrame) -> str:
+    buffer = StringIO()
+    dataframe.info(buf=buffer)
+    return buffer.getvalue()
+
+
 class DataLoadCommand(wf.AbstractCommand):
 
     LOGGER = clog.get_logger('DataLoadCommand')
@@ -36,21 +56,26 @@ class DataLoadCommand(wf.AbstractCommand):
         super().__init__()
         self.__use_remote_data = use_remote_data
 
+    def consumed_context_keys(self) -> list[str]:
+        return ['config']
+
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
         data = OrderedDict[str, dlm.ComplexData]()
 
+        arrow_backed = config.research.arrow_backed_frames
         quoted_instrument = config.research.target_quoted_instrument
-        self.__load_quoted_instrument(data, quoted_instrument)
+        self.__load_quoted_instrument(data, quoted_instrument, arrow_backed)
 
         for quoted_instrument in config.research.quoted_instruments:
-            self.__load_quoted_instrument(data, quoted_instrument)
+            self.__load_quoted_instrument(data, quoted_instrument, arrow_backed)
 
         context['data'] = data
         return wf.CommandState.SUCCESS
 
-    def __load_quoted_instrument(self, data: OrderedDict[str, dlm.ComplexData], quoted_instrument: cfgm.QuotedInstrument):
-        quoted_instrument_data_loader = dl.StrategyBasedDataLoader(quoted_instrument)
+    def __load_quoted_instrument(self, data: OrderedDict[str, dlm.ComplexData], quoted_instrument: cfgm.QuotedInstrument,
+                                 arrow_backed: bool=False):
+        quoted_instrument_data_loader = dl.StrategyBasedDataLoader(quoted_instrument, arrow_backed=arrow_backed)
         quoted_instrument_data = quoted_instrument_data_loader.load_data()
         data[quoted_instrument.ticker] = quoted_instrument_data
         if self.__use_remote_data:
@@ -69,6 +94,9 @@ class DataTendingCommand(wf.AbstractCommand):
     def __init__(self):
         super().__init__()
 
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', 'data']
+
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
         data: OrderedDict[str, dlm.ComplexData] = context['data']
@@ -113,9 +141,9 @@ class DataTendingCommand(wf.AbstractCommand):
                     for column_name, change_rule in change_rules.items():
                         if change_rule == 'float':
                             if not remote_dataframe.empty:
-                                remote_dataframe[column_name] = remote_dataframe[column_name].astype(float)
+                                remote_dataframe[column_name] = remote_dataframe[column_name].astype(af.float_dtype(remote_dataframe))
                             if not local_dataframe.empty:
-                                local_dataframe[column_name] = local_dataframe[column_name].astype(float)
+                                local_dataframe[column_name] = local_dataframe[column_name].astype(af.float_dtype(local_dataframe))
  
             if 'names' in tending_config['columns']:
                 if tending_config['columns']['names']['to_snake_case']:
@@ -135,7 +163,6 @@ class DataTendingCommand(wf.AbstractCommand):
         
 
 EDA_DIRECTORY: Path = Path('./data/generated/eda')
-EDA_DIRECTORY.mkdir(parents=True, exist_ok=True)
 
 
 class AutoEdaCommand(wf.AbstractCommand):
@@ -155,6 +182,9 @@ class AutoEdaCommand(wf.AbstractCommand):
         self.__eda_name = eda_name
         self.__report_joined = report_joined
 
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__context_data_name]
+
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
         research: cfgm.Research = config.research
@@ -222,6 +252,9 @@ class AutoEdaCommand(wf.AbstractCommand):
         return wf.CommandState.SUCCESS
 
     def __quoted_instrument_data_autoeda(self, data_for_eda: pd.DataFrame, quoted_instrument_ticker: str):
+        import sweetviz as eda_sv
+        import pandas_profiling as eda_pp
+
         eda_directory = Path(EDA_DIRECTORY, self.__eda_name, quoted_instrument_ticker)
         eda_directory.mkdir(parents=True, exist_ok=True)
         self.LOGGER.info(f"[{quoted_instrument_ticker}] Making EDA report ['{self.__eda_name}'], \
@@ -229,12 +262,12 @@ shape = {data_for_eda.shape} in the directory {str(eda_directory)}...")
 
         with warnings.catch_warnings():
             warnings.simplefilter(action='ignore', category=FutureWarning)
-            eda_report_sv: eda_sv.DataframeReport = eda_sv.analyze(data_for_eda)
+            eda_report_sv = eda_sv.analyze(data_for_eda)
             Path(eda_directory, 'sweet-vis').mkdir(parents=True, exist_ok=True)
             eda_path_sv = Path(eda_directory, 'sweet-vis', self.EDA_FILE_NAME)
             eda_report_sv.show_html(str(eda_path_sv), open_browser=False)
         
-        eda_report_pp: eda_pp.ProfileReport = eda_pp.ProfileReport(data_for_eda, tsmode=True)
+        eda_report_pp = eda_pp.ProfileReport(data_for_eda, tsmode=True)
         Path(eda_directory, 'pandas-profiling').mkdir(parents=True, exist_ok=True)
         eda_path_pp = Path(eda_directory, 'pandas-profiling', self.EDA_FILE_NAME)
         eda_report_pp.to_file(str(eda_path_pp))
@@ -243,6 +276,9 @@ shape = {data_for_eda.shape} in the directory {str(eda_directory)}...")
     def __report_joined_eda(self, data_dictionary: dict[str, pd.DataFrame],
                             target_quoted_instrument: cfgm.QuotedInstrument,
                             quoted_instruments: list[cfgm.QuotedInstrument]):
+        import sweetviz as eda_sv
+        import pandas_profiling as eda_pp
+
         eda_directory = Path(EDA_DIRECTORY, self.__eda_name, 'joined_report')
         eda_directory.mkdir(parents=True, exist_ok=True)
         self.LOGGER.info(f"Making joined EDA report ['{self.__eda_name}'] for all tickers...")
@@ -260,14 +296,14 @@ shape = {data_for_eda.shape} in the directory {str(eda_directory)}...")
                     how='outer'
                 )
             
-            self.LOGGER.info(f"Joined report column_types:\n{joined_data.info()}")
+            self.LOGGER.info("Joined report column_types:\n%s", clog.lazy(_dataframe_info, joined_data))
 
-            eda_report_sv: eda_sv.DataframeReport = eda_sv.analyze(joined_data)
+            eda_report_sv = eda_sv.analyze(joined_data)
             Path(eda_directory, 'sweet-vis').mkdir(parents=True, exist_ok=True)
             eda_path_sv = Path(eda_directory, 'sweet-vis', self.EDA_FILE_NAME)
             eda_report_sv.show_html(str(eda_path_sv), open_browser=False)
         
-            eda_report_pp: eda_pp.ProfileReport = eda_pp.ProfileReport(joined_data, tsmode=True)
+            eda_report_pp = eda_pp.ProfileReport(joined_data, tsmode=True)
             Path(eda_directory, 'pandas-profiling').mkdir(parents=True, exist_ok=True)
             eda_path_pp = Path(eda_directory, 'pandas-profiling', self.EDA_FILE_NAME)
             eda_report_pp.to_file(str(eda_path_pp))
@@ -281,6 +317,9 @@ class CheckDatesCommand(wf.AbstractCommand):
         super().__init__()
         self.__use_remote_data = use_remote_data
 
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', 'data']
+
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
         time_range = config.research.machine_learning.time_range
@@ -318,16 +357,68 @@ class CheckDatesCommand(wf.AbstractCommand):
             raise ValueError(f"Instrument '{quoted_instrument.ticker}' end time must be not earlier than the range [{time_range.begin_time}, {time_range.end_time}], but is {instrument_end_time}")
 
 
+class DataValidationCommand(wf.AbstractCommand):
+
+    LOGGER = clog.get_logger('DataValidationCommand')
+
+    def __init__(self,
+                 use_remote_data: bool=True,
+                 validation_context_name: str='data-validation',
+                 max_gap: timedelta=timedelta(days=5),
+                 fail_on_violations: bool=False):
+        """Checks the tended data of all instruments against `dval.VALIDATION_RULES`;
+        the per ticker violation counts are stored in the context."""
+        super().__init__()
+        self.__use_remote_data = use_remote_data
+        self.__validation_context_name = validation_context_name
+        self.__max_gap = max_gap
+        self.__fail_on_violations = fail_on_violations
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', 'data']
+
+    def execute(self, context: dict):
+        config: cfgm.Config = context['config']
+        data: OrderedDict[str, dlm.ComplexData] = context['data']
+        tickers = [config.research.target_quoted_instrument.ticker] + \
+            [quoted_instrument.ticker for quoted_instrument in config.research.quoted_instruments]
+        frames = {
+            ticker: data[ticker].remote_data.loaded_data if self.__use_remote_data else data[ticker].local_data.loaded_data
+            for ticker in tickers
+        }
+
+        summary = dval.validate_instruments(frames, max_gap=self.__max_gap)
+        context[self.__validation_context_name] = summary
+
+        violations = summary[dval.VALIDATION_RULES]
+        if not violations.to_numpy().any():
+            self.LOGGER.info(f"No data violations in {summary['rows'].sum()} rows of {tickers}")
+            return wf.CommandState.SUCCESS
+
+        self.LOGGER.warning("Data violations:\n%s", summary.loc[violations.any(axis=1)].to_string())
+        if self.__fail_on_violations:
+            violated_rules = violations.columns[violations.any(axis=0)].to_list()
+            raise ValueError(f"Data violations of the rules {violated_rules}, see '{self.__validation_context_name}'")
+        return wf.CommandState.SUCCESS
+
+
 class SelectDataByTimeRangeCommand(wf.AbstractCommand):
 
     LOGGER = clog.get_logger('SelectDataByTimeRangeCommand')
 
     def __init__(self,
                  use_remote_data: bool=True,
-                 selected_data_context_name: str='selected-data'):
+                 selected_data_context_name: str='selected-data',
+                 trading_days_only: bool=False):
+        """With `trading_days_only` rows outside the sessions of the instrument trading calendar
+        (`clearing.trading_calendar`) are dropped as well."""
         super().__init__()
         self.__use_remote_data = use_remote_data
         self.__selected_data_context_name = selected_data_context_name
+        self.__trading_days_only = trading_days_only
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', 'data']
 
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
@@ -360,9 +451,14 @@ class SelectDataByTimeRangeCommand(wf.AbstractCommand):
         self.LOGGER.info(f"['{quoted_instrument.ticker}'] Selecting data... original time range: \
             {dataframe.index.min()} - {dataframe.index.max()}")
 
-        selected_dataframe = dataframe[
-            (dataframe.index >= time_range.begin_time) & (dataframe.index <= time_range.end_time)
-        ].copy(deep=True)
+        selected_rows = (dataframe.index >= time_range.begin_time) & (dataframe.index <= time_range.end_time)
+        calendar = tcal.instrument_trading_calendar(quoted_instrument)
+        if self.__trading_days_only and calendar is not None:
+            session_rows = calendar.is_session(dataframe.index)
+            self.LOGGER.info(f"['{quoted_instrument.ticker}'] Dropping {(selected_rows & ~session_rows).sum()} rows \
+outside the {calendar.exchange} sessions")
+            selected_rows &= session_rows
+        selected_dataframe = dataframe[selected_rows].copy(deep=True)
 
         self.LOGGER.info(f"['{quoted_instrument.ticker}'] Selected range: {selected_dataframe.index.min()} - {selected_dataframe.index.max()}")
         return selected_dataframe
@@ -376,6 +472,9 @@ class DataClearingCommand(wf.AbstractCommand):
         super().__init__()
         self.__selected_data_context_name = selected_data_context_name
 
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__selected_data_context_name]
+
     def execute(self, context: dict):
         self.LOGGER.info(f"Clearing/interpolating selected data...")
         config: cfgm.Config = context['config']
@@ -405,34 +504,116 @@ class DataClearingCommand(wf.AbstractCommand):
             missing_values_strategy = instrument.data_transformation.clearing['missing_values']
             if missing_values_strategy == 'interpolate_by_previous_date':
                 self.LOGGER.info(
-                    f"['{instrument.ticker}'] Clearing and interpolating data...\n\
-            Begin time: {dataframe.index.min()}, End time: {dataframe.index.max()};\n\
-            Shape: {dataframe.shape};\n\
-            NaN rows:\n{dataframe.isna().sum()}"
-                    )
-
-                new_index_range = pd.date_range(time_range.begin_time, time_range.end_time, freq='D', inclusive='both')
-                new_index_range_list = new_index_range.to_list()
+                    "['%s'] Clearing and interpolating data...\n%s",
+                    instrument.ticker, clog.lazy(_dataframe_summary, dataframe)
+                )
+
+                calendar = tcal.instrument_trading_calendar(instrument)
+                if calendar is not None:
+                    # Trading sessions only: no padded weekend and holiday rows
+                    new_index_range = calendar.sessions(time_range.begin_time, time_range.end_time)
+                else:
+                    new_index_range = pd.date_range(time_range.begin_time, time_range.end_time, freq='D', inclusive='both')
                 dataframe = dataframe.reindex(new_index_range, fill_value=np.nan)
                 self.LOGGER.info(
-                    f"['{instrument.ticker}'] Reindexed data, timerange={time_range}...\n\
-            Index First date: {new_index_range_list[0]}; Index Last date: {new_index_range_list[-1]};\n\
-            Begin time: {dataframe.index.min()}, End time: {dataframe.index.max()};\n\
-            Shape: {dataframe.shape};\n\
-            NaN rows:\n{dataframe.isna().sum()}"
-                    )
-
-                dataframe.interpolate(method='pad', inplace=True)
-                self.LOGGER.info(f"['{instrument.ticker}'] Interpolated data.\n\
-            Begin time: {dataframe.index.min()}, End time: {dataframe.index.max()}'\n\
-            Shape: {dataframe.shape};\n\
-            NaN rows:\n{dataframe.isna().sum()}")
+                    "['%s'] Reindexed data, timerange=%s...\n\
+            Index First date: %s; Index Last date: %s;\n%s",
+                    instrument.ticker, time_range, new_index_range[0], new_index_range[-1],
+                    clog.lazy(_dataframe_summary, dataframe)
+                )
+
+                # The same as interpolate(method='pad'), which Arrow-backed columns don't support
+                dataframe.ffill(inplace=True)
+                self.LOGGER.info(
+                    "['%s'] Interpolated data.\n%s",
+                    instrument.ticker, clog.lazy(_dataframe_summary, dataframe)
+                )
 
                 return dataframe
             else:
                 raise ValueError(f"['{instrument.ticker}'] Invalid missing values strategy '{missing_values_strategy}'")
 
 
+class UniverseProcessingCommand(wf.AbstractCommand):
+    """Loads, tends, checks, selects and clears the instruments of `research.universe`
+    in chunks of `universe.chunk_size` instruments.
+
+    Every chunk runs through the stage commands in a context of its own, whose cleared
+    frames are written to `universe.output_directory` before the next chunk is loaded:
+    the memory used is bounded by the chunk size, not by the number of tickers. The
+    context gets a `universe.UniverseData` reading the frames back on access. A failing
+    chunk is retried instrument by instrument, so one bad ticker doesn't fail the others.
+    """
+
+    LOGGER = clog.get_logger('UniverseProcessingCommand')
+
+    def __init__(self, use_remote_data: bool=True,
+                 universe_context_name: str='universe-data',
+                 trading_days_only: bool=False):
+        super().__init__()
+        self.__universe_context_name = universe_context_name
+        self.__stage_commands = OrderedDict[str, wf.AbstractCommand]([
+            ('load', DataLoadCommand(use_remote_data=use_remote_data)),
+            ('tend', DataTendingCommand()),
+            ('check', CheckDatesCommand(use_remote_data=use_remote_data)),
+            ('select', SelectDataByTimeRangeCommand(
+                use_remote_data=use_remote_data, selected_data_context_name='selected-data',
+                trading_days_only=trading_days_only
+            )),
+            ('clear', DataClearingCommand(selected_data_context_name='selected-data')),
+        ])
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config']
+
+    def execute(self, context: dict):
+        config: cfgm.Config = context['config']
+        universe = config.research.universe
+        if universe is None:
+            raise ValueError('No universe in the research configuration.')
+
+        exporter = dex.DatasetExporter(directory=universe.output_directory, dataset_format=dex.DatasetFormat.PARQUET)
+        universe_data = uni.UniverseData()
+        instruments = uni.universe_instruments(universe)
+        for chunk_number, chunk in enumerate(uni.instrument_chunks(instruments, universe.chunk_size), start=1):
+            self.LOGGER.info(f"[chunk {chunk_number}] Processing {len(chunk)} instruments: {[instrument.ticker for instrument in chunk]}")
+            try:
+                self.__process_chunk(config, chunk, exporter, universe_data)
+            except Exception as exception:
+                if len(chunk) == 1:
+                    self.LOGGER.error(f"['{chunk[0].ticker}'] Processing failed: {exception}")
+                    universe_data.failed_tickers.append(chunk[0].ticker)
+                    continue
+                self.LOGGER.warning(f"[chunk {chunk_number}] Processing failed: {exception}. Retrying instrument by instrument...")
+                for instrument in chunk:
+                    try:
+                        self.__process_chunk(config, [instrument], exporter, universe_data)
+                    except Exception as instrument_exception:
+                        self.LOGGER.error(f"['{instrument.ticker}'] Processing failed: {instrument_exception}")
+                        universe_data.failed_tickers.append(instrument.ticker)
+            # The frames of the chunk are on disk: free them before the next chunk
+            gc.collect()
+
+        context[self.__universe_context_name] = universe_data
+        self.LOGGER.info(f"Processed {len(universe_data)} instruments of the universe to {universe.output_directory}, \
+failed: {universe_data.failed_tickers}")
+        return wf.CommandState.SUCCESS
+
+    def __process_chunk(self, config: cfgm.Config, chunk: list[cfgm.QuotedInstrument],
+                        exporter: dex.DatasetExporter, universe_data: uni.UniverseData):
+        chunk_context = {'config': uni.chunk_config(config, chunk)}
+        chunk_workflow = wf.Workflow(self.__stage_commands)
+        workflow_state = chunk_workflow.execute(chunk_context)
+        if workflow_state in [wf.CommandState.FAILED, wf.CommandState.ABORTED]:
+            raise ValueError(f"The chunk workflow is interrupted. State: {workflow_state}")
+
+        selected_data: OrderedDict[str, pd.DataFrame] = chunk_context['selected-data']
+        exporter.export(selected_data)
+        for instrument in chunk:
+            universe_data.add(instrument.ticker, exporter.dataset_path(instrument.ticker))
+        chunk_context.clear()
+
+
 class PreparedDataReportCommand(wf.AbstractCommand):
     
     LOGGER = clog.get_logger('PreparedDataReportCommand')
@@ -441,6 +622,9 @@ class PreparedDataReportCommand(wf.AbstractCommand):
         super().__init__()
         self.__selected_data_context_name = selected_data_context_name
 
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__selected_data_context_name]
+
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
         selected_data: OrderedDict[str, pd.DataFrame] = context[self.__selected_data_context_name]
@@ -456,7 +640,7 @@ class PreparedDataReportCommand(wf.AbstractCommand):
                 'machine_learning': config.research.machine_learning,
                 'target_quoted_instrument': config.research.target_quoted_instrument,
                 'quoted_instruments': config.research.quoted_instruments,
-                'data': selected_data
+                'statistics': self.__report_statistics(selected_data)
             }
         )
 
@@ -464,41 +648,84 @@ class PreparedDataReportCommand(wf.AbstractCommand):
 
         return wf.CommandState.SUCCESS
 
+    def __report_statistics(self, selected_data: OrderedDict[str, pd.DataFrame]) -> dict[str, dict]:
+        """Report values of all instruments as plain values, described in one batch."""
+        tickers = list(selected_data.keys())
+        dataframes = list(selected_data.values())
+
+        description_texts = dict[str, str]()
+        if dataframes and all(dataframe.index.is_unique for dataframe in dataframes):
+            # Outer join padding adds only NaNs which describe() skips
+            descriptions = pd.concat(dataframes, axis=1, keys=tickers).describe()
+            described_tickers = set(descriptions.columns.get_level_values(0))
+            description_texts = {
+                ticker: descriptions.xs(ticker, axis=1, level=0).to_string()
+                for ticker in tickers if ticker in described_tickers
+            }
+        for ticker, dataframe in selected_data.items():
+            if ticker not in description_texts:
+                description_texts[ticker] = dataframe.describe().to_string()
+
+        return {
+            ticker: {
+                'begin_time': dataframe.index.min(),
+                'end_time': dataframe.index.max(),
+                'shape': dataframe.shape,
+                'missing_values': int(np.count_nonzero(dataframe.isna().to_numpy())),
+                'description': description_texts[ticker]
+            }
+            for ticker, dataframe in selected_data.items()
+        }
+
 
 class DataTreatingCommand(wf.AbstractCommand):
     
     LOGGER = clog.get_logger('DataTreatingCommand')
 
-    def __init__(self, selected_data_context_name: str='selected-data'):
+    def __init__(self, selected_data_context_name: str='selected-data',
+                 reduction_context_name: str='dimensionality-reduction'):
         super().__init__()
         self.__selected_data_context_name = selected_data_context_name
+        self.__reduction_context_name = reduction_context_name
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__selected_data_context_name]
 
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
         research = config.research
         selected_data: OrderedDict[str, pd.DataFrame] = context[self.__selected_data_context_name]
+        # PCA models fitted per instrument, to project new data
+        fitted_reductions = OrderedDict[str, dred.RandomizedPCA]()
 
         instrument = research.target_quoted_instrument
+        if (instrument.data_transformation.treatment or {}).get('dimensionality_reduction') == 'PCA':
+            raise ValueError(f"['{instrument.ticker}'] The PCA dimentionality reduction would drop the target prices the \
+features and targets are computed from: use machine_learning.feature_reduction instead")
         instrument_data = selected_data[instrument.ticker]
-        self.__treat_data(instrument, instrument_data)
+        self.__treat_data(instrument, instrument_data, research.machine_learning.split_time, fitted_reductions)
         for instrument in research.quoted_instruments:
             instrument_data = selected_data[instrument.ticker]
-            self.__treat_data(instrument, instrument_data)
+            self.__treat_data(instrument, instrument_data, research.machine_learning.split_time, fitted_reductions)
 
+        if fitted_reductions:
+            context[self.__reduction_context_name] = fitted_reductions
         return wf.CommandState.SUCCESS
 
-    def __treat_data(self, instrument: cfgm.QuotedInstrument, instrument_data: pd.DataFrame):
+    def __treat_data(self, instrument: cfgm.QuotedInstrument, instrument_data: pd.DataFrame,
+                     split_time: datetime, fitted_reductions: OrderedDict[str, dred.RandomizedPCA]):
         self.LOGGER.info(f"[{instrument.ticker}] Trying to treat data...")
         if instrument.data_transformation.treatment:
             if 'dimensionality_reduction' in instrument.data_transformation.treatment:
                 self.LOGGER.info(f"[{instrument.ticker}] Dimensionality reduction selected...")
-                self.__reduce_dimentionality(instrument, instrument_data)
+                self.__reduce_dimentionality(instrument, instrument_data, split_time, fitted_reductions)
             else:
                 self.LOGGER.warn(f"[{instrument.ticker}] Treatment config is awkward: {instrument.data_transformation.treatment}")
         else:
             self.LOGGER.info(f"[{instrument.ticker}] Treatment config is empty: {instrument.data_transformation.treatment}")
 
-    def __reduce_dimentionality(self, instrument: cfgm.QuotedInstrument, instrument_data: pd.DataFrame):
+    def __reduce_dimentionality(self, instrument: cfgm.QuotedInstrument, instrument_data: pd.DataFrame,
+                                split_time: datetime, fitted_reductions: OrderedDict[str, dred.RandomizedPCA]):
         dimentionality_reduction = instrument.data_transformation.treatment['dimensionality_reduction']
         self.LOGGER.info(f"[{instrument.ticker}] Dimensionality reduction selected... {dimentionality_reduction}...")
         if dimentionality_reduction in [None, 'None', 'none']:
@@ -508,6 +735,8 @@ class DataTreatingCommand(wf.AbstractCommand):
             self.__reduce_dimentionality_OHLC(instrument, instrument_data)
         elif dimentionality_reduction == 'HLC':
             self.__reduce_dimentionality_HLC(instrument, instrument_data)
+        elif dimentionality_reduction == 'PCA':
+            fitted_reductions[instrument.ticker] = self.__reduce_dimentionality_PCA(instrument, instrument_data, split_time)
         else:
             raise ValueError(f"['{instrument.ticker}'] Invalid dimentionality reduction strategy '{dimentionality_reduction}'")
 
@@ -539,22 +768,135 @@ class DataTreatingCommand(wf.AbstractCommand):
         self.LOGGER.info(f"[{instrument.ticker}][dimentionality_reduction][HLC] columns: \
             {', '.join([column_open, column_high, column_low, column_close])}")
 
-        data['HLC'] = 0.25 * (
+        data['HLC'] = (
             data[column_high] + data[column_low] + data[column_close]
-        )
+        ) / 3
         data.drop(columns=[column_open, column_high, column_low, column_close], inplace=True)
         self.LOGGER.info(f"[{instrument.ticker}][dimentionality_reduction][HLC] Complete. Columns: {instrument_data.columns}")
 
+    def __reduce_dimentionality_PCA(self, instrument: cfgm.QuotedInstrument, instrument_data: pd.DataFrame,
+                                    split_time: datetime) -> dred.RandomizedPCA:
+        """Replace the numeric columns by `treatment.components` principal components
+        fitted on the rows before `split_time`."""
+        data = instrument_data
+        treatment = instrument.data_transformation.treatment
+        if 'components' not in treatment:
+            raise ValueError(f"['{instrument.ticker}'] The PCA dimentionality reduction needs the number of 'components'")
+        column_names = data.select_dtypes(include='number').columns.to_list()
+        self.LOGGER.info(f"[{instrument.ticker}][dimentionality_reduction][PCA] columns: {', '.join(column_names)}")
+
+        pca = dred.RandomizedPCA(
+            n_components=int(treatment['components']),
+            standardize=bool(treatment.get('standardize', True)),
+            random_state=treatment.get('random_state', 0)
+        )
+        values = af.float_values(data[column_names])
+        pca.fit(values[(data.index < split_time)])
+        component_names = [f"PC{number}" for number in range(1, pca.n_components + 1)]
+        data[component_names] = pca.transform(values)
+        data.drop(columns=column_names, inplace=True)
+        self.LOGGER.info(f"[{instrument.ticker}][dimentionality_reduction][PCA] Complete. Explained variance ratio: \
+{np.round(pca.explained_variance_ratio_, 4).tolist()}. Columns: {instrument_data.columns}")
+        return pca
+
+
+class DataScalingCommand(wf.AbstractCommand):
+    """Scales the instruments with their `data_transformation.scaling.scalers`.
+
+    The scalers are fitted on the rows before `split_time` only, so no statistic of
+    the test period leaks into training. The fitted parameters are kept in the context
+    and saved to `parameters_file`, see `data_scaling.ScalingParameters.load`.
+    """
+
+    LOGGER = clog.get_logger('DataScalingCommand')
+
+    def __init__(self, selected_data_context_name: str='selected-data',
+                 scaling_context_name: str='scaling-parameters',
+                 parameters_file: str | None='data/generated/scaling/scaling_parameters.json',
+                 chunk_size: int=65536):
+        super().__init__()
+        self.__selected_data_context_name = selected_data_context_name
+        self.__scaling_context_name = scaling_context_name
+        self.__parameters_file = parameters_file
+        self.__chunk_size = chunk_size
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__selected_data_context_name]
+
+    def execute(self, context: dict):
+        config: cfgm.Config = context['config']
+        research = config.research
+        split_time = research.machine_learning.split_time
+        selected_data: OrderedDict[str, pd.DataFrame] = context[self.__selected_data_context_name]
+
+        scaling_parameters = dsc.ScalingParameters(split_time=split_time.isoformat())
+        for instrument in [research.target_quoted_instrument] + list(research.quoted_instruments):
+            scaling_parameters.scalers[instrument.ticker] = self.__scale_data(
+                instrument, selected_data[instrument.ticker], split_time
+            )
+
+        context[self.__scaling_context_name] = scaling_parameters
+        if self.__parameters_file is not None:
+            scaling_parameters.save(self.__parameters_file)
+            self.LOGGER.info(f"Saved the scaling parameters to {self.__parameters_file}")
+
+        return wf.CommandState.SUCCESS
+
+    def __scale_data(self, instrument: cfgm.QuotedInstrument, instrument_data: pd.DataFrame,
+                     split_time: datetime) -> list[dsc.FittedScaler]:
+        scalers = (instrument.data_transformation.scaling or {}).get('scalers') or []
+        for scaler in scalers:
+            if scaler not in dsc.SCALERS:
+                raise ValueError(f"['{instrument.ticker}'] Invalid scaler '{scaler}'. Scalers: {dsc.SCALERS}")
+
+        columns = instrument_data.select_dtypes(include='number').columns.to_list()
+        training_data = instrument_data[instrument_data.index < split_time]
+        if scalers and training_data.empty:
+            raise ValueError(f"['{instrument.ticker}'] No rows before the split time {split_time} to fit the scalers on")
+
+        fitted_scalers = []
+        for scaler in scalers:
+            # Every scaler is fitted on the output of the previous ones
+            fitted_scaler = dsc.fit_scaler(dsc.frame_chunks(training_data, columns, self.__chunk_size), columns, scaler)
+            fitted_scaler.transform_frame(instrument_data)
+            training_data = instrument_data[instrument_data.index < split_time]
+            fitted_scalers.append(fitted_scaler)
+            self.LOGGER.info(f"['{instrument.ticker}'] Scaled {columns} with {scaler} fitted on {fitted_scaler.fitted_rows} rows")
+        return fitted_scalers
+
 
 class JoinedDatasetCommand(wf.AbstractCommand):
 
     LOGGER = clog.get_logger('DatasetCommand')
 
-    def __init__(self, selected_data_context_name: str, dataset_context_name: str, save_datasets: bool = False):
+    def __init__(self, selected_data_context_name: str, dataset_context_name: str, save_datasets: bool = False,
+                 dataset_format: str = 'csv', compression: str | None = None,
+                 cross_instrument_features: bool = False, features_max_workers: int | None = None,
+                 reduction_context_name: str = 'feature-reduction'):
+        """With `cross_instrument_features` the joined dataset gets the tech analysis
+        features of every instrument, not only of the target one.
+
+        With `machine_learning.feature_reduction` the features of the joined dataset with
+        tech analysis are replaced by their principal components; the fitted PCA is kept
+        in the context as `reduction_context_name`."""
         super().__init__()
+        self.__reduction_context_name = reduction_context_name
         self.__selected_data_context_name = selected_data_context_name
         self.__dataset_context_name = dataset_context_name
         self.__save_datasets = save_datasets
+        self.__cross_instrument_features = cross_instrument_features
+        self.__features_max_workers = features_max_workers
+        if not dex.DatasetFormat.has_value(dataset_format):
+            raise ValueError(f"Dataset format {dataset_format} is not supported. \
+                Supported formats: {pformat(dex.DatasetFormat.values(), width=5)}")
+        self.__dataset_exporter = dex.DatasetExporter(
+            directory='data/generated/datasets',
+            dataset_format=dex.DatasetFormat.from_str(dataset_format),
+            compression=compression
+        )
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__selected_data_context_name]
 
     def execute(self, context: dict):
         config: cfgm.Config = context['config']
@@ -565,59 +907,66 @@ class JoinedDatasetCommand(wf.AbstractCommand):
         dataset_target = selected_data[research.target_quoted_instrument.ticker]
         dataset_target.index.name = 'date'
 
-        dataset_target = self.__add_weekends_to(dataset_target)
-        dataset_target = self.__add_holidays_to(dataset_target, country_name='US')
+        target_calendar = tcal.instrument_trading_calendar(research.target_quoted_instrument)
+        if target_calendar is None:
+            # Sessions of a trading calendar have no weekend rows: the flag would be constant
+            dataset_target = self.__add_weekends_to(dataset_target)
+        dataset_target = self.__add_holidays_to(
+            dataset_target, country_name='US',
+            exchange_name=target_calendar.exchange if target_calendar is not None else None
+        )
 
         joined_dataset = self.__joined_dataset(research, selected_data)
         joined_dataset.index.name = 'date'
 
+        feature_graph = ff.FeatureGraph.from_config(research.machine_learning.features)
         target_data_with_tech_analysis_features = self.__joined_financial_features(
             selected_data[research.target_quoted_instrument.ticker],
-            ticker=research.target_quoted_instrument.ticker
+            ticker=research.target_quoted_instrument.ticker,
+            feature_graph=feature_graph
         )
         target_data_with_tech_analysis_features.index.name = 'date'
 
-        joined_data_with_tech_analysis_features = self.__joined_financial_features(
-            joined_dataset,
-            ticker=research.target_quoted_instrument.ticker
-        )
+        if self.__cross_instrument_features:
+            joined_data_with_tech_analysis_features = self.__cross_instrument_financial_features(
+                research, joined_dataset, feature_graph
+            )
+        else:
+            joined_data_with_tech_analysis_features = self.__joined_financial_features(
+                joined_dataset,
+                ticker=research.target_quoted_instrument.ticker,
+                feature_graph=feature_graph
+            )
         joined_data_with_tech_analysis_features.index.name = 'date'
 
+        if research.machine_learning.feature_reduction is not None:
+            joined_data_with_tech_analysis_features, context[self.__reduction_context_name] = self.__reduced_features(
+                research, joined_data_with_tech_analysis_features,
+                kept_columns=selected_data[research.target_quoted_instrument.ticker].columns, feature_graph=feature_graph
+            )
+
+        if research.arrow_backed_frames:
+            # Features are computed on NumPy: back to Arrow for a zero-copy Parquet/Feather export
+            dataset_target, target_data_with_tech_analysis_features, joined_dataset, joined_data_with_tech_analysis_features = (
+                af.to_arrow_backed(dataset) for dataset in [
+                    dataset_target, target_data_with_tech_analysis_features,
+                    joined_dataset, joined_data_with_tech_analysis_features
+                ]
+            )
+
         context[self.__dataset_context_name + '_target'] = dataset_target
         context[self.__dataset_context_name + '_target_with_tech'] = target_data_with_tech_analysis_features
         context[self.__dataset_context_name + '_joined'] = joined_dataset
         context[self.__dataset_context_name + '_joined_with_tech'] = joined_data_with_tech_analysis_features
 
         if self.__save_datasets:
-            self.__save_dataset(
-                self.__dataset_context_name + '_target',
-                context[self.__dataset_context_name + '_target']
-            )
-            self.__save_dataset(
-                self.__dataset_context_name + '_target_with_tech',
-                context[self.__dataset_context_name + '_target_with_tech']
-            )
-            self.__save_dataset(
-                self.__dataset_context_name + '_joined',
-                context[self.__dataset_context_name + '_joined']
-            )
-            self.__save_dataset(
-                self.__dataset_context_name + '_joined_with_tech',
-                context[self.__dataset_context_name + '_joined_with_tech']
-            )
-            
+            dataset_names = [
+                self.__dataset_context_name + suffix
+                for suffix in ['_target', '_target_with_tech', '_joined', '_joined_with_tech']
+            ]
+            self.__dataset_exporter.export({dataset_name: context[dataset_name] for dataset_name in dataset_names})
 
         return wf.CommandState.SUCCESS
-    
-    
-    def __save_dataset(self, dataset_name: str, dataset: pd.DataFrame):
-        dataset_directory = 'data/generated/datasets'
-        if not fsutil.is_dir(dataset_directory):
-            fsutil.make_dirs(dataset_directory)
-
-        dataset.to_csv(
-            fsutil.join_filepath(dataset_directory, dataset_name + '.csv')
-        )
 
     def __add_weekends_to(self, dataset: pd.DataFrame) -> pd.DataFrame:
         datetime_index: pd.DatetimeIndex = cast(pd.DatetimeIndex, dataset.index)
@@ -637,6 +986,8 @@ class JoinedDatasetCommand(wf.AbstractCommand):
         datetime_index: pd.DatetimeIndex = cast(pd.DatetimeIndex, dataset.index)
 
         if country_name is not None:
+            from holidays.utils import country_holidays
+
             c_holidays = country_holidays(country_name)
             dataset['holiday'] = pd.Series(
                 data=[1 if c_holidays.get(timestamp) else 0 for timestamp in datetime_index],
@@ -645,7 +996,11 @@ class JoinedDatasetCommand(wf.AbstractCommand):
             
 
         if exchange_name is not None:
-            raise NotImplementedError('Stock exchange holidays are not supported yet.')
+            # Rows are the exchange sessions: holidays have none, the days around them do
+            dataset['exchange_holiday_adjacent'] = pd.Series(
+                data=tcal.trading_calendar(exchange_name).is_holiday_adjacent(datetime_index).astype(int),
+                index=datetime_index, dtype=int, name='exchange_holiday_adjacent'
+            )
 
         return dataset
     
@@ -666,89 +1021,182 @@ class JoinedDatasetCommand(wf.AbstractCommand):
                 how='outer'
             )
 
-        self.LOGGER.info(f"[DATASET] Joined columns column_types:\n{joined_data.info()}")
+        self.LOGGER.info("[DATASET] Joined columns column_types:\n%s", clog.lazy(_dataframe_info, joined_data))
         return joined_data
 
     def __joined_financial_features(self,
                                   dataset: pd.DataFrame,
                                   ticker: str = '',
-                                  columns_ohlc: dict = {
-                                      'open': 'open',
-                                      'high': 'high',
-                                      'low': 'low',
-                                      'close': 'close'
-                                  }):
+                                  columns_ohlc: dict = ff.COLUMNS_OHLC_DEFAULT,
+                                  feature_graph: ff.FeatureGraph = ff.DEFAULT_FEATURE_GRAPH):
         """Feature Engineering including some features from tech analysis."""
-        # dataset = dataset.copy(deep=True)
+        return ff.financial_features(dataset, ticker=ticker, columns_ohlc=columns_ohlc, feature_graph=feature_graph)
+
+    def __reduced_features(self, research: cfgm.Research, dataset: pd.DataFrame, kept_columns: typing.Iterable[str],
+                           feature_graph: ff.FeatureGraph) -> tuple[pd.DataFrame, dred.RandomizedPCA]:
+        """Replace the numeric columns but the target prices (`kept_columns`), the lagged window
+        targets and the look-ahead features by principal components fitted before `split_time`."""
+        machine_learning = research.machine_learning
+        feature_reduction = machine_learning.feature_reduction
+        tickers = [instrument.ticker for instrument in [research.target_quoted_instrument] + research.quoted_instruments]
+        # Components mixing in look-ahead features would leak them past the lagged windows exclusion
+        kept_columns = set(kept_columns) | set(machine_learning.lagged_windows.target_columns) \
+            | set(ff.look_ahead_columns(dataset.columns, tickers, feature_graph))
+        column_names = [
+            column for column in dataset.select_dtypes(include='number').columns if column not in kept_columns
+        ]
+        self.LOGGER.info(f"[DATASET][feature_reduction][PCA] {len(column_names)} columns reduced to \
+{feature_reduction.components} components, kept: {sorted(kept_columns & set(dataset.columns))}")
+
+        pca = dred.RandomizedPCA(
+            n_components=feature_reduction.components,
+            standardize=feature_reduction.standardize,
+            random_state=feature_reduction.random_state
+        )
+        values = af.float_values(dataset[column_names])
+        pca.fit(values[(dataset.index < machine_learning.split_time)])
+        component_names = [f"PC{number}" for number in range(1, pca.n_components + 1)]
+        reduced_dataset = dataset.drop(columns=column_names)
+        reduced_dataset[component_names] = pca.transform(values)
+        self.LOGGER.info(f"[DATASET][feature_reduction][PCA] Complete. Explained variance ratio: \
+{np.round(pca.explained_variance_ratio_, 4).tolist()}")
+        return reduced_dataset, pca
+
+    def __cross_instrument_financial_features(self, research: cfgm.Research, joined_dataset: pd.DataFrame,
+                                              feature_graph: ff.FeatureGraph) -> pd.DataFrame:
+        instruments_columns = {research.target_quoted_instrument.ticker: ff.COLUMNS_OHLC_DEFAULT}
+        for quoted_instrument in research.quoted_instruments:
+            instruments_columns[quoted_instrument.ticker] = ff.instrument_price_columns(
+                joined_dataset.columns, suffix='_' + quoted_instrument.ticker
+            )
+        self.LOGGER.info(f"[DATASET] Computing tech analysis features of the instruments {pformat(instruments_columns)}")
+        return ff.cross_instrument_financial_features(
+            joined_dataset, instruments_columns, max_workers=self.__features_max_workers, feature_graph=feature_graph
+        )
 
-        features = pd.DataFrame()
-        features.index = dataset.index
 
-        open_c = columns_ohlc['open'] if columns_ohlc['open'] else 'open'
-        high = columns_ohlc['high'] if columns_ohlc['high'] else 'high'
-        low = columns_ohlc['low'] if columns_ohlc['low'] else 'low'
-        close = columns_ohlc['close'] if columns_ohlc['close'] else 'close'
+class CrossValidationSplitCommand(wf.AbstractCommand):
 
-        # OHLC and HLC features
-        features['OHLC'] = (dataset[open_c] + dataset[high] + dataset[low] + dataset[close]) / 4
-        features['HLC'] = (dataset[high] + dataset[low] + dataset[close]) / 3
-        
-        # Close difference feature
-        features['close_diff'] = dataset[close].diff()
-
-        # Moving averages - different periods
-        features['MA200'] = dataset[close].rolling(window=200).mean()
-        features['MA100'] = dataset[close].rolling(window=100).mean()
-        features['MA50'] = dataset[close].rolling(window=50).mean()
-        features['MA26'] = dataset[close].rolling(window=26).mean()
-        features['MA20'] = dataset[close].rolling(window=20).mean()
-        features['MA12'] = dataset[close].rolling(window=12).mean()
-        features['MA4'] = dataset[close].rolling(window=4).mean()
-        features['MA3'] = dataset[close].rolling(window=3).mean()
-
-        # SMA Differences - different periods
-        features['DIFF-MA200-MA50'] = features['MA200'] - features['MA50']
-        features['DIFF-MA200-MA100'] = features['MA200'] - features['MA100']
-        features['DIFF-MA200-CLOSE'] = features['MA200'] - dataset[close]
-        features['DIFF-MA100-CLOSE'] = features['MA100'] - dataset[close]
-        features['DIFF-MA50-CLOSE'] = features['MA50'] - dataset[close]
-
-        # Moving Averages on high, lows, and std - different periods
-        features['MA200_low'] = dataset[low].rolling(window=200).min()
-        features['MA14_low'] = dataset[low].rolling(window=14).min()
-        features['MA200_high'] = dataset[high].rolling(window=200).max()
-        features['MA14_high'] = dataset[high].rolling(window=14).max()
-        features['MA20dSTD'] = dataset[close].rolling(window=20).std()
-
-        # Exponential Moving Averages (EMAS) - different periods
-        features['EMA12'] = dataset[close].ewm(span=12, adjust=False).mean()
-        features['EMA20'] = dataset[close].ewm(span=20, adjust=False).mean()
-        features['EMA26'] = dataset[close].ewm(span=26, adjust=False).mean()
-        features['EMA100'] = dataset[close].ewm(span=100, adjust=False).mean()
-        features['EMA200'] = dataset[close].ewm(span=200, adjust=False).mean()
-
-        # Shifts (one day before and two days before)
-        features['close_shift-1'] = dataset.shift(-1)[close]
-        features['close_shift-2'] = dataset.shift(-2)[close]
-
-        # Bollinger Bands
-        features['Bollinger_Upper'] = features['MA20'] + (features['MA20dSTD'] * 2)
-        features['Bollinger_Lower'] = features['MA20'] - (features['MA20dSTD'] * 2)
-
-        # Relative Strength Index (RSI)
-        features['K-ratio'] = 100*((dataset[close] - features['MA14_low']) / (features['MA14_high'] - features['MA14_low']) )
-        features['RSI'] = features['K-ratio'].rolling(window=3).mean()
-
-        # Moving Average Convergence/Divergence (MACD)
-        features['MACD'] = features['EMA12'] - features['EMA26']
-
-        # Replace NAs
-        nareplace = dataset.at[dataset.index.max(), close]
-        features.fillna((nareplace), inplace=True)
-
-        if ticker:
-            features = features.add_suffix('_' + ticker)
-
-        featured_dataset = pd.concat([dataset, features], axis=1)
-
-        return featured_dataset
+    LOGGER = clog.get_logger('CrossValidationSplitCommand')
+
+    def __init__(self,
+                 dataset_context_name: str='dataset_joined_with_tech',
+                 folds_context_name: str='cross-validation-folds'):
+        super().__init__()
+        self.__dataset_context_name = dataset_context_name
+        self.__folds_context_name = folds_context_name
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__dataset_context_name]
+
+    def execute(self, context: dict):
+        config: cfgm.Config = context['config']
+        machine_learning = config.research.machine_learning
+        dataset: pd.DataFrame = context[self.__dataset_context_name]
+
+        splitter = cv.SlidingWindowSplitter.from_config(machine_learning)
+        folds = list(splitter.split_dataset(dataset, machine_learning.split_time))
+        if not folds:
+            raise ValueError(f"[{self.__dataset_context_name}] Not enough rows before {machine_learning.split_time} \
+for a single fold: {machine_learning.cross_validation}")
+
+        self.LOGGER.info(f"[{self.__dataset_context_name}] {len(folds)} folds of \
+{machine_learning.cross_validation}; first train range: {folds[0].train_index(dataset.index)[[0, -1]].to_list()}, \
+last validation range: {folds[-1].validation_index(dataset.index)[[0, -1]].to_list()}")
+
+        context[self.__folds_context_name] = folds
+        return wf.CommandState.SUCCESS
+
+
+class LaggedWindowsCommand(wf.AbstractCommand):
+
+    LOGGER = clog.get_logger('LaggedWindowsCommand')
+
+    def __init__(self,
+                 dataset_context_name: str='dataset_joined_with_tech',
+                 lagged_windows_context_name: str='lagged-windows'):
+        super().__init__()
+        self.__dataset_context_name = dataset_context_name
+        self.__lagged_windows_context_name = lagged_windows_context_name
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__dataset_context_name]
+
+    def execute(self, context: dict):
+        config: cfgm.Config = context['config']
+        machine_learning = config.research.machine_learning
+        dataset: pd.DataFrame = context[self.__dataset_context_name]
+
+        lagged_windows = machine_learning.lagged_windows
+        tickers = [instrument.ticker for instrument in [config.research.target_quoted_instrument] + config.research.quoted_instruments]
+        look_ahead_columns = ff.look_ahead_columns(
+            dataset.columns, tickers, ff.FeatureGraph.from_config(machine_learning.features)
+        )
+        if look_ahead_columns:
+            self.LOGGER.info(f"[{self.__dataset_context_name}] Look-ahead columns left out of the features: {look_ahead_columns}")
+
+        lagged_window_dataset = lw.LaggedWindowDataset(
+            dataset,
+            lw.LaggedWindowGenerator.from_config(machine_learning),
+            target_columns=lagged_windows.target_columns,
+            feature_columns=lagged_windows.feature_columns,
+            exclude_columns=lagged_windows.exclude_columns + look_ahead_columns
+        )
+        self.LOGGER.info(f"[{self.__dataset_context_name}] {len(lagged_window_dataset)} lagged samples of \
+{machine_learning.lagged_windows}, feature matrix shape: {lagged_window_dataset.features.shape}")
+
+        context[self.__lagged_windows_context_name] = lagged_window_dataset
+        return wf.CommandState.SUCCESS
+
+
+class WalkForwardEvaluationCommand(wf.AbstractCommand):
+    """Evaluates the `walk_forward` forecast model on the cross-validation folds and on the
+    holdout fold after `split_time`, against the persistence baseline.
+
+    The per-fold metrics and timings are kept in the context and saved to `evaluation_file`.
+    """
+
+    LOGGER = clog.get_logger('WalkForwardEvaluationCommand')
+
+    def __init__(self,
+                 dataset_context_name: str='dataset_joined_with_tech',
+                 lagged_windows_context_name: str='lagged-windows',
+                 folds_context_name: str='cross-validation-folds',
+                 evaluation_context_name: str='walk-forward-evaluation',
+                 evaluation_file: str | None='data/generated/evaluation/walk_forward.csv'):
+        super().__init__()
+        self.__dataset_context_name = dataset_context_name
+        self.__lagged_windows_context_name = lagged_windows_context_name
+        self.__folds_context_name = folds_context_name
+        self.__evaluation_context_name = evaluation_context_name
+        self.__evaluation_file = evaluation_file
+
+    def consumed_context_keys(self) -> list[str]:
+        return ['config', self.__dataset_context_name, self.__lagged_windows_context_name, self.__folds_context_name]
+
+    def execute(self, context: dict):
+        config: cfgm.Config = context['config']
+        machine_learning = config.research.machine_learning
+        dataset: pd.DataFrame = context[self.__dataset_context_name]
+        lagged_window_dataset: lw.LaggedWindowDataset = context[self.__lagged_windows_context_name]
+        folds: list[cv.Fold] = context[self.__folds_context_name]
+
+        holdout_fold = cv.SlidingWindowSplitter.from_config(machine_learning).holdout_fold(dataset, machine_learning.split_time)
+        evaluator = wfe.WalkForwardEvaluator.from_config(machine_learning)
+        evaluation = evaluator.evaluate(lagged_window_dataset, folds, holdout_fold)
+
+        cross_validation_evaluation = evaluation[~evaluation['holdout']]
+        self.LOGGER.info(f"[{self.__dataset_context_name}] {machine_learning.walk_forward.model} over \
+{len(cross_validation_evaluation)} folds: mean RMSE {cross_validation_evaluation['rmse'].mean():.4f} \
+(persistence {cross_validation_evaluation['baseline_rmse'].mean():.4f}), \
+mean skill {cross_validation_evaluation['skill'].mean():.4f}; holdout:\n{evaluation[evaluation['holdout']].T}")
+        failed_folds = evaluation.index[evaluation['error'].notna()].to_list()
+        if failed_folds:
+            self.LOGGER.warning(f"[{self.__dataset_context_name}] Failed folds: {failed_folds}")
+
+        context[self.__evaluation_context_name] = evaluation
+        if self.__evaluation_file is not None:
+            fs.make_directory(str(Path(self.__evaluation_file).parent))
+            evaluation.to_csv(self.__evaluation_file)
+            self.LOGGER.info(f"Saved the walk-forward evaluation to {self.__evaluation_file}")
+        return wf.CommandState.SUCCESS
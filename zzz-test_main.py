@@ -1,6 +1,3 @@
-from IPython.core.display import display
-from IPython.core.display import HTML
-
 from collections import OrderedDict
 
 import config_logging as clog
@@ -12,6 +9,8 @@ import workflow as wf
 import workflow_stage as wfs
 
 
+clog.init_logger()
+
 config_loader = cfg.ConfigLoader.from_path('./config/config.yaml')
 config = config_loader.load_config(print_short_report=True, print_verbose_report=False)
 
@@ -29,9 +28,14 @@ eda_post_tending_command = wfs.AutoEdaCommand(
 check_dates_command = wfs.CheckDatesCommand(
     use_remote_data=True
 )
+data_validation_command = wfs.DataValidationCommand(
+    use_remote_data=True,
+    validation_context_name='data-validation'
+)
 select_data_by_time_range_command = wfs.SelectDataByTimeRangeCommand(
     use_remote_data=True,
-    selected_data_context_name='selected-data'
+    selected_data_context_name='selected-data',
+    trading_days_only=False
 )
 clear_data_command = wfs.DataClearingCommand(
     selected_data_context_name='selected-data'
@@ -42,6 +46,10 @@ prepared_data_report_command = wfs.PreparedDataReportCommand(
 treat_data_command = wfs.DataTreatingCommand(
     selected_data_context_name='selected-data'
 )
+scale_data_command = wfs.DataScalingCommand(
+    selected_data_context_name='selected-data',
+    scaling_context_name='scaling-parameters'
+)
 eda_post_treating_command = wfs.AutoEdaCommand(
     context_data_name='selected-data',
     use_remote_data=False,
@@ -52,7 +60,23 @@ eda_post_treating_command = wfs.AutoEdaCommand(
 dataset_command = wfs.JoinedDatasetCommand(
     selected_data_context_name='selected-data',
     dataset_context_name='dataset',
-    save_datasets=True
+    save_datasets=True,
+    cross_instrument_features=True
+)
+
+cross_validation_split_command = wfs.CrossValidationSplitCommand(
+    dataset_context_name='dataset_joined_with_tech',
+    folds_context_name='cross-validation-folds'
+)
+lagged_windows_command = wfs.LaggedWindowsCommand(
+    dataset_context_name='dataset_joined_with_tech',
+    lagged_windows_context_name='lagged-windows'
+)
+walk_forward_evaluation_command = wfs.WalkForwardEvaluationCommand(
+    dataset_context_name='dataset_joined_with_tech',
+    lagged_windows_context_name='lagged-windows',
+    folds_context_name='cross-validation-folds',
+    evaluation_context_name='walk-forward-evaluation'
 )
 
 
@@ -61,12 +85,17 @@ commands['01-data_loading'] = data_load_command
 commands['02-data_tending'] = data_tending_command
 # commands['03-eda_post_tending_command'] = eda_post_tending_command
 commands['04-check_dates_command'] = check_dates_command
+commands['04b-data_validation_command'] = data_validation_command
 commands['05-select_data_by_timerange_command'] = select_data_by_time_range_command
 commands['06-clear_data_command'] = clear_data_command
 commands['07-prepared_data_report_command'] = prepared_data_report_command
 commands['08-treat_data_command'] = treat_data_command
 # commands['09-eda_post_treating_command'] = eda_post_treating_command
+commands['10-scale_data_command'] = scale_data_command
 commands['11-dataset_command'] = dataset_command
+commands['12-cross_validation_split_command'] = cross_validation_split_command
+commands['13-lagged_windows_command'] = lagged_windows_command
+commands['14-walk_forward_evaluation_command'] = walk_forward_evaluation_command
 
 
 workflow = wf.Workflow(commands=commands)